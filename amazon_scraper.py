@@ -1,5 +1,3 @@
-import requests
-from bs4 import BeautifulSoup
 import json
 import re
 import time
@@ -7,14 +5,202 @@ import random
 from urllib.parse import quote_plus
 import logging
 
+from fetch_engine import FetchPolicy, get_engine
+from rate_limiter import RateLimit
+from extraction_schema import Field, Schema, selector_chain
+from html_parsing import PartialParse, outermost
+from product_record import json_default, product_record
+import product_store
+from search_summary import product_summary
+from page_fetcher import ResultsPageScraper, stream_products, collect_events, range_complete
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class AmazonScraper:
-    def __init__(self):
+# Label for this scraper's selector stats and metrics
+SITE = 'amazon'
+
+# Request pacing and retry behaviour for amazon.in
+FETCH_POLICY = FetchPolicy(
+    site=SITE,
+    rate_limit=RateLimit(initial_rate=0.3, min_rate=0.05, max_rate=1.0),
+    timeout=15,
+    status_backoff={503: (10, 20), 429: (15, 30)},
+    error_backoff=(5, 10),
+    cache_ttl=600,
+    # Robot check page ("Enter the characters you see below") is served with a 200
+    block_markers=(b'/errors/validateCaptcha',)
+)
+
+# Patterns used by extract_product_data, compiled once per process
+DISCOUNT_RE = re.compile(r'\((\d+)%\s*off\)')
+RATING_RE = re.compile(r'(\d+\.?\d*)\s*out\s*of\s*5')
+RATINGS_LABEL_RE = re.compile(r'(\d+[\d,]*)\s*ratings?')
+RATINGS_TEXT_RE = re.compile(r'(\d+[\d,]*)')
+BRAND_RE = re.compile(r'^([A-Za-z]+)')
+FREE_DELIVERY_RE = re.compile(r'FREE delivery\s+([^,\n]+)')
+FASTEST_DELIVERY_RE = re.compile(r'(?:Or\s+)?fastest delivery\s+([^,\n]+)')
+SERVICE_RE = re.compile(r'Service:\s*([^\n]+)')
+BOUGHT_RE = re.compile(r'(\d+\+?)\s*bought\s*in\s*past\s*month', re.IGNORECASE)
+EMI_RE = re.compile(r'(No Cost EMI|Save extra[^\.]*EMI[^\.]*)')
+NON_DIGIT_RE = re.compile(r'[^\d]')
+
+
+def absolute_url(href):
+    return 'https://www.amazon.in' + href if href.startswith('/') else href
+
+
+def parse_price(text):
+    if '₹' in text or text.replace(',', '').replace('.', '').isdigit():
+        return text
+    return None
+
+
+def parse_rating(text):
+    match = RATING_RE.search(text)
+    return match.group(1) if match else None
+
+
+def ratings_sources(element):
+    return element.get('aria-label', ''), element.get_text(strip=True)
+
+
+def parse_total_ratings(sources):
+    # Try the aria-label first, then the visible count
+    aria_label, text_content = sources
+    match = RATINGS_LABEL_RE.search(aria_label) or RATINGS_TEXT_RE.search(text_content)
+    return match.group(1) if match else None
+
+
+def parse_deal(text):
+    return text if any(word in text.lower() for word in ['deal', 'off', 'save']) else None
+
+
+def is_present(element):
+    return True
+
+
+# Selector fallbacks per field, most specific first; compiled once at import
+PRODUCT_SCHEMA = Schema(
+    SITE,
+    name=Field([
+        'h2 a span',
+        'h2 span',
+        '.s-size-mini a span',
+        '[data-cy="title-recipe"] h2 span',
+        '.a-link-normal .a-text-normal span'
+    ]),
+    url=Field([
+        'h2 a[href]',
+        '.s-link-style[href]',
+        '[data-cy="title-recipe"] a[href]'
+    ], attr='href', parse=absolute_url),
+    price=Field([
+        '.a-price-whole',
+        '.a-price .a-offscreen',
+        '[data-cy="price-recipe"] .a-price .a-offscreen',
+        '.a-price-range .a-price .a-offscreen'
+    ], parse=parse_price),
+    original_price=Field([
+        '.a-price.a-text-price .a-offscreen',
+        '[data-a-strike="true"] .a-offscreen',
+        '.a-text-price .a-offscreen'
+    ], parse=lambda text: text if '₹' in text else None),
+    rating=Field([
+        '.a-icon-alt',
+        '[data-cy="reviews-ratings-slot"] .a-icon-alt',
+        '.a-star-small .a-icon-alt'
+    ], parse=parse_rating),
+    total_ratings=Field([
+        'a[aria-label*="ratings"]',
+        'span[aria-label*="ratings"]',
+        '.a-size-base.s-underline-text'
+    ], value=ratings_sources, parse=parse_total_ratings),
+    image_url=Field([
+        '.s-image[src]',
+        'img[data-image-latency][src]',
+        '.s-product-image-container img[src]'
+    ], attr='src'),
+    sponsored_element=Field('.puis-sponsored-label-text, [data-component-type="s-sponsored-result"]', value=is_present),
+    is_prime=Field('.a-icon-prime', value=is_present),
+    deal_info=Field([
+        '.a-badge-text',
+        '[data-a-badge-color] .a-badge-text'
+    ], parse=parse_deal)
+)
+
+
+def card_key(element):
+    """ASIN on the card element itself, known before extraction"""
+    return element.get('data-asin')
+
+# Product card selectors, tried in order of which ones the site currently matches
+PRODUCT_CONTAINERS = selector_chain(SITE, 'containers', [
+    '[data-component-type="s-search-result"]',
+    '[data-asin]:not([data-asin=""])',
+    '.s-result-item[data-asin]',
+    '.sg-col-inner .s-widget-container'
+])
+
+# Pagination strip under the results; its next link is a span with s-pagination-disabled on the last page
+PAGINATION = '.s-pagination-strip'
+NEXT_PAGE_LINK = 'a.s-pagination-next'
+
+# Result count above the results, '49-96 of 352 results for' ('of over 10,000' while there are more)
+RESULT_INFO = '[data-component-type="s-result-info-bar"]'
+
+# Elements a results page is reduced to when parsing with bs4: every product card candidate, pagination and result count.
+# The last container fallback is covered by '[data-asin]': find_product_containers only returns cards with a data-asin,
+# and '.sg-col-inner' itself would keep the whole results column, undoing the partial parse.
+PAGE_NODES = PartialParse([
+    '[data-component-type="s-search-result"]',
+    '[data-asin]',
+    '.s-result-item',
+    PAGINATION,
+    RESULT_INFO
+])
+
+# Fields of one product card, with their defaults; shared fields repeat across products
+AmazonProduct = product_record('AmazonProduct', {
+    'name': '',
+    'url': '',
+    'price': '',
+    'original_price': '',
+    'discount_percentage': '',
+    'savings_amount': 0,
+    'rating': '',
+    'total_ratings': '',
+    'total_reviews': '',
+    'image_url': '',
+    'brand': '',
+    'price_numeric': 0,
+    'original_price_numeric': 0,
+    'is_sponsored': False,
+    'is_prime': False,
+    'free_delivery_date': '',
+    'fastest_delivery_date': '',
+    'service_info': '',
+    'deal_info': '',
+    'bought_last_month': '',
+    'asin': '',
+    'availability_info': ''
+}, optional=('emi_info',), shared=(
+    'rating', 'discount_percentage', 'brand', 'free_delivery_date', 'fastest_delivery_date',
+    'service_info', 'deal_info', 'bought_last_month', 'availability_info', 'emi_info'
+))
+
+class AmazonScraper(ResultsPageScraper):
+    site = SITE
+    page_nodes = PAGE_NODES
+    card_key = staticmethod(card_key)
+    
+    def __init__(self, parser=None):
         self.base_url = "https://www.amazon.in/s?k={search_term}"
-        self.session = requests.Session()
+        self.engine = get_engine()
+        
+        # HTML parser backend (see html_parsing), None uses SCRAPER_PARSER / fastest installed
+        self.parser = parser
         
         # Realistic user agents for rotation
         self.user_agents = [
@@ -42,255 +228,83 @@ class AmazonScraper:
     def get_random_user_agent(self):
         return random.choice(self.user_agents)
     
-    def make_request(self, url, max_retries=3):
-        """Make HTTP request with retry logic and random delays"""
-        for attempt in range(max_retries):
-            try:
-                # Update headers with random user agent
-                headers = self.headers.copy()
-                headers['User-Agent'] = self.get_random_user_agent()
-                
-                # Random delay between requests
-                time.sleep(random.uniform(2, 5))
-                
-                response = self.session.get(url, headers=headers, timeout=15)
-                
-                if response.status_code == 200:
-                    return response
-                elif response.status_code == 503:
-                    # Service unavailable, wait longer
-                    logger.warning(f"Service unavailable, waiting before retry {attempt + 1}")
-                    time.sleep(random.uniform(10, 20))
-                elif response.status_code == 429:
-                    # Rate limited
-                    logger.warning(f"Rate limited, waiting before retry {attempt + 1}")
-                    time.sleep(random.uniform(15, 30))
-                else:
-                    logger.warning(f"Status code {response.status_code}, attempt {attempt + 1}")
-                    
-            except requests.RequestException as e:
-                logger.error(f"Request failed: {e}, attempt {attempt + 1}")
-                time.sleep(random.uniform(5, 10))
+    def make_request(self, url, max_retries=3, cancelled=None):
+        """Make HTTP request through the shared fetch engine (retries, backoff and pacing per FETCH_POLICY)"""
+        def build_headers(attempt):
+            # Update headers with random user agent
+            headers = self.headers.copy()
+            headers['User-Agent'] = self.get_random_user_agent()
+            return headers
         
-        return None
+        return self.engine.fetch(url, headers=build_headers, policy=FETCH_POLICY, max_retries=max_retries,
+                                 cancelled=cancelled)
     
     def extract_product_data(self, product_element):
         """Extract data from a single Amazon product element"""
-        product_data = {
-            'name': '',
-            'url': '',
-            'price': '',
-            'original_price': '',
-            'discount_percentage': '',
-            'savings_amount': 0,
-            'rating': '',
-            'total_ratings': '',
-            'total_reviews': '',
-            'image_url': '',
-            'brand': '',
-            'price_numeric': 0,
-            'original_price_numeric': 0,
-            'is_sponsored': False,
-            'is_prime': False,
-            'free_delivery_date': '',
-            'fastest_delivery_date': '',
-            'service_info': '',
-            'deal_info': '',
-            'bought_last_month': '',
-            'asin': '',
-            'availability_info': ''
-        }
+        product_data = AmazonProduct()
         
         try:
+            # Full card text, computed once for every text-based check below
+            card_text = product_element.get_text()
+            
             # Extract ASIN
             asin_element = product_element.get('data-asin')
             if asin_element:
                 product_data['asin'] = asin_element
             
-            # Extract product name
-            name_selectors = [
-                'h2 a span',
-                'h2 span',
-                '.s-size-mini a span',
-                '[data-cy="title-recipe"] h2 span',
-                '.a-link-normal .a-text-normal span'
-            ]
-            
-            for selector in name_selectors:
-                name_element = product_element.select_one(selector)
-                if name_element:
-                    product_data['name'] = name_element.get_text(strip=True)
-                    break
-            
-            # Extract URL
-            url_selectors = [
-                'h2 a[href]',
-                '.s-link-style[href]',
-                '[data-cy="title-recipe"] a[href]'
-            ]
-            
-            for selector in url_selectors:
-                url_element = product_element.select_one(selector)
-                if url_element and url_element.get('href'):
-                    href = url_element['href']
-                    if href.startswith('/'):
-                        product_data['url'] = 'https://www.amazon.in' + href
-                    else:
-                        product_data['url'] = href
-                    break
-            
-            # Extract current price
-            price_selectors = [
-                '.a-price-whole',
-                '.a-price .a-offscreen',
-                '[data-cy="price-recipe"] .a-price .a-offscreen',
-                '.a-price-range .a-price .a-offscreen'
-            ]
-            
-            for selector in price_selectors:
-                price_element = product_element.select_one(selector)
-                if price_element:
-                    price_text = price_element.get_text(strip=True)
-                    if '₹' in price_text or price_text.replace(',', '').replace('.', '').isdigit():
-                        product_data['price'] = price_text
-                        break
-            
-            # Extract original price (MRP)
-            original_price_selectors = [
-                '.a-price.a-text-price .a-offscreen',
-                '[data-a-strike="true"] .a-offscreen',
-                '.a-text-price .a-offscreen'
-            ]
-            
-            for selector in original_price_selectors:
-                original_price_element = product_element.select_one(selector)
-                if original_price_element:
-                    original_price_text = original_price_element.get_text(strip=True)
-                    if '₹' in original_price_text:
-                        product_data['original_price'] = original_price_text
-                        break
+            # Selector-driven fields (name, url, prices, rating, image, badges)
+            values = PRODUCT_SCHEMA.extract(product_element)
+            sponsored_element = values.pop('sponsored_element', False)
+            product_data.update(values)
             
             # Extract discount percentage
-            discount_text = product_element.get_text()
-            discount_match = re.search(r'\((\d+)%\s*off\)', discount_text)
+            discount_match = DISCOUNT_RE.search(card_text)
             if discount_match:
                 product_data['discount_percentage'] = discount_match.group(1) + '% off'
             
-            # Extract rating
-            rating_selectors = [
-                '.a-icon-alt',
-                '[data-cy="reviews-ratings-slot"] .a-icon-alt',
-                '.a-star-small .a-icon-alt'
-            ]
-            
-            for selector in rating_selectors:
-                rating_element = product_element.select_one(selector)
-                if rating_element:
-                    rating_text = rating_element.get_text(strip=True)
-                    rating_match = re.search(r'(\d+\.?\d*)\s*out\s*of\s*5', rating_text)
-                    if rating_match:
-                        product_data['rating'] = rating_match.group(1)
-                        break
-            
-            # Extract number of ratings/reviews
-            ratings_selectors = [
-                'a[aria-label*="ratings"]',
-                'span[aria-label*="ratings"]',
-                '.a-size-base.s-underline-text'
-            ]
-            
-            for selector in ratings_selectors:
-                ratings_element = product_element.select_one(selector)
-                if ratings_element:
-                    aria_label = ratings_element.get('aria-label', '')
-                    text_content = ratings_element.get_text(strip=True)
-                    
-                    # Try to extract from aria-label first
-                    ratings_match = re.search(r'(\d+[\d,]*)\s*ratings?', aria_label)
-                    if not ratings_match:
-                        # Try from text content
-                        ratings_match = re.search(r'(\d+[\d,]*)', text_content)
-                    
-                    if ratings_match:
-                        product_data['total_ratings'] = ratings_match.group(1)
-                        break
-            
-            # Extract image URL
-            image_selectors = [
-                '.s-image[src]',
-                'img[data-image-latency][src]',
-                '.s-product-image-container img[src]'
-            ]
-            
-            for selector in image_selectors:
-                image_element = product_element.select_one(selector)
-                if image_element and image_element.get('src'):
-                    product_data['image_url'] = image_element['src']
-                    break
-            
             # Extract brand from product name
             if product_data['name']:
-                brand_match = re.match(r'^([A-Za-z]+)', product_data['name'])
+                brand_match = BRAND_RE.match(product_data['name'])
                 if brand_match:
                     product_data['brand'] = brand_match.group(1)
             
-            # Check if sponsored
-            sponsored_indicators = [
-                'Sponsored' in product_element.get_text(),
-                product_element.select_one('.puis-sponsored-label-text'),
-                'data-component-type="s-sponsored-result"' in str(product_element)
-            ]
-            product_data['is_sponsored'] = any(sponsored_indicators)
-            
-            # Check if Prime eligible
-            prime_element = product_element.select_one('.a-icon-prime')
-            product_data['is_prime'] = prime_element is not None
+            # Check if sponsored, cheapest test first; the card itself or any
+            # descendant may carry the sponsored component type
+            product_data['is_sponsored'] = (
+                'Sponsored' in card_text
+                or product_element.get('data-component-type') == 's-sponsored-result'
+                or sponsored_element
+            )
             
             # Extract delivery information
-            delivery_text = product_element.get_text()
-            
             # Free delivery date
-            free_delivery_match = re.search(r'FREE delivery\s+([^,\n]+)', delivery_text)
+            free_delivery_match = FREE_DELIVERY_RE.search(card_text)
             if free_delivery_match:
                 product_data['free_delivery_date'] = free_delivery_match.group(1).strip()
             
             # Fastest delivery date
-            fastest_delivery_match = re.search(r'(?:Or\s+)?fastest delivery\s+([^,\n]+)', delivery_text)
+            fastest_delivery_match = FASTEST_DELIVERY_RE.search(card_text)
             if fastest_delivery_match:
                 product_data['fastest_delivery_date'] = fastest_delivery_match.group(1).strip()
             
             # Extract service information
-            service_match = re.search(r'Service:\s*([^\n]+)', delivery_text)
+            service_match = SERVICE_RE.search(card_text)
             if service_match:
                 product_data['service_info'] = service_match.group(1).strip()
             
-            # Extract deal information
-            deal_selectors = [
-                '.a-badge-text',
-                '[data-a-badge-color] .a-badge-text'
-            ]
-            
-            for selector in deal_selectors:
-                deal_element = product_element.select_one(selector)
-                if deal_element:
-                    deal_text = deal_element.get_text(strip=True)
-                    if any(word in deal_text.lower() for word in ['deal', 'off', 'save']):
-                        product_data['deal_info'] = deal_text
-                        break
-            
             # Extract "bought last month" info
-            bought_match = re.search(r'(\d+\+?)\s*bought\s*in\s*past\s*month', delivery_text, re.IGNORECASE)
+            bought_match = BOUGHT_RE.search(card_text)
             if bought_match:
                 product_data['bought_last_month'] = bought_match.group(1)
             
             # Process price data for numeric calculations
             if product_data['price']:
-                price_numeric = re.sub(r'[^\d]', '', product_data['price'])
+                price_numeric = NON_DIGIT_RE.sub('', product_data['price'])
                 if price_numeric:
                     product_data['price_numeric'] = int(price_numeric)
             
             if product_data['original_price']:
-                original_price_numeric = re.sub(r'[^\d]', '', product_data['original_price'])
+                original_price_numeric = NON_DIGIT_RE.sub('', product_data['original_price'])
                 if original_price_numeric:
                     product_data['original_price_numeric'] = int(original_price_numeric)
             
@@ -299,7 +313,7 @@ class AmazonScraper:
                 product_data['savings_amount'] = product_data['original_price_numeric'] - product_data['price_numeric']
             
             # Extract EMI/financing info
-            emi_match = re.search(r'(No Cost EMI|Save extra[^\.]*EMI[^\.]*)', delivery_text)
+            emi_match = EMI_RE.search(card_text)
             if emi_match:
                 product_data['emi_info'] = emi_match.group(1).strip()
         
@@ -308,71 +322,46 @@ class AmazonScraper:
         
         return product_data
     
-    def search_products(self, search_term, max_pages=5):
-        """Search for products and extract data"""
-        all_products = []
+    def build_page_url(self, search_term, page):
+        """Build the search URL for a results page"""
         encoded_search_term = quote_plus(search_term)
         
-        for page in range(1, max_pages + 1):
-            logger.info(f"Scraping page {page} for '{search_term}'")
-            
-            # Construct URL with page parameter
-            if page == 1:
-                url = self.base_url.format(search_term=encoded_search_term)
-            else:
-                url = f"{self.base_url.format(search_term=encoded_search_term)}&page={page}"
-            
-            response = self.make_request(url)
-            
-            if not response:
-                logger.error(f"Failed to fetch page {page}")
-                continue
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Find product containers using multiple selectors
-            product_selectors = [
-                '[data-component-type="s-search-result"]',
-                '[data-asin]:not([data-asin=""])',
-                '.s-result-item[data-asin]',
-                '.sg-col-inner .s-widget-container'
-            ]
-            
-            products_found = []
-            for selector in product_selectors:
-                products = soup.select(selector)
-                if products:
-                    # Filter out empty data-asin
-                    products_found = [p for p in products if p.get('data-asin')]
-                    if products_found:
-                        break
-            
-            if not products_found:
-                logger.warning(f"No products found on page {page}")
-                # Try alternative method
-                products_found = soup.select('.s-result-item')
-                if not products_found:
-                    break
-            
-            logger.info(f"Found {len(products_found)} product containers on page {page}")
-            
-            for product_element in products_found:
-                product_data = self.extract_product_data(product_element)
-                
-                # Only add products with meaningful data
-                if product_data['name'] and (product_data['price'] or product_data['url']):
-                    all_products.append(product_data)
-            
-            # Random delay between pages
-            time.sleep(random.uniform(3, 7))
+        # Construct URL with page parameter
+        if page == 1:
+            return self.base_url.format(search_term=encoded_search_term)
+        return f"{self.base_url.format(search_term=encoded_search_term)}&page={page}"
+    
+    def find_product_containers(self, soup):
+        """Product card elements on a parsed results page"""
+        # Find product containers using multiple selectors
+        for index, selector in PRODUCT_CONTAINERS.ordered:
+            products = selector.select(soup)
+            if products:
+                # Filter out empty data-asin, then wrappers nested inside a matched card
+                products_found = outermost([p for p in products if p.get('data-asin')])
+                if products_found:
+                    PRODUCT_CONTAINERS.hit(index)
+                    return products_found
+        PRODUCT_CONTAINERS.miss()
         
-        return all_products
+        # Try alternative method
+        return soup.select('.s-result-item')
+    
+    def results_end(self, soup, page):
+        """Why page is the last results page (no next-page link, result count reached), None if it may not be"""
+        pagination = soup.select_one(PAGINATION)
+        if pagination is not None and pagination.select_one(NEXT_PAGE_LINK) is None:
+            return 'no next-page link'
+        result_info = soup.select_one(RESULT_INFO)
+        if result_info is not None and range_complete(result_info.get_text(' ')):
+            return 'result count reached'
+        return None
     
     def save_to_json(self, data, filename):
         """Save data to JSON file"""
         try:
             with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+                json.dump(data, f, indent=2, ensure_ascii=False, default=json_default)
             logger.info(f"Data saved to {filename}")
             return True
         except Exception as e:
@@ -380,71 +369,36 @@ class AmazonScraper:
             return False
     
     def get_search_summary(self, products):
-        """Generate summary statistics"""
+        """Generate summary statistics (price, rating and discount fields come from search_summary)"""
         if not products:
             return {}
         
-        total_products = len(products)
-        products_with_price = [p for p in products if p['price_numeric'] > 0]
-        
-        summary = {
-            'total_products': total_products,
-            'products_with_price': len(products_with_price),
-            'products_with_rating': len([p for p in products if p['rating']]),
-            'sponsored_products': len([p for p in products if p['is_sponsored']]),
-            'prime_products': len([p for p in products if p['is_prime']]),
-            'products_with_deals': len([p for p in products if p['deal_info']]),
-            'brands_found': list(set([p['brand'] for p in products if p['brand']])),
-            'price_range': {},
-            'avg_rating': 0
-        }
-        
-        if products_with_price:
-            prices = [p['price_numeric'] for p in products_with_price]
-            summary['price_range'] = {
-                'min_price': min(prices),
-                'max_price': max(prices),
-                'avg_price': sum(prices) // len(prices)
-            }
-        
-        # Calculate average rating
-        rated_products = [float(p['rating']) for p in products if p['rating']]
-        if rated_products:
-            summary['avg_rating'] = round(sum(rated_products) / len(rated_products), 2)
-        
+        summary, columns = product_summary(products)
+        summary.update({
+            'sponsored_products': columns.count('is_sponsored'),
+            'prime_products': columns.count('is_prime'),
+            'products_with_deals': columns.count('deal_info'),
+            'brands_found': columns.distinct('brand')
+        })
         return summary
 
-# Function to scrape and return JSON
-def scrape_amazon_products(search_term, max_pages=3):
-    """Scrape Amazon products and return JSON data"""
-    scraper = AmazonScraper()
+# Generator behind the streaming API and scrape_amazon_products
+def stream_amazon_products(search_term, max_pages=3, concurrency=1, max_products=None, cancel_event=None):
+    """Scrape Amazon products page by page
     
+    Yields a 'page' event with each page's products as soon as it is parsed
+    ('page_failed' for pages that could not be fetched), then a 'summary'
+    event with the same fields as scrape_amazon_products minus 'products'.
+    """
     logger.info(f"Searching for '{search_term}' on Amazon India...")
-    products = scraper.search_products(search_term, max_pages=max_pages)
-    
-    if products:
-        # Generate summary
-        summary = scraper.get_search_summary(products)
-        
-        # Prepare final data structure
-        result = {
-            'search_term': search_term,
-            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
-            'total_pages_scraped': max_pages,
-            'summary': summary,
-            'products': products
-        }
-        
-        return result
-    else:
-        return {
-            'search_term': search_term,
-            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
-            'total_pages_scraped': max_pages,
-            'summary': {'total_products': 0},
-            'products': [],
-            'error': 'No products found'
-        }
+    yield from stream_products(AmazonScraper(), search_term, max_pages=max_pages, concurrency=concurrency,
+                               max_products=max_products, cancel_event=cancel_event)
+
+# Function to scrape and return JSON
+def scrape_amazon_products(search_term, max_pages=3, concurrency=1, max_products=None, cancel_event=None):
+    """Scrape Amazon products and return JSON data"""
+    return collect_events(stream_amazon_products(search_term, max_pages=max_pages, concurrency=concurrency,
+                                                 max_products=max_products, cancel_event=cancel_event))
 
 # Example usage
 def main():
@@ -456,14 +410,19 @@ def main():
     result_json = scrape_amazon_products(search_term, max_pages)
     
     # Output JSON to console
-    print(json.dumps(result_json, indent=2, ensure_ascii=False))
+    print(json.dumps(result_json, indent=2, ensure_ascii=False, default=json_default))
     
     # Also save to file
     filename = f"amazon_{search_term.replace(' ', '_')}_{int(time.time())}.json"
     with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(result_json, f, indent=2, ensure_ascii=False)
+        json.dump(result_json, f, indent=2, ensure_ascii=False, default=json_default)
     
     print(f"\n\nData also saved to: {filename}", file=sys.stderr)
+    
+    # And to the product store, when SCRAPER_PRODUCT_DB is set
+    stored = product_store.save_search_result(SITE, result_json)
+    if stored:
+        print(f"Stored {stored} products in {product_store.DB_PATH}", file=sys.stderr)
 
 # Alternative: Direct JSON output function
 def get_amazon_products_json(search_term, max_pages=3):
@@ -472,7 +431,7 @@ def get_amazon_products_json(search_term, max_pages=3):
     Usage: json_string = get_amazon_products_json("laptop", 2)
     """
     result = scrape_amazon_products(search_term, max_pages)
-    return json.dumps(result, indent=2, ensure_ascii=False)
+    return json.dumps(result, indent=2, ensure_ascii=False, default=json_default)
 
 if __name__ == "__main__":
     import sys
@@ -1,12 +1,55 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-import json
-import importlib.util
 import traceback
 from datetime import datetime
 import os
+import sqlite3
+import sys
+import threading
+import time
+import logging
+
+# Modules shared with the scrapers (metrics, product records, product store, matching) live one level up
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import metrics
+import product_matching
+import product_record
+import product_store
+from scraper_registry import ScraperRegistry
+import job_store
+from jobs import JobManager, QueueFullError, COMPLETED, FAILED, CANCELLED
+from result_cache import ResultCache, CACHE_MODES, BYPASS, PREFER, ONLY, STALE
+from batch import BatchItem, BatchScheduler, ITEM_CANCELLED, ITEM_COMPLETED, ITEM_FAILED, summarize
+from streaming import MIMETYPES, STREAM_HEADERS, STREAM_FORMATS, pick_format, encode_events
+
+logger = logging.getLogger(__name__)
+
+class ScraperJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, plus product records; encodes with orjson when installed"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, product_record.ProductRecord):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+        indent = kwargs.pop('indent', None)
+        # response() asks for compact separators outside debug mode, which orjson's output already is;
+        # ensure_ascii only changes how non-ASCII text is escaped, not the JSON value
+        if kwargs.get('separators') == (',', ':'):
+            del kwargs['separators']
+        kwargs.pop('ensure_ascii', None)
+        if kwargs:
+            return super().dumps(obj, indent=indent, **kwargs)
+        return product_record.dumps(obj, sort_keys=self.sort_keys, indent=indent, default=self.default)
 
 app = Flask(__name__)
+app.json = ScraperJSONProvider(app)
 CORS(app)
 
 SCRAPER_CONFIGS = {
@@ -14,27 +57,36 @@ SCRAPER_CONFIGS = {
         'name': 'Amazon',
         'script_path': '../amazon_scraper.py',
         'function_name': 'scrape_amazon_products',
+        'stream_function_name': 'stream_amazon_products',
         'parameters': [
             {'name': 'search_term', 'type': 'text', 'label': 'Search Term', 'placeholder': 'e.g., laptop', 'required': True},
-            {'name': 'max_pages', 'type': 'number', 'label': 'Max Pages', 'default': 3, 'min': 1, 'max': 10, 'required': True}
+            {'name': 'max_pages', 'type': 'number', 'label': 'Max Pages', 'default': 3, 'min': 1, 'max': 10, 'required': True},
+            {'name': 'concurrency', 'type': 'number', 'label': 'Parallel Pages', 'default': 1, 'min': 1, 'max': 4, 'required': False},
+            {'name': 'max_products', 'type': 'number', 'label': 'Max Products', 'placeholder': 'all', 'min': 1, 'max': 1000, 'required': False}
         ]
     },
     'flipkart': {
         'name': 'Flipkart',
         'script_path': '../flipkart_scraper.py',
         'function_name': 'scrape_flipkart_products',
+        'stream_function_name': 'stream_flipkart_products',
         'parameters': [
             {'name': 'search_term', 'type': 'text', 'label': 'Search Term', 'placeholder': 'e.g., smartphone', 'required': True},
-            {'name': 'max_pages', 'type': 'number', 'label': 'Max Pages', 'default': 3, 'min': 1, 'max': 10, 'required': True}
+            {'name': 'max_pages', 'type': 'number', 'label': 'Max Pages', 'default': 3, 'min': 1, 'max': 10, 'required': True},
+            {'name': 'concurrency', 'type': 'number', 'label': 'Parallel Pages', 'default': 1, 'min': 1, 'max': 4, 'required': False},
+            {'name': 'max_products', 'type': 'number', 'label': 'Max Products', 'placeholder': 'all', 'min': 1, 'max': 1000, 'required': False}
         ]
     },
     'snapdeal': {
         'name': 'Snapdeal',
         'script_path': '../snapdeal.py',
         'function_name': 'scrape_snapdeal_products',
+        'stream_function_name': 'stream_snapdeal_products',
         'parameters': [
             {'name': 'search_term', 'type': 'text', 'label': 'Search Term', 'placeholder': 'e.g., pants trouser', 'required': True},
-            {'name': 'max_pages', 'type': 'number', 'label': 'Max Pages', 'default': 3, 'min': 1, 'max': 10, 'required': True}
+            {'name': 'max_pages', 'type': 'number', 'label': 'Max Pages', 'default': 3, 'min': 1, 'max': 10, 'required': True},
+            {'name': 'concurrency', 'type': 'number', 'label': 'Parallel Pages', 'default': 1, 'min': 1, 'max': 4, 'required': False},
+            {'name': 'max_products', 'type': 'number', 'label': 'Max Products', 'placeholder': 'all', 'min': 1, 'max': 1000, 'required': False}
         ]
     },
     'wikipedia': {
@@ -48,74 +100,592 @@ SCRAPER_CONFIGS = {
     }
 }
 
-def load_scraper_module(script_path):
-    try:
-        abs_path = os.path.abspath(script_path)
-        spec = importlib.util.spec_from_file_location("scraper_module", abs_path)
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-        return module
-    except Exception as e:
-        raise Exception(f"Failed to load module: {str(e)}")
+# Scraper modules are imported once and their scrape_* callables cached
+scraper_registry = ScraperRegistry(SCRAPER_CONFIGS)
+
+# Scrapes run on a bounded worker pool so requests return immediately; their state is shared with the
+# other gunicorn workers through SQLite (SCRAPER_JOB_DB, default backend/jobs.db; 'off' keeps it in this process)
+job_manager = JobManager(
+    max_workers=int(os.environ.get('SCRAPE_MAX_WORKERS', 4)),
+    max_pending=int(os.environ.get('SCRAPE_MAX_PENDING', 100)),
+    retention_seconds=int(os.environ.get('SCRAPE_JOB_RETENTION', 3600)),
+    store=job_store.open_store()
+)
+
+# Batch items run under per-site limits shared by every batch
+batch_scheduler = BatchScheduler(site_limit=int(os.environ.get('SCRAPE_BATCH_SITE_CONCURRENCY', 2)))
+MAX_BATCH_ITEMS = int(os.environ.get('SCRAPE_BATCH_MAX_ITEMS', 500))
+
+# Finished results per scraper + parameters, served straight from /api/scrape
+result_cache = ResultCache(
+    max_entries=int(os.environ.get('RESULT_CACHE_SIZE', 200)),
+    ttl=int(os.environ.get('RESULT_CACHE_TTL', 900)),
+    max_stale=int(os.environ.get('RESULT_CACHE_MAX_STALE', 86400))
+)
+
+# Every scraped product and its price history, in SQLite; SCRAPER_PRODUCT_DB=off disables it
+product_db = product_store.open_store(
+    product_store.DB_PATH or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'products.db')
+)
+
+# Cross-site clusters of the same item; filled from the product store on first use, then as products are scraped
+product_matcher = product_matching.ProductMatcher()
+matcher_loaded = False
+matcher_load_lock = threading.Lock()
 
 @app.route('/api/scrapers', methods=['GET'])
 def get_scrapers():
     return jsonify({'scrapers': SCRAPER_CONFIGS})
 
+@app.route('/api/scrapers/reload', methods=['POST'])
+def reload_scrapers():
+    """Re-import scraper scripts that changed on disk (or all of them with force)"""
+    data = request.get_json(silent=True) or {}
+    scraper_id = data.get('scraper_id')
+    force = bool(data.get('force', False))
+
+    if scraper_id and scraper_id not in SCRAPER_CONFIGS:
+        return jsonify({'error': 'Invalid scraper ID'}), 400
+
+    results = scraper_registry.reload(scraper_id=scraper_id, force=force)
+    return jsonify({'success': True, 'reloaded': results, 'modules': scraper_registry.status()})
+
+def validate_scrape_request(data):
+    """Check scraper_id and required parameters; returns (error, status) or None"""
+    if not data:
+        return {'error': 'No data provided'}, 400
+
+    scraper_id = data.get('scraper_id')
+    parameters = data.get('parameters', {})
+
+    if not scraper_id or scraper_id not in SCRAPER_CONFIGS:
+        return {'error': 'Invalid scraper ID'}, 400
+
+    if data.get('cache', PREFER) not in CACHE_MODES:
+        return {'error': f"cache must be one of {', '.join(CACHE_MODES)}"}, 400
+
+    # Validate required parameters
+    for param_config in SCRAPER_CONFIGS[scraper_id]['parameters']:
+        param_name = param_config['name']
+        if param_config.get('required', False) and param_name not in parameters:
+            return {'error': f'Parameter {param_name} is required'}, 400
+
+    return None
+
+def scraper_arguments(scraper_id, parameters, cancel_event=None):
+    """Keyword arguments for a scraper's scrape_* / stream_* function; cancel_event stops e-commerce scrapes between pages"""
+    if scraper_id in ['wikipedia']:
+        # Wikipedia uses max_results instead of max_pages
+        return {
+            'search_term': parameters.get('search_term'),
+            'max_results': int(parameters.get('max_results', 1))
+        }
+    # E-commerce scrapers use max_pages, and stop early at max_products (none or 0: every page)
+    return {
+        'search_term': parameters.get('search_term'),
+        'max_pages': int(parameters.get('max_pages', 3)),
+        'concurrency': int(parameters.get('concurrency', 1)),
+        'max_products': int(parameters.get('max_products') or 0) or None,
+        'cancel_event': cancel_event
+    }
+
+def record_scrape(scraper_id, outcome, started):
+    metrics.SCRAPES.labels(scraper_id, outcome).inc()
+    metrics.SCRAPE_SECONDS.labels(scraper_id).observe(time.perf_counter() - started)
+
+def run_scraper(scraper_id, parameters, cancel_event=None):
+    """Execute a scraper synchronously and return its result dict (partial, with 'cancelled', if cancel_event is set)"""
+    config = SCRAPER_CONFIGS[scraper_id]
+
+    # Resolve the cached scraper function
+    scraper_function = scraper_registry.get_function(scraper_id)
+    started = time.perf_counter()
+    try:
+        result = scraper_function(**scraper_arguments(scraper_id, parameters, cancel_event))
+    except Exception:
+        record_scrape(scraper_id, 'failed', started)
+        raise
+    if result.get('cancelled'):
+        outcome = 'cancelled'
+    else:
+        outcome = 'error' if 'error' in result else 'completed'
+    record_scrape(scraper_id, outcome, started)
+
+    result['scraper_used'] = config['name']
+    result['execution_timestamp'] = datetime.now().isoformat()
+    return result
+
+def store_products(scraper_id, parameters, products):
+    """Upsert scraped products into the product store and the matching index; a storage failure never fails the scrape"""
+    if scraper_id not in product_store.STORED_SITES or not products:
+        return
+    with metrics.MATCH_SECONDS.labels(scraper_id).time():
+        product_matcher.add_products(scraper_id, products)
+    if product_db is None:
+        return
+    try:
+        with metrics.STORE_SECONDS.labels(scraper_id).time():
+            product_db.save(scraper_id, products, search_term=parameters.get('search_term'))
+    except sqlite3.Error as e:
+        logger.warning(f"Could not store {scraper_id} products: {e}")
+
+def run_and_cache(scraper_id, parameters, stale_entry=None, cancel_event=None):
+    """Run a scraper, keep a successful result in the result cache and its products in the product store"""
+    try:
+        result = run_scraper(scraper_id, parameters, cancel_event)
+        if 'error' not in result:
+            # A cancelled scrape stopped early: keep its products, but never serve it as the full result
+            if not result.get('cancelled'):
+                result_cache.store(scraper_id, parameters, result)
+            store_products(scraper_id, parameters, result.get('products'))
+        return result
+    finally:
+        if stale_entry is not None:
+            result_cache.release_refresh(stale_entry)
+
+def refresh_in_background(scraper_id, parameters, entry):
+    """Queue a refresh of a stale cached result unless one is already running; returns its job ID"""
+    if not result_cache.claim_refresh(entry):
+        return entry.refresh_job_id
+    try:
+        job = job_manager.submit(
+            scraper_id, parameters,
+            lambda job: run_and_cache(scraper_id, parameters, stale_entry=entry, cancel_event=job.cancel_event)
+        )
+    except QueueFullError:
+        # Try again on the next request
+        result_cache.release_refresh(entry)
+        return None
+    entry.refresh_job_id = job.id
+    return job.id
+
+def result_response(scraper_id, payload, status_code=200):
+    """jsonify a payload carrying scrape results, recording serialization time and response size"""
+    with metrics.SERIALIZE_SECONDS.labels(scraper_id).time():
+        response = jsonify(payload)
+    metrics.RESPONSE_BYTES.labels(scraper_id).observe(response.calculate_content_length() or 0)
+    return response, status_code
+
+def job_response(job, status_code=200):
+    data = job.to_dict(include_result=True)
+    data['success'] = job.status != FAILED
+    data['status_url'] = f'/api/jobs/{job.id}'
+    return result_response(job.scraper_id, data, status_code)
+
+def cancelled_response(job):
+    """409 for a cancelled job, carrying whatever it scraped before it stopped"""
+    payload = {'error': 'Job was cancelled', 'job_id': job.id}
+    if job.result is not None:
+        payload['data'] = job.result
+    return result_response(job.scraper_id, payload, 409)
+
 @app.route('/api/scrape', methods=['POST'])
 def scrape_data():
+    """Queue a scrape job and return its ID; pass "wait": true to block for the result"""
     try:
-        data = request.get_json()
-        if not data:
-            return jsonify({'error': 'No data provided'}), 400
-        
-        scraper_id = data.get('scraper_id')
+        data = request.get_json(silent=True)
+        validation_error = validate_scrape_request(data)
+        if validation_error:
+            error, status_code = validation_error
+            return jsonify(error), status_code
+
+        scraper_id = data['scraper_id']
         parameters = data.get('parameters', {})
-        
-        if not scraper_id or scraper_id not in SCRAPER_CONFIGS:
-            return jsonify({'error': 'Invalid scraper ID'}), 400
-        
-        config = SCRAPER_CONFIGS[scraper_id]
-        
-        # Validate required parameters
-        for param_config in config['parameters']:
-            param_name = param_config['name']
-            if param_config.get('required', False) and param_name not in parameters:
-                return jsonify({'error': f'Parameter {param_name} is required'}), 400
-        
-        # Load and execute scraper
-        module = load_scraper_module(config['script_path'])
-        scraper_function = getattr(module, config['function_name'])
-        
-        # Execute scraper with appropriate parameters
-        if scraper_id in ['wikipedia']:
-            # Wikipedia uses max_results instead of max_pages
-            result = scraper_function(
-                search_term=parameters.get('search_term'),
-                max_results=int(parameters.get('max_results', 1))
-            )
-        else:
-            # E-commerce scrapers use max_pages
-            result = scraper_function(
-                search_term=parameters.get('search_term'),
-                max_pages=int(parameters.get('max_pages', 3))
+        cache_mode = data.get('cache', PREFER)
+
+        if cache_mode != BYPASS:
+            entry, freshness = result_cache.get(scraper_id, parameters)
+            if entry is not None:
+                refresh_job_id = None
+                if freshness == STALE:
+                    # Serve the stale result now and refresh it for the next caller
+                    refresh_job_id = refresh_in_background(scraper_id, parameters, entry)
+                return result_response(scraper_id, {
+                    'success': True,
+                    'data': entry.result,
+                    'cache': {
+                        'status': freshness,
+                        'age_seconds': round(entry.age(), 1),
+                        'refresh_job_id': refresh_job_id
+                    }
+                })
+            if cache_mode == ONLY:
+                return jsonify({'error': 'No cached result for these parameters', 'cache': {'status': 'miss'}}), 404
+
+        try:
+            job = job_manager.submit(
+                scraper_id, parameters,
+                lambda job: run_and_cache(scraper_id, parameters, cancel_event=job.cancel_event)
             )
-        
-        result['scraper_used'] = config['name']
-        result['execution_timestamp'] = datetime.now().isoformat()
-        
-        return jsonify({'success': True, 'data': result})
-        
+        except QueueFullError as e:
+            return jsonify({'error': str(e)}), 503
+
+        if not data.get('wait', False):
+            return job_response(job, 202)
+
+        # Synchronous mode for simple clients: block until the job is done
+        job_manager.wait(job.id)
+        if job.status == COMPLETED:
+            return result_response(job.scraper_id, {'success': True, 'job_id': job.id, 'data': job.result})
+        if job.status == CANCELLED:
+            return cancelled_response(job)
+        return jsonify({'error': job.error, 'trace': job.trace, 'job_id': job.id}), 500
+
     except Exception as e:
         error_trace = traceback.format_exc()
         return jsonify({'error': f'Scraping failed: {str(e)}', 'trace': error_trace}), 500
 
+def stream_scrape_events(scraper_id, parameters, cache_mode):
+    """Events for /api/scrape/stream: 'page' per parsed page, then 'summary' (or 'result' / 'error')"""
+    if cache_mode != BYPASS:
+        entry, freshness = result_cache.get(scraper_id, parameters)
+        if entry is not None:
+            refresh_job_id = None
+            if freshness == STALE:
+                refresh_job_id = refresh_in_background(scraper_id, parameters, entry)
+            cache_info = {'status': freshness, 'age_seconds': round(entry.age(), 1), 'refresh_job_id': refresh_job_id}
+            summary = {key: value for key, value in entry.result.items() if key != 'products'}
+            yield {'event': 'page', 'page': None, 'products': entry.result.get('products', [])}
+            yield {'event': 'summary', **summary, 'cache': cache_info}
+            return
+        if cache_mode == ONLY:
+            yield {'event': 'error', 'error': 'No cached result for these parameters', 'cache': {'status': 'miss'}}
+            return
+
+    config = SCRAPER_CONFIGS[scraper_id]
+    stream_function = scraper_registry.get_stream_function(scraper_id)
+    if stream_function is None:
+        # Scrapers without a generator send their whole result as one event
+        yield {'event': 'result', 'data': run_and_cache(scraper_id, parameters)}
+        return
+
+    products = []
+    started = time.perf_counter()
+    try:
+        for event in stream_function(**scraper_arguments(scraper_id, parameters)):
+            if event['event'] == 'page':
+                products.extend(event['products'])
+                # One transaction per page, so a long scrape is on disk as it goes
+                store_products(scraper_id, parameters, event['products'])
+            elif event['event'] == 'summary':
+                event['scraper_used'] = config['name']
+                event['execution_timestamp'] = datetime.now().isoformat()
+                record_scrape(scraper_id, 'error' if 'error' in event else 'completed', started)
+                if 'error' not in event:
+                    result = {key: value for key, value in event.items() if key != 'event'}
+                    result['products'] = products
+                    result_cache.store(scraper_id, parameters, result)
+            yield event
+    except Exception as e:
+        record_scrape(scraper_id, 'failed', started)
+        # Headers are already sent, so report the failure in-band
+        yield {'event': 'error', 'error': f'Scraping failed: {str(e)}', 'trace': traceback.format_exc()}
+
+def count_bytes(chunks, scraper_id):
+    """Pass stream chunks through, recording the streamed response size when it ends"""
+    size = 0
+    try:
+        for chunk in chunks:
+            size += len(chunk.encode('utf-8'))
+            yield chunk
+    finally:
+        metrics.RESPONSE_BYTES.labels(scraper_id).observe(size)
+
+@app.route('/api/scrape/stream', methods=['GET', 'POST'])
+def scrape_stream():
+    """Stream products page by page as Server-Sent Events (default) or NDJSON.
+
+    POST takes the same body as /api/scrape plus "format"; GET (for
+    EventSource) takes scraper_id, format, cache and the scraper parameters
+    as query arguments.
+    """
+    if request.method == 'GET':
+        args = request.args.to_dict()
+        data = {
+            'scraper_id': args.pop('scraper_id', None),
+            'format': args.pop('format', None),
+            'cache': args.pop('cache', PREFER),
+            'parameters': args
+        }
+    else:
+        data = request.get_json(silent=True)
+
+    validation_error = validate_scrape_request(data)
+    if validation_error:
+        error, status_code = validation_error
+        return jsonify(error), status_code
+
+    stream_format = pick_format(data.get('format'), request.headers.get('Accept'))
+    if stream_format is None:
+        return jsonify({'error': f"format must be one of {', '.join(STREAM_FORMATS)}"}), 400
+
+    events = stream_scrape_events(data['scraper_id'], data.get('parameters', {}), data.get('cache', PREFER))
+    return Response(
+        stream_with_context(count_bytes(encode_events(events, stream_format), data['scraper_id'])),
+        mimetype=MIMETYPES[stream_format],
+        headers=STREAM_HEADERS
+    )
+
+def run_batch_item(item, cache_mode, cancel_event=None):
+    """Fill in one batch item from the result cache or by running its scraper"""
+    if cache_mode != BYPASS:
+        entry, freshness = result_cache.get(item.scraper_id, item.parameters)
+        if entry is not None:
+            refresh_job_id = None
+            if freshness == STALE:
+                refresh_job_id = refresh_in_background(item.scraper_id, item.parameters, entry)
+            item.result = entry.result
+            item.cache = {'status': freshness, 'age_seconds': round(entry.age(), 1), 'refresh_job_id': refresh_job_id}
+            item.status = ITEM_COMPLETED
+            return
+        if cache_mode == ONLY:
+            item.status = ITEM_FAILED
+            item.error = 'No cached result for these parameters'
+            return
+
+    item.result = run_and_cache(item.scraper_id, item.parameters, cancel_event=cancel_event)
+    item.status = ITEM_CANCELLED if item.result.get('cancelled') else ITEM_COMPLETED
+
+def run_batch(job, items, cache_mode):
+    def report(finished):
+        job_manager.set_progress(job, {'finished': finished, 'total': len(items)})
+
+    report(0)
+    batch_scheduler.run(items, lambda item: run_batch_item(item, cache_mode, job.cancel_event),
+                        cancel_event=job.cancel_event, progress=report)
+    return {'items': [item.to_dict() for item in items], 'summary': summarize(items)}
+
+@app.route('/api/scrape/batch', methods=['POST'])
+def scrape_batch():
+    """Queue many (scraper_id, parameters) items as one job, run under per-site limits"""
+    try:
+        data = request.get_json(silent=True) or {}
+        raw_items = data.get('items')
+        cache_mode = data.get('cache', PREFER)
+
+        if not isinstance(raw_items, list) or not raw_items:
+            return jsonify({'error': 'items must be a non-empty list'}), 400
+        if len(raw_items) > MAX_BATCH_ITEMS:
+            return jsonify({'error': f'At most {MAX_BATCH_ITEMS} items per batch'}), 400
+
+        items = []
+        for index, raw_item in enumerate(raw_items):
+            if not isinstance(raw_item, dict):
+                return jsonify({'error': 'Invalid item', 'index': index}), 400
+            validation_error = validate_scrape_request({**raw_item, 'cache': cache_mode})
+            if validation_error:
+                error, status_code = validation_error
+                return jsonify({**error, 'index': index}), status_code
+            items.append(BatchItem(index, raw_item['scraper_id'], raw_item.get('parameters', {})))
+
+        try:
+            job = job_manager.submit(
+                'batch', {'items': len(items), 'cache': cache_mode},
+                lambda job: run_batch(job, items, cache_mode)
+            )
+        except QueueFullError as e:
+            return jsonify({'error': str(e)}), 503
+
+        if not data.get('wait', False):
+            return job_response(job, 202)
+
+        job_manager.wait(job.id)
+        if job.status == COMPLETED:
+            return result_response(job.scraper_id, {'success': True, 'job_id': job.id, 'data': job.result})
+        if job.status == CANCELLED:
+            return cancelled_response(job)
+        return jsonify({'error': job.error, 'trace': job.trace, 'job_id': job.id}), 500
+
+    except Exception as e:
+        error_trace = traceback.format_exc()
+        return jsonify({'error': f'Batch failed: {str(e)}', 'trace': error_trace}), 500
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    jobs = [job.to_dict() for job in job_manager.list_jobs()]
+    return jsonify({'jobs': jobs, 'queue': job_manager.stats()})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job status, including the result once completed"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return job_response(job)
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Scrape result in the same shape as the synchronous API; 202 while still running"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status == COMPLETED:
+        return result_response(job.scraper_id, {'success': True, 'job_id': job.id, 'data': job.result})
+    if job.status == FAILED:
+        return jsonify({'error': job.error, 'trace': job.trace, 'job_id': job.id}), 500
+    if job.status == CANCELLED:
+        return cancelled_response(job)
+    return jsonify({'job_id': job.id, 'status': job.status}), 202
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return job_response(job)
+
+def time_argument(name):
+    """Query argument name as unix seconds (number or ISO 8601), None when absent; ValueError when malformed"""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        return product_store.parse_time(value)
+    except ValueError:
+        raise ValueError(f'{name} must be unix seconds or an ISO 8601 date/time')
+
+@app.route('/api/products', methods=['GET'])
+def list_stored_products():
+    """Stored products a search term returned: search_term, optional site, since and limit"""
+    if product_db is None:
+        return jsonify({'error': 'Product store is disabled'}), 503
+    search_term = request.args.get('search_term', '').strip()
+    if not search_term:
+        return jsonify({'error': 'search_term is required'}), 400
+    try:
+        since = time_argument('since')
+        limit = min(int(request.args.get('limit', 100)), 1000)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    products = product_db.term_products(search_term, site=request.args.get('site') or None, since=since, limit=limit)
+    return jsonify({'search_term': search_term, 'count': len(products), 'products': products})
+
+def number_argument(name):
+    """Query argument name as a float, None when absent; ValueError when malformed"""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f'{name} must be a number')
+
+@app.route('/api/products/search', methods=['GET'])
+def search_stored_products():
+    """Full-text search over every stored product: q, plus optional site, min_price, max_price, min_rating,
+    since or max_age (seconds) and limit"""
+    if product_db is None:
+        return jsonify({'error': 'Product store is disabled'}), 503
+    text = request.args.get('q', '').strip()
+    if not text:
+        return jsonify({'error': 'q is required'}), 400
+    try:
+        since = time_argument('since')
+        max_age = number_argument('max_age')
+        if max_age is not None:
+            since = max(since or 0, time.time() - max_age)
+        filters = {name: number_argument(name) for name in ('min_price', 'max_price', 'min_rating')}
+        limit = min(int(request.args.get('limit', 50)), 500)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    products = product_db.search(text, site=request.args.get('site') or None, since=since, limit=limit, **filters)
+    return jsonify({'q': text, 'count': len(products), 'products': products})
+
+@app.route('/api/products/<site>/<path:product_id>', methods=['GET'])
+def get_stored_product(site, product_id):
+    """A stored product with its price history (since / until), and the price in effect at a time with at"""
+    if product_db is None:
+        return jsonify({'error': 'Product store is disabled'}), 503
+    product = product_db.get_product(site, product_id)
+    if product is None:
+        return jsonify({'error': 'Product not found'}), 404
+    try:
+        since, until, at = time_argument('since'), time_argument('until'), time_argument('at')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    product['price_history'] = product_db.price_history(site, product_id, since=since, until=until)
+    if at is not None:
+        product['price_at'] = product_db.price_at(site, product_id, at)
+    return jsonify(product)
+
+def loaded_matcher():
+    """The matching index, after indexing everything in the product store once"""
+    global matcher_loaded
+    if not matcher_loaded:
+        with matcher_load_lock:
+            if not matcher_loaded and product_db is not None:
+                started = time.perf_counter()
+                count = product_matcher.add_stored(product_db.iter_products())
+                logger.info(f"Indexed {count} stored products for matching in {time.perf_counter() - started:.1f}s")
+            matcher_loaded = True
+    return product_matcher
+
+@app.route('/api/matches', methods=['GET'])
+def list_matches():
+    """Clusters of the same product across sites: optional min_sites (default 2), site, q and limit"""
+    try:
+        min_sites = int(request.args.get('min_sites', 2))
+        limit = min(int(request.args.get('limit', 100)), 1000)
+    except ValueError:
+        return jsonify({'error': 'min_sites and limit must be integers'}), 400
+    clusters = loaded_matcher().clusters(min_sites=min_sites, site=request.args.get('site') or None,
+                                         text=request.args.get('q'), limit=limit)
+    return jsonify({'count': len(clusters), 'clusters': clusters})
+
+@app.route('/api/matches/<site>/<path:product_id>', methods=['GET'])
+def get_match(site, product_id):
+    """The cluster a product belongs to, with the price range and cheapest listing across sites"""
+    cluster = loaded_matcher().cluster_of(site, product_id)
+    if cluster is None:
+        return jsonify({'error': 'Product not found'}), 404
+    return jsonify(cluster)
+
+def fetch_engine_stats():
+    """Response cache counters and per-domain rate limits, once a scraper has loaded the shared fetch engine"""
+    fetch_engine = sys.modules.get('fetch_engine')
+    if fetch_engine is None:
+        return {'response_cache': None, 'rate_limits': None}
+    engine = fetch_engine.get_engine()
+    return {'response_cache': engine.cache_stats(), 'rate_limits': engine.rate_limit_stats()}
+
+def selector_stats_module():
+    """The shared extraction_schema module, once a scraper has loaded it"""
+    return sys.modules.get('extraction_schema')
+
+@app.route('/api/selectors', methods=['GET'])
+def get_selector_stats():
+    """Per-site, per-field selector hit counts and the order selectors are currently tried in"""
+    extraction_schema = selector_stats_module()
+    if extraction_schema is None:
+        return jsonify({'sites': {}, 'drifted': [], 'persisted_to': None})
+    stats = extraction_schema.selector_stats
+    return jsonify({
+        'sites': stats.snapshot(),
+        'drifted': stats.drifted(),
+        'persisted_to': stats.path,
+        'idle_limit': extraction_schema.SELECTOR_IDLE_LIMIT
+    })
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Request, parse, extraction and response timings in the Prometheus text format"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'available_scrapers': list(SCRAPER_CONFIGS.keys())
+        # Jobs, caches and metrics below are this worker process's own under gunicorn
+        'worker_pid': os.getpid(),
+        'available_scrapers': list(SCRAPER_CONFIGS.keys()),
+        'loaded_modules': scraper_registry.status(),
+        'job_queue': job_manager.stats(),
+        **fetch_engine_stats(),
+        'result_cache': result_cache.stats(),
+        'product_store': product_db.stats() if product_db is not None else None,
+        'product_matcher': product_matcher.stats(),
+        'drifted_selectors': selector_stats_module().selector_stats.drifted() if selector_stats_module() else []
     })
 
 @app.route('/api/test', methods=['GET'])
@@ -133,7 +703,7 @@ def root():
     return jsonify({
         'message': 'Multi-Platform Scraper API',
         'version': '1.0',
-        'endpoints': ['/api/scrapers', '/api/scrape', '/api/health', '/api/test']
+        'endpoints': ['/api/scrapers', '/api/scrapers/reload', '/api/scrape', '/api/scrape/stream', '/api/scrape/batch', '/api/jobs', '/api/products', '/api/matches', '/api/selectors', '/api/metrics', '/api/health', '/api/test']
     })
 
 if __name__ == '__main__':
@@ -141,9 +711,13 @@ if __name__ == '__main__':
     print("📡 Backend API will be available at: http://localhost:5001")
     print("🌐 Make sure frontend is also running at: http://localhost:3000")
     print("Press Ctrl+C to stop the server")
+    print("Development server only: use ./start_backend_production.sh (gunicorn) in production")
     print("-" * 50)
     
     try:
+        # The reloader re-imports app.py in a child process, so only preload there
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            scraper_registry.preload()
         app.run(debug=True, host='127.0.0.1', port=5001)
     except KeyboardInterrupt:
         print("\n👋 Server stopped by user")
@@ -0,0 +1,137 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+from search_summary import product_summary
+
+logger = logging.getLogger(__name__)
+
+# Per-item outcomes in a batch result
+ITEM_COMPLETED = 'completed'
+ITEM_FAILED = 'failed'
+ITEM_CANCELLED = 'cancelled'
+
+
+class BatchItem:
+    def __init__(self, index, scraper_id, parameters):
+        self.index = index
+        self.scraper_id = scraper_id
+        self.parameters = parameters
+        self.status = None
+        self.result = None
+        self.error = None
+        self.cache = None
+
+    def to_dict(self):
+        data = {
+            'index': self.index,
+            'scraper_id': self.scraper_id,
+            'parameters': self.parameters,
+            'status': self.status
+        }
+        if self.result is not None:
+            data['data'] = self.result
+        if self.error:
+            data['error'] = self.error
+        if self.cache:
+            data['cache'] = self.cache
+        return data
+
+
+class BatchScheduler:
+    """Runs batches of scrape items under process-wide per-site concurrency limits.
+
+    Every batch shares the same per-scraper semaphores, so two batches (or a
+    batch with hundreds of Amazon terms) never run more than ``site_limit``
+    Amazon scrapes at once, while items for other sites keep going. Pages
+    themselves are fetched through the shared fetch engine, so connection
+    pools are reused across items and batches.
+    """
+
+    def __init__(self, site_limit=2, site_limits=None):
+        self.site_limit = site_limit
+        self.site_limits = dict(site_limits or {})
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, scraper_id):
+        with self._lock:
+            semaphore = self._semaphores.get(scraper_id)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.site_limits.get(scraper_id, self.site_limit))
+                self._semaphores[scraper_id] = semaphore
+            return semaphore
+
+    def run(self, items, run_item, cancel_event=None, progress=None):
+        """Run ``run_item(item)`` for every item and return them in submission order.
+
+        Each site gets its own lanes (up to its limit) pulling from that
+        site's queue, so a site stuck in rate-limit backoff only idles its
+        own lanes. run_item fills in the item's status/result; exceptions
+        mark it failed. Items not yet started when cancel_event is set are
+        marked cancelled. ``progress`` (if given) is called with the number
+        of finished items.
+        """
+        queues = {}
+        for item in items:
+            queues.setdefault(item.scraper_id, deque()).append(item)
+
+        finished = {'count': 0}
+        finished_lock = threading.Lock()
+
+        def execute(item):
+            if cancel_event is not None and cancel_event.is_set():
+                item.status = ITEM_CANCELLED
+                return
+            # Shared with other batches running at the same time
+            with self._semaphore(item.scraper_id):
+                try:
+                    run_item(item)
+                except Exception as e:
+                    logger.error(f"Batch item {item.index} ({item.scraper_id}) failed: {e}")
+                    item.status = ITEM_FAILED
+                    item.error = f'Scraping failed: {str(e)}'
+
+        def lane(queue):
+            while True:
+                try:
+                    item = queue.popleft()
+                except IndexError:
+                    return
+                execute(item)
+                if progress is not None:
+                    with finished_lock:
+                        finished['count'] += 1
+                        progress(finished['count'])
+
+        lanes = []
+        for scraper_id, queue in queues.items():
+            limit = self.site_limits.get(scraper_id, self.site_limit)
+            lanes.extend([queue] * min(limit, len(queue)))
+
+        if lanes:
+            with ThreadPoolExecutor(max_workers=len(lanes), thread_name_prefix='batch-lane') as executor:
+                list(executor.map(lane, lanes))
+
+        return items
+
+    def stats(self):
+        return {
+            'site_limit': self.site_limit,
+            'site_limits': self.site_limits
+        }
+
+
+def summarize(items):
+    """Item counts per status, plus price / rating / discount statistics over every product the batch found"""
+    counts = {}
+    products = []
+    for item in items:
+        counts[item.status] = counts.get(item.status, 0) + 1
+        if item.status == ITEM_COMPLETED and item.result:
+            products.extend(item.result.get('products', []))
+    summary = {'total': len(items), 'statuses': counts}
+    if products:
+        summary['products'], _ = product_summary(products)
+    return summary
@@ -0,0 +1,125 @@
+"""gunicorn settings for running the backend in production
+
+    gunicorn -c backend/gunicorn.conf.py
+
+(or ./start_backend_production.sh). Workers are forked from a master that
+has already imported the app (wsgi.py), and each worker serves requests on
+a pool of threads, so a slow scrape holds one thread, not the server.
+Configured through the environment:
+
+    BACKEND_BIND              address to listen on (default 127.0.0.1:5001)
+    BACKEND_WORKERS           worker processes (default 1)
+    BACKEND_THREADS           request threads per worker (default 8)
+    BACKEND_TIMEOUT           seconds a silent worker gets before it is restarted (default 120)
+    BACKEND_GRACEFUL_TIMEOUT  seconds a stopping worker gets, from the signal, to finish requests and running jobs (default 120)
+
+Job state is shared by the workers through SQLite (SCRAPER_JOB_DB), and
+metrics through PROMETHEUS_MULTIPROC_DIR (a fresh temporary directory
+unless set); cached results and the matching index live in the worker
+that handled the request. See the README before raising BACKEND_WORKERS.
+"""
+import gc
+import glob
+import os
+import shutil
+import signal
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+wsgi_app = 'wsgi:app'
+chdir = BACKEND_DIR
+
+bind = os.environ.get('BACKEND_BIND', '127.0.0.1:5001')
+workers = int(os.environ.get('BACKEND_WORKERS', 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('BACKEND_THREADS', 8))
+
+# Import the app once in the master and share it with the workers
+preload_app = True
+
+# Streaming scrapes keep a request open for minutes, but gthread workers keep heartbeating while they run
+timeout = int(os.environ.get('BACKEND_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('BACKEND_GRACEFUL_TIMEOUT', 120))
+keepalive = 5
+
+# Every worker writes its metric samples to this directory and /api/metrics adds them up (see metrics.py).
+# It must be set before the app, and with it prometheus_client, is imported, and hold nothing from an earlier run.
+METRICS_DIR_CREATED = not os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+if METRICS_DIR_CREATED:
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='scraper-metrics-')
+else:
+    for path in glob.glob(os.path.join(os.environ['PROMETHEUS_MULTIPROC_DIR'], '*.db')):
+        os.remove(path)
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('BACKEND_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    # Objects the master loaded are never collected, so collections in a worker don't write to (and copy) their pages
+    gc.freeze()
+
+
+# Seconds of the graceful timeout left for the worker to exit after its jobs are drained, before the master kills it
+EXIT_MARGIN = 2
+
+
+def start_drain(worker):
+    """Stop the worker's job manager when the worker is told to stop, and note when"""
+    import app as backend
+
+    if getattr(worker, 'drain_started', None) is None:
+        worker.drain_started = time.monotonic()
+        backend.job_manager.stop()
+
+
+def post_worker_init(worker):
+    # gunicorn has no hook for SIGTERM (graceful stop): wrap the worker's handler so running
+    # jobs are drained alongside the requests in flight rather than after them
+    handle_exit = worker.handle_exit
+
+    def handle_exit_and_drain(sig, frame):
+        start_drain(worker)
+        handle_exit(sig, frame)
+
+    signal.signal(signal.SIGTERM, handle_exit_and_drain)
+
+
+def worker_int(worker):
+    start_drain(worker)
+
+
+def child_exit(server, worker):
+    # A replaced worker's counters still count; this only retires its live samples
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def on_exit(server):
+    if METRICS_DIR_CREATED:
+        shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+
+
+def worker_abort(worker):
+    start_drain(worker)
+
+
+def worker_exit(server, worker):
+    """Let scrape jobs already running in a stopping worker finish, within what is left of the graceful timeout"""
+    # The master also calls this when it reaps a dead worker; its own job manager must keep running
+    if worker.pid != os.getpid():
+        return
+    import app as backend
+
+    start_drain(worker)
+    elapsed = time.monotonic() - worker.drain_started
+    remaining = max(0, server.cfg.graceful_timeout - EXIT_MARGIN - elapsed)
+    for job in backend.job_manager.drain(timeout=remaining):
+        server.log.warning(f"Worker {worker.pid} abandoning job {job.id} ({job.scraper_id} {job.parameters}, "
+                           f"running since {job.started_at}): graceful timeout reached, cancelled")
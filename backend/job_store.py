@@ -0,0 +1,212 @@
+"""SQLite record of scrape jobs, shared by every gunicorn worker.
+
+A job runs on the thread pool of the worker that accepted it, but the
+client's next request for it (status, result, cancel) can reach any
+worker. JobManager writes each job's state here whenever it changes, so
+any worker can answer for any job. A cancel for a job that another
+worker runs is recorded as a request the owning worker picks up
+(pending_cancels), since only that worker can signal the job's thread.
+"""
+import json
+import os
+import sqlite3
+import threading
+import weakref
+import logging
+
+from product_record import dumps
+
+logger = logging.getLogger(__name__)
+
+# Database file; unset uses backend/jobs.db, 'off' keeps jobs in the worker's memory (one worker only)
+DB_PATH = os.environ.get('SCRAPER_JOB_DB') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs.db')
+DISABLED_VALUES = ('off', '0', 'false')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    worker_pid INTEGER NOT NULL,
+    scraper_id TEXT NOT NULL,
+    parameters TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    finished_ts REAL,
+    progress TEXT,
+    error TEXT,
+    trace TEXT,
+    result TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_worker ON jobs (worker_pid, cancel_requested);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_ts);
+"""
+
+# cancel_requested is left alone: a request from another worker must survive the owner's next write
+UPSERT_JOB = """
+INSERT INTO jobs (job_id, worker_pid, scraper_id, parameters, status, created_at, started_at, finished_at,
+                  finished_ts, progress, error, trace, result)
+VALUES (:job_id, :worker_pid, :scraper_id, :parameters, :status, :created_at, :started_at, :finished_at,
+        :finished_ts, :progress, :error, :trace, :result)
+ON CONFLICT (job_id) DO UPDATE SET
+    status = excluded.status,
+    started_at = excluded.started_at,
+    finished_at = excluded.finished_at,
+    finished_ts = excluded.finished_ts,
+    progress = excluded.progress,
+    error = excluded.error,
+    trace = excluded.trace,
+    result = COALESCE(excluded.result, jobs.result)
+"""
+
+# Columns of a job listing; results can be large and are only read for a single job
+LIST_COLUMNS = ('job_id', 'worker_pid', 'scraper_id', 'parameters', 'status', 'created_at', 'started_at',
+                'finished_at', 'finished_ts', 'progress', 'error', 'cancel_requested')
+
+
+def _json_or_none(text):
+    return None if text is None else json.loads(text)
+
+
+def worker_alive(pid):
+    """Whether a process with this pid is running (on this machine)"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """Jobs in one SQLite file; each thread gets its own connection, closed across a fork like ProductStore's"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript(SCHEMA)
+        _open_stores.add(self)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            self._local.connection = None
+            connection.close()
+
+    def save(self, job, finished_ts=None):
+        """Write job's current state; its result only once it is set"""
+        row = {
+            'job_id': job.id,
+            'worker_pid': os.getpid(),
+            'scraper_id': job.scraper_id,
+            'parameters': dumps(job.parameters),
+            'status': job.status,
+            'created_at': job.created_at,
+            'started_at': job.started_at,
+            'finished_at': job.finished_at,
+            'finished_ts': finished_ts,
+            'progress': None if job.progress is None else dumps(job.progress),
+            'error': job.error,
+            'trace': job.trace,
+            'result': None if job.result is None else dumps(job.result)
+        }
+        with self._connection() as connection:
+            connection.execute(UPSERT_JOB, row)
+
+    def load(self, job_id):
+        """Row of one job as a dict with its JSON columns decoded, None if unknown"""
+        row = self._connection().execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return None if row is None else self._decode(row)
+
+    def list(self, exclude_worker=None):
+        """Rows of every job (results left out), oldest first; exclude_worker skips one worker's jobs"""
+        rows = self._connection().execute(
+            f"SELECT {', '.join(LIST_COLUMNS)} FROM jobs WHERE worker_pid IS NOT ? ORDER BY created_at",
+            (exclude_worker,)
+        ).fetchall()
+        return [self._decode(row) for row in rows]
+
+    @staticmethod
+    def _decode(row):
+        data = dict(row)
+        data['parameters'] = _json_or_none(data['parameters'])
+        data['progress'] = _json_or_none(data['progress'])
+        if 'result' in data:
+            data['result'] = _json_or_none(data['result'])
+        return data
+
+    def request_cancel(self, job_id, unfinished):
+        """Ask the worker running job_id to cancel it; False when it is not in one of the unfinished states"""
+        placeholders = ', '.join('?' * len(unfinished))
+        with self._connection() as connection:
+            cursor = connection.execute(
+                f'UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status IN ({placeholders})',
+                (job_id, *unfinished)
+            )
+        return cursor.rowcount > 0
+
+    def pending_cancels(self, worker_pid, unfinished):
+        """IDs of this worker's unfinished jobs that another worker asked to cancel"""
+        placeholders = ', '.join('?' * len(unfinished))
+        rows = self._connection().execute(
+            f'SELECT job_id FROM jobs WHERE worker_pid = ? AND cancel_requested = 1 AND status IN ({placeholders})',
+            (worker_pid, *unfinished)
+        ).fetchall()
+        return [row['job_id'] for row in rows]
+
+    def fail_orphans(self, unfinished, status, finished_at, finished_ts):
+        """Mark unfinished jobs of workers that have exited as status; returns how many"""
+        placeholders = ', '.join('?' * len(unfinished))
+        connection = self._connection()
+        pids = [row[0] for row in connection.execute(
+            f'SELECT DISTINCT worker_pid FROM jobs WHERE status IN ({placeholders})', unfinished
+        )]
+        dead = [pid for pid in pids if pid != os.getpid() and not worker_alive(pid)]
+        if not dead:
+            return 0
+        with connection:
+            cursor = connection.execute(
+                f"""UPDATE jobs SET status = ?, error = 'Worker exited before the job finished',
+                        finished_at = ?, finished_ts = ?
+                    WHERE status IN ({placeholders}) AND worker_pid IN ({', '.join('?' * len(dead))})""",
+                (status, finished_at, finished_ts, *unfinished, *dead)
+            )
+        return cursor.rowcount
+
+    def prune(self, cutoff):
+        """Delete jobs that finished before cutoff (unix seconds)"""
+        with self._connection() as connection:
+            connection.execute('DELETE FROM jobs WHERE finished_ts < ?', (cutoff,))
+
+
+# Stores whose connections are closed before a fork
+_open_stores = weakref.WeakSet()
+
+
+def _close_before_fork():
+    for store in list(_open_stores):
+        store.close()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=_close_before_fork)
+
+
+def open_store(path=DB_PATH):
+    """JobStore at path, or None when path is 'off'"""
+    if not path or path.lower() in DISABLED_VALUES:
+        return None
+    return JobStore(path)
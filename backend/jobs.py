@@ -0,0 +1,373 @@
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLING = 'cancelling'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+UNFINISHED_STATES = (QUEUED, RUNNING, CANCELLING)
+
+# Seconds between checks for cancels of this worker's jobs asked through the store, and between
+# reads of the store while waiting for another worker's job
+STORE_POLL_SECONDS = 1.0
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity or the manager is draining"""
+
+
+class Job:
+    def __init__(self, scraper_id, parameters):
+        self.id = uuid.uuid4().hex
+        self.scraper_id = scraper_id
+        self.parameters = parameters
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.trace = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self.finished_monotonic = None
+        # Optional progress dict set by long-running jobs such as batches
+        self.progress = None
+        self.cancel_event = threading.Event()
+        self.done_event = threading.Event()
+        self.future = None
+
+    @classmethod
+    def from_store(cls, row):
+        """Job for a job store row, for reporting a job that another worker runs"""
+        job = cls.__new__(cls)
+        job.id = row['job_id']
+        job.scraper_id = row['scraper_id']
+        job.parameters = row['parameters']
+        job.status = row['status']
+        job.result = row.get('result')
+        job.error = row['error']
+        job.trace = row.get('trace')
+        job.created_at = row['created_at']
+        job.started_at = row['started_at']
+        job.finished_at = row['finished_at']
+        job.finished_monotonic = None
+        job.progress = row['progress']
+        job.cancel_event = threading.Event()
+        job.done_event = threading.Event()
+        job.future = None
+        if row['cancel_requested'] and not job.is_finished:
+            # The owning worker has not picked the request up yet
+            job.cancel_event.set()
+            job.status = CANCELLING
+        if job.is_finished:
+            job.done_event.set()
+        return job
+
+    @property
+    def is_finished(self):
+        return self.status in FINISHED_STATES
+
+    def to_dict(self, include_result=False):
+        data = {
+            'job_id': self.id,
+            'scraper_id': self.scraper_id,
+            'parameters': self.parameters,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+        if self.progress is not None:
+            data['progress'] = self.progress
+        if self.error:
+            data['error'] = self.error
+        if include_result and (self.status == COMPLETED or self.result is not None):
+            data['data'] = self.result
+        return data
+
+
+class JobManager:
+    """Runs scrape jobs on a bounded thread pool and keeps their state for polling.
+
+    At most ``max_workers`` jobs run at once and at most ``max_pending`` more
+    wait in the queue; further submissions raise QueueFullError. Finished
+    jobs are kept for ``retention_seconds`` so clients can collect results.
+    ``stop`` and ``drain`` stop the manager for a graceful shutdown.
+
+    With a ``store`` (job_store.JobStore shared by the gunicorn workers),
+    every state change is written there too. Any worker can then report,
+    wait for and cancel a job another worker runs; the queue limits stay
+    per worker.
+    """
+
+    def __init__(self, max_workers=4, max_pending=100, retention_seconds=3600, store=None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scrape-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+        # Store writes are serialized so that the last one always carries the job's latest state
+        self._store_lock = threading.Lock()
+        self._draining = False
+        # Started by the first submit, so it runs in the worker rather than in gunicorn's preloading master
+        self._cancel_watcher = None
+
+    def submit(self, scraper_id, parameters, function):
+        """Queue ``function(job)`` and return the Job tracking it"""
+        job = Job(scraper_id, parameters)
+
+        with self._lock:
+            if self._draining:
+                raise QueueFullError("Server is shutting down")
+            self._prune_finished()
+            active = sum(1 for j in self._jobs.values() if not j.is_finished)
+            if active >= self.max_workers + self.max_pending:
+                raise QueueFullError(f"Job queue is full ({active} active jobs)")
+            self._jobs[job.id] = job
+            # Stored before it can start, so the queued row never overwrites a running one
+            self._persist(job)
+            job.future = self._executor.submit(self._run, job, function)
+
+        self._start_cancel_watcher()
+        self._prune_store()
+        logger.info(f"Queued job {job.id} for scraper '{scraper_id}'")
+        return job
+
+    def _run(self, job, function):
+        with self._lock:
+            if job.cancel_event.is_set():
+                self._finish(job, CANCELLED)
+            else:
+                job.status = RUNNING
+                job.started_at = datetime.now().isoformat()
+        self._persist(job)
+        if job.is_finished:
+            return
+
+        try:
+            result = function(job)
+        except Exception as e:
+            with self._lock:
+                job.error = f'Scraping failed: {str(e)}'
+                job.trace = traceback.format_exc()
+                self._finish(job, CANCELLED if job.cancel_event.is_set() else FAILED)
+            self._persist(job)
+            logger.error(f"Job {job.id} failed: {e}")
+            return
+
+        with self._lock:
+            # A job cancelled while running returns what it got before it stopped, kept as its partial result
+            job.result = result
+            self._finish(job, CANCELLED if job.cancel_event.is_set() else COMPLETED)
+        self._persist(job)
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished_at = datetime.now().isoformat()
+        job.finished_monotonic = time.monotonic()
+        job.done_event.set()
+
+    def _persist(self, job):
+        """Write job's state to the store, if there is one"""
+        if self.store is None:
+            return
+        with self._store_lock:
+            try:
+                self.store.save(job, finished_ts=time.time() if job.is_finished else None)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not store job {job.id}: {e}")
+
+    def set_progress(self, job, progress):
+        """Update a running job's progress dict, where every worker can read it"""
+        job.progress = progress
+        self._persist(job)
+
+    def _prune_finished(self):
+        cutoff = time.monotonic() - self.retention_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.is_finished and job.finished_monotonic < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _prune_store(self):
+        if self.store is None:
+            return
+        try:
+            self.store.prune(time.time() - self.retention_seconds)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not prune the job store: {e}")
+
+    def _stored(self, job_id):
+        """Job another worker runs (or ran), from the store; None if unknown"""
+        if self.store is None:
+            return None
+        try:
+            row = self.store.load(job_id)
+            if row is not None and row['status'] in UNFINISHED_STATES and row['worker_pid'] != os.getpid():
+                if self.store.fail_orphans(UNFINISHED_STATES, FAILED, datetime.now().isoformat(), time.time()):
+                    row = self.store.load(job_id)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read job {job_id} from the job store: {e}")
+            return None
+        return None if row is None else Job.from_store(row)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job if job is not None else self._stored(job_id)
+
+    def list_jobs(self):
+        with self._lock:
+            self._prune_finished()
+            jobs = list(self._jobs.values())
+        return jobs + self._other_workers_jobs()
+
+    def _other_workers_jobs(self):
+        if self.store is None:
+            return []
+        try:
+            self.store.fail_orphans(UNFINISHED_STATES, FAILED, datetime.now().isoformat(), time.time())
+            rows = self.store.list(exclude_worker=os.getpid())
+        except sqlite3.Error as e:
+            logger.warning(f"Could not list jobs from the job store: {e}")
+            return []
+        cutoff = time.time() - self.retention_seconds
+        return [Job.from_store(row) for row in rows if row['finished_ts'] is None or row['finished_ts'] >= cutoff]
+
+    def cancel(self, job_id):
+        """Cancel a job; queued jobs are dropped, running jobs are signalled to stop
+
+        A job run by another worker is cancelled through the store: its
+        worker picks the request up within STORE_POLL_SECONDS.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.is_finished:
+                changed = False
+            else:
+                changed = True
+                job.cancel_event.set()
+                if job.future.cancel():
+                    self._finish(job, CANCELLED)
+                else:
+                    job.status = CANCELLING
+        if changed:
+            self._persist(job)
+        if job is not None:
+            return job
+
+        if self.store is None:
+            return None
+        try:
+            self.store.request_cancel(job_id, UNFINISHED_STATES)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not request a cancel of job {job_id}: {e}")
+        return self._stored(job_id)
+
+    def _start_cancel_watcher(self):
+        if self.store is None or self._cancel_watcher is not None:
+            return
+        with self._lock:
+            if self._cancel_watcher is None:
+                self._cancel_watcher = threading.Thread(target=self._watch_cancels, name='job-cancels', daemon=True)
+                self._cancel_watcher.start()
+
+    def _watch_cancels(self):
+        """Cancel this worker's jobs when another worker records a cancel for them in the store"""
+        pid = os.getpid()
+        while True:
+            time.sleep(STORE_POLL_SECONDS)
+            try:
+                requested = self.store.pending_cancels(pid, UNFINISHED_STATES)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not read cancel requests from the job store: {e}")
+                continue
+            for job_id in requested:
+                with self._lock:
+                    job = self._jobs.get(job_id)
+                if job is not None and not job.cancel_event.is_set():
+                    logger.info(f"Cancelling job {job_id} at another worker's request")
+                    self.cancel(job_id)
+
+    def wait(self, job_id, timeout=None):
+        """Block until a job finishes; returns the job or None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            job.done_event.wait(timeout)
+            return job
+
+        # Another worker's job: follow it through the store
+        deadline = None if timeout is None else time.monotonic() + timeout
+        job = self._stored(job_id)
+        while job is not None and not job.is_finished:
+            remaining = STORE_POLL_SECONDS if deadline is None else min(STORE_POLL_SECONDS, deadline - time.monotonic())
+            if remaining <= 0:
+                break
+            time.sleep(remaining)
+            job = self._stored(job_id)
+        return job
+
+    def stats(self):
+        """Queue limits (per worker) and job counts per status, over every worker when there is a store"""
+        counts = {}
+        for job in self.list_jobs():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            'max_workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'jobs': counts
+        }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def stop(self):
+        """Stop taking jobs and cancel queued ones; returns the jobs still running"""
+        cancelled = []
+        with self._lock:
+            self._draining = True
+            for job in self._jobs.values():
+                if not job.is_finished and job.future.cancel():
+                    job.cancel_event.set()
+                    self._finish(job, CANCELLED)
+                    cancelled.append(job)
+            running = [job for job in self._jobs.values() if not job.is_finished]
+        for job in cancelled:
+            self._persist(job)
+        return running
+
+    def drain(self, timeout=None):
+        """stop, then wait up to timeout seconds for the running jobs
+
+        Returns the jobs still running when the wait ended; they are
+        cancelled, so they stop before their next page.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        running = self.stop()
+
+        if running:
+            logger.info(f"Waiting for {len(running)} running jobs to finish")
+        for job in running:
+            job.done_event.wait(None if deadline is None else max(0, deadline - time.monotonic()))
+        unfinished = [job for job in running if not job.is_finished]
+        for job in unfinished:
+            job.cancel_event.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        return unfinished
@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import OrderedDict
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Cache modes accepted by /api/scrape
+BYPASS = 'bypass'
+PREFER = 'prefer'
+ONLY = 'only'
+CACHE_MODES = (BYPASS, PREFER, ONLY)
+
+# Freshness of a cached result as reported to clients
+FRESH = 'fresh'
+STALE = 'stale'
+
+# Parameters that change how a scrape runs but not what it returns
+IGNORED_PARAMETERS = ('concurrency',)
+
+
+def normalize_parameters(parameters):
+    """Hashable key for scrape parameters: trimmed, lowercased, whitespace collapsed"""
+    normalized = []
+    for name, value in sorted(parameters.items()):
+        if name in IGNORED_PARAMETERS or value is None or value == '':
+            continue
+        if isinstance(value, str):
+            value = ' '.join(value.split()).lower()
+            # Numeric form fields arrive as strings from some clients
+            if value.isdigit():
+                value = int(value)
+        normalized.append((name, value))
+    return tuple(normalized)
+
+
+class CachedResult:
+    __slots__ = ('result', 'stored_at', 'refreshing', 'refresh_job_id')
+
+    def __init__(self, result, stored_at):
+        self.result = result
+        self.stored_at = stored_at
+        self.refreshing = False
+        self.refresh_job_id = None
+
+    def age(self, now=None):
+        return (now or time.time()) - self.stored_at
+
+
+class ResultCache:
+    """Size-bounded LRU of finished scrape results keyed on scraper + parameters.
+
+    A result is fresh for ``ttl`` seconds and may then be served stale (while
+    a background job refreshes it) until ``max_stale`` seconds old, after
+    which it is treated as missing.
+    """
+
+    def __init__(self, max_entries=200, ttl=900, max_stale=86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'refreshes': 0}
+
+    @staticmethod
+    def make_key(scraper_id, parameters):
+        return scraper_id, normalize_parameters(parameters)
+
+    def get(self, scraper_id, parameters):
+        """(entry, FRESH|STALE) for a usable cached result, or (None, None)"""
+        key = self.make_key(scraper_id, parameters)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.age(now) > self.max_stale:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._counters['misses'] += 1
+                return None, None
+            self._entries.move_to_end(key)
+            if entry.age(now) <= self.ttl:
+                self._counters['hits'] += 1
+                return entry, FRESH
+            self._counters['stale_hits'] += 1
+            return entry, STALE
+
+    def store(self, scraper_id, parameters, result):
+        key = self.make_key(scraper_id, parameters)
+        with self._lock:
+            self._entries[key] = CachedResult(result, time.time())
+            self._entries.move_to_end(key)
+            self._counters['stores'] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def claim_refresh(self, entry):
+        """Mark a stale entry as being refreshed; False if a refresh is already in flight"""
+        with self._lock:
+            if entry.refreshing:
+                return False
+            entry.refreshing = True
+            self._counters['refreshes'] += 1
+            return True
+
+    def release_refresh(self, entry):
+        with self._lock:
+            entry.refreshing = False
+            entry.refresh_job_id = None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+        stats['max_entries'] = self.max_entries
+        stats['ttl'] = self.ttl
+        stats['max_stale'] = self.max_stale
+        return stats
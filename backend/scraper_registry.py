@@ -0,0 +1,150 @@
+import importlib.util
+import os
+import sys
+import threading
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class ScraperRegistry:
+    """Imports each scraper script once and caches its entry-point function.
+
+    Modules are loaded lazily on first use (or eagerly via ``preload``) and
+    only re-executed when ``reload`` finds the script's mtime has changed.
+    """
+
+    def __init__(self, configs):
+        self.configs = configs
+        self._entries = {}
+        self._lock = threading.RLock()
+
+    def resolve_path(self, scraper_id):
+        """Absolute path of a scraper script, relative paths are taken from backend/"""
+        script_path = self.configs[scraper_id]['script_path']
+        return os.path.normpath(os.path.join(BACKEND_DIR, script_path))
+
+    def _load(self, scraper_id):
+        config = self.configs[scraper_id]
+        abs_path = self.resolve_path(scraper_id)
+        module_name = f"scraper_{scraper_id}"
+
+        # Scrapers import shared helpers (page_fetcher etc.) from their own directory
+        script_dir = os.path.dirname(abs_path)
+        if script_dir not in sys.path:
+            sys.path.insert(0, script_dir)
+
+        try:
+            mtime = os.path.getmtime(abs_path)
+            spec = importlib.util.spec_from_file_location(module_name, abs_path)
+            module = importlib.util.module_from_spec(spec)
+            previous = sys.modules.get(module_name)
+            sys.modules[module_name] = module
+            try:
+                spec.loader.exec_module(module)
+            except Exception:
+                if previous is not None:
+                    sys.modules[module_name] = previous
+                else:
+                    sys.modules.pop(module_name, None)
+                raise
+            function = getattr(module, config['function_name'])
+            # Optional generator variant used by the streaming endpoint
+            stream_function = getattr(module, config['stream_function_name']) if config.get('stream_function_name') else None
+        except Exception as e:
+            raise Exception(f"Failed to load module: {str(e)}")
+
+        entry = {
+            'module': module,
+            'function': function,
+            'stream_function': stream_function,
+            'path': abs_path,
+            'mtime': mtime,
+            'loaded_at': datetime.now().isoformat()
+        }
+        self._entries[scraper_id] = entry
+        logger.info(f"Loaded scraper module '{scraper_id}' from {abs_path}")
+        return entry
+
+    def _get_entry(self, scraper_id):
+        entry = self._entries.get(scraper_id)
+        if entry is not None:
+            return entry
+        with self._lock:
+            entry = self._entries.get(scraper_id)
+            if entry is None:
+                entry = self._load(scraper_id)
+            return entry
+
+    def get_module(self, scraper_id):
+        return self._get_entry(scraper_id)['module']
+
+    def get_function(self, scraper_id):
+        """Cached scrape_* callable for a scraper, importing its module on first use"""
+        return self._get_entry(scraper_id)['function']
+
+    def get_stream_function(self, scraper_id):
+        """Cached stream_* generator for a scraper, or None if it only has a scrape_* function"""
+        return self._get_entry(scraper_id)['stream_function']
+
+    def preload(self):
+        """Import every configured scraper up front, logging (not raising) failures"""
+        for scraper_id in self.configs:
+            try:
+                self._get_entry(scraper_id)
+            except Exception as e:
+                logger.error(f"Could not preload scraper '{scraper_id}': {e}")
+
+    def reload(self, scraper_id=None, force=False):
+        """Re-import scrapers whose script changed on disk since they were loaded.
+
+        Returns a dict of scraper_id -> 'reloaded' | 'unchanged' | 'not_loaded'
+        | error message.
+        """
+        scraper_ids = [scraper_id] if scraper_id else list(self.configs)
+        results = {}
+
+        with self._lock:
+            for sid in scraper_ids:
+                entry = self._entries.get(sid)
+                try:
+                    if entry is None and not force:
+                        results[sid] = 'not_loaded'
+                        continue
+                    current_mtime = os.path.getmtime(self.resolve_path(sid))
+                    if entry is not None and not force and current_mtime == entry['mtime']:
+                        results[sid] = 'unchanged'
+                        continue
+                    self._load(sid)
+                    results[sid] = 'reloaded'
+                except Exception as e:
+                    # Keep serving the previously loaded version
+                    logger.error(f"Reload of scraper '{sid}' failed: {e}")
+                    results[sid] = f"error: {e}"
+
+        return results
+
+    def status(self):
+        """Load state of each configured scraper"""
+        status = {}
+        for scraper_id in self.configs:
+            entry = self._entries.get(scraper_id)
+            if entry is None:
+                status[scraper_id] = {'loaded': False}
+                continue
+            try:
+                stale = os.path.getmtime(entry['path']) != entry['mtime']
+            except OSError:
+                stale = True
+            status[scraper_id] = {
+                'loaded': True,
+                'path': entry['path'],
+                'mtime': entry['mtime'],
+                'loaded_at': entry['loaded_at'],
+                'stale': stale
+            }
+        return status
+
@@ -0,0 +1,42 @@
+from product_record import dumps
+
+SSE = 'sse'
+NDJSON = 'ndjson'
+STREAM_FORMATS = (SSE, NDJSON)
+
+MIMETYPES = {
+    SSE: 'text/event-stream',
+    NDJSON: 'application/x-ndjson'
+}
+
+# Stop proxies (nginx) and browsers from buffering or caching the stream
+STREAM_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'
+}
+
+
+def pick_format(requested, accept_header):
+    """Stream format from an explicit ?format= / "format" value, else the Accept header"""
+    if requested:
+        return requested if requested in STREAM_FORMATS else None
+    if accept_header and 'application/x-ndjson' in accept_header:
+        return NDJSON
+    return SSE
+
+
+def format_sse(event):
+    """One Server-Sent Event; the event type goes in the event: field"""
+    payload = {key: value for key, value in event.items() if key != 'event'}
+    return f"event: {event['event']}\ndata: {dumps(payload)}\n\n"
+
+
+def format_ndjson(event):
+    return dumps(event) + '\n'
+
+
+def encode_events(events, stream_format):
+    """Serialize each event as it is produced, so nothing waits for the full result"""
+    formatter = format_sse if stream_format == SSE else format_ndjson
+    for event in events:
+        yield formatter(event)
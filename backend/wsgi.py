@@ -0,0 +1,19 @@
+"""WSGI entry point for production servers: gunicorn -c gunicorn.conf.py (see that file)
+
+With preload_app the gunicorn master imports this module once before
+forking its workers. Everything loaded here (Flask, NumPy, lxml, the
+scraper modules and the matching index built from the product store) is
+then shared copy-on-write by every worker instead of being imported
+again in each of them.
+"""
+import logging
+
+from app import app, scraper_registry, loaded_matcher
+
+logger = logging.getLogger(__name__)
+
+scraper_registry.preload()
+loaded_matcher()
+logger.info("Scrapers and the matching index are loaded, ready to fork workers")
+
+__all__ = ['app']
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Per-card extract_product_data time, excluding HTML parsing.
+
+Usage: python benchmarks/extract_benchmark.py [--sites amazon] [--backends bs4 lxml] [--repeat 5]
+
+Pages are parsed once up front (recorded pages from benchmarks/fixtures/<site>/
+when present, synthetic otherwise) and only the extraction over every product
+card is timed. Run it before and after a change to an extractor to compare.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import SITES, load_pages
+from html_parsing import available_backends, parse_html
+from parse_benchmark import get_scraper_class
+
+
+def time_extraction(scraper, cards, repeat):
+    """Best-of-repeat seconds per card"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for card in cards:
+            scraper.extract_product_data(card)
+        elapsed = (time.perf_counter() - start) / len(cards)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sites', nargs='+', default=SITES, choices=SITES)
+    parser.add_argument('--backends', nargs='+', default=available_backends())
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    print(f"{'site':<10} {'backend':<11} {'cards':>6} {'us/card':>9} {'ms/page':>9}")
+    for site in args.sites:
+        scraper = get_scraper_class(site)()
+        pages = load_pages(site)
+        for backend in args.backends:
+            cards = []
+            for _, content in pages:
+                cards.extend(scraper.find_product_containers(parse_html(content, backend)))
+            per_card = time_extraction(scraper, cards, args.repeat)
+            per_page = per_card * len(cards) / len(pages)
+            print(f"{site:<10} {backend:<11} {len(cards):>6} {per_card * 1e6:>9.1f} {per_page * 1000:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
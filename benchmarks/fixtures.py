@@ -0,0 +1,217 @@
+"""Search result page fixtures for the offline benchmarks.
+
+Recorded pages placed in benchmarks/fixtures/<site>/*.html (and Wikipedia
+API responses in benchmarks/fixtures/wikipedia/*.json) are used when
+present. Otherwise a deterministic synthetic page is generated whose product
+cards carry the markup each scraper's selectors look for, padded with
+page-level noise so pages land in the 500KB-1MB range of the live sites.
+"""
+import json
+import os
+import random
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+SITES = ['amazon', 'flipkart', 'snapdeal', 'jiomart']
+
+BRANDS = ['Lenovo', 'HP', 'Dell', 'Asus', 'Acer', 'Samsung', 'Apple', 'Boat', 'Noise', 'Britannia', 'Parle', 'Amul']
+NOUNS = ['Laptop', 'Smartphone', 'Headphones', 'Trousers', 'Biscuits', 'Monitor', 'Keyboard', 'Watch']
+
+
+def _noise(rng, size):
+    """Nested wrapper markup and inline text similar to real search pages"""
+    chunks = []
+    while size > 0:
+        depth = rng.randint(2, 6)
+        block = ''.join(f'<div class="a-section sg-col-{rng.randint(1, 24)} w{rng.randint(0, 999)}">' for _ in range(depth))
+        block += f'<span class="a-size-base a-color-secondary">{"lorem ipsum " * rng.randint(1, 6)}</span>'
+        block += '</div>' * depth
+        chunks.append(block)
+        size -= len(block)
+    return ''.join(chunks)
+
+
+def _product_name(rng, index):
+    return f"{rng.choice(BRANDS)} {rng.choice(NOUNS)} Model {index} with {rng.randint(4, 32)}GB"
+
+
+def amazon_card(rng, index):
+    asin = f"B0{index:08d}"
+    price = rng.randint(199, 99999)
+    mrp = price + rng.randint(0, 20000)
+    sponsored = '<span class="puis-sponsored-label-text">Sponsored</span>' if index % 7 == 0 else ''
+    return (
+        f'<div data-asin="{asin}" data-component-type="s-search-result" class="s-result-item s-asin">'
+        f'<div class="sg-col-inner">{_noise(rng, 2500)}'
+        f'<div class="s-product-image-container"><img class="s-image" src="https://m.media-amazon.com/images/I/{asin}.jpg" data-image-latency="s-product-image"></div>'
+        f'<div data-cy="title-recipe">{sponsored}<h2><a class="a-link-normal s-link-style" href="/dp/{asin}/ref=sr_1_{index}"><span>{_product_name(rng, index)}</span></a></h2></div>'
+        f'<div data-cy="reviews-ratings-slot"><span class="a-icon-alt">{rng.randint(30, 50) / 10} out of 5 stars</span></div>'
+        f'<a aria-label="{rng.randint(10, 90000):,} ratings" href="#"><span class="a-size-base s-underline-text">{rng.randint(10, 9000):,}</span></a>'
+        f'<div data-cy="price-recipe"><span class="a-price"><span class="a-offscreen">₹{price:,}</span><span class="a-price-whole">{price:,}</span></span>'
+        f'<span class="a-price a-text-price" data-a-strike="true"><span class="a-offscreen">₹{mrp:,}</span></span>'
+        f'<span>({rng.randint(5, 70)}% off)</span></div>'
+        f'<span class="a-badge-text">Limited time deal</span>'
+        f'<i class="a-icon a-icon-prime"></i>'
+        f'<div>FREE delivery Sat, 12 Oct\nOr fastest delivery Tomorrow, 10 Oct\n{rng.randint(1, 9)}K+ bought in past month</div>'
+        f'</div></div>'
+    )
+
+
+def flipkart_card(rng, index):
+    price = rng.randint(199, 99999)
+    mrp = price + rng.randint(0, 20000)
+    return (
+        f'<div data-id="MOB{index:012d}"><div class="_75nlfW">{_noise(rng, 2500)}'
+        f'<a class="CGtC98" href="/product-{index}/p/itm{index:010d}?pid=MOB{index:012d}&lid=LST{index}">'
+        f'<img class="DByuf4" src="https://rukminim2.flixcart.com/image/{index}.jpeg">'
+        f'<div class="KzDlHZ">{_product_name(rng, index)}</div>'
+        f'<div class="XQDdHH">{rng.randint(30, 50) / 10}</div>'
+        f'<span class="Wphh3N">{rng.randint(10, 90000):,} Ratings &amp; {rng.randint(1, 9000):,} Reviews</span>'
+        f'<div class="rgWa7D"><ul><li>8 GB RAM | 128 GB ROM</li><li>6.7 inch Display</li><li>50MP Camera</li></ul></div>'
+        f'<div class="Nx9bqj _4b5DiR">₹{price:,}</div><div class="yRaY8j ZYYwLA">₹{mrp:,}</div>'
+        f'<div class="UkUFwK"><span>{rng.randint(5, 70)}% off</span></div>'
+        f'<div class="_2Tpdn3">Free delivery</div>'
+        f'</a></div></div>'
+    )
+
+
+def snapdeal_card(rng, index):
+    pogid = f"{6400000000 + index}"
+    price = rng.randint(199, 9999)
+    mrp = price + rng.randint(0, 2000)
+    return (
+        f'<div class="col-xs-6 favDp product-tuple-listing js-tuple" id="{pogid}" pogid="{pogid}">{_noise(rng, 2000)}'
+        f'<div class="product-tuple-image"><a class="dp-widget-link" href="https://www.snapdeal.com/product/item-{index}/{pogid}">'
+        f'<picture><img class="product-image" src="https://g.sdlcdn.com/imgs/{pogid}.jpg"></picture></a></div>'
+        f'<div class="product-tuple-description"><div class="product-desc-rating">'
+        f'<a class="dp-widget-link" href="https://www.snapdeal.com/product/item-{index}/{pogid}">'
+        f'<p class="product-title" title="{_product_name(rng, index)}">{_product_name(rng, index)}</p></a>'
+        f'<span class="lfloat product-desc-price strike">Rs. {mrp}</span>'
+        f'<span class="lfloat product-price" id="display-price-{pogid}" data-price="{price}">Rs. {price}</span>'
+        f'<div class="product-discount"><span>{rng.randint(5, 70)}% Off</span></div>'
+        f'<div class="rating"><div class="filled-stars" style="width:{rng.randint(40, 100)}%"></div><p class="product-rating-count">({rng.randint(1, 999)})</p></div>'
+        f'<div class="color-attr" style="background: #{rng.randint(0, 0xFFFFFF):06x};"></div>'
+        f'<div class="sub-attr-value">{rng.randint(28, 40)}</div><div class="sub-attr-value hidden">42</div>'
+        f'<div class="nudge-below-text">{rng.randint(10, 500)} orders in last 7 days</div>'
+        f'</div></div></div>'
+    )
+
+
+def jiomart_card(rng, index):
+    price = rng.randint(10, 999)
+    mrp = price + rng.randint(0, 200)
+    name = _product_name(rng, index)
+    brand = name.split()[0]
+    return (
+        f'<li class="ais-InfiniteHits-item">{_noise(rng, 1500)}'
+        f'<a class="plp-card-wrapper" href="/p/groceries/item-{index}/{590000000 + index}" data-objid="{590000000 + index}">'
+        f'<div class="gtmEvents" data-name="{name}" data-id="{590000000 + index}" data-manu="{brand}" data-brandid="{index}" '
+        f'data-cate="Groceries" data-subcate="Snacks" data-l4category="Biscuits" data-vertical="GROCERIES" '
+        f'data-price="{price}" data-sellername="Reliance Retail" data-image="img{index}.jpg"></div>'
+        f'<div class="plp-card-image"><img src="https://www.jiomart.com/images/product/{index}.jpg"></div>'
+        f'<div class="plp-card-details-name">{name}</div>'
+        f'<div class="plp-card-details-price"><span class="jm-heading-xxs jm-mb-xxs">₹{price}.00</span>'
+        f'<span class="jm-body-xxs jm-fc-primary-grey-60 line-through">₹{mrp}.00</span></div>'
+        f'<div class="plp-card-details-discount"><span class="jm-badge">{rng.randint(5, 40)}% OFF</span></div>'
+        f'<div class="plp-card-foodtype"><img src="https://www.jiomart.com/assets/veg.svg"></div>'
+        f'</a></li>'
+    )
+
+
+CARD_BUILDERS = {
+    'amazon': amazon_card,
+    'flipkart': flipkart_card,
+    'snapdeal': snapdeal_card,
+    'jiomart': jiomart_card,
+}
+
+PAGE_TAILS = {
+    'snapdeal': '<input type="hidden" class="dp-info-collect" value="[]">',
+    'jiomart': '<button class="ais-InfiniteHits-loadMore">Load more</button>',
+}
+
+
+def snapdeal_hidden_input(count, seed=0):
+    """Snapdeal's input.dp-info-collect with count products in its k1-k9 value format"""
+    rng = random.Random(f"snapdeal-hidden-{seed}")
+    entries = []
+    for index in range(1, count + 1):
+        pogid = 6400000000 + index
+        price = rng.randint(199, 9999)
+        entries.append(
+            f"{{'k1': 'https://g.sdlcdn.com/imgs/{pogid}.jpg', 'k2': 'product/item-{index}/{pogid}', "
+            f"'k3': '{pogid}', 'k4': '{_product_name(rng, index)}', 'k5': '{rng.randint(5, 70)}', "
+            f"'k6': '{price + rng.randint(0, 2000)}', 'k7': '{price}', 'k8': '{rng.randint(30, 50) / 10}', 'k9': 'x'}}"
+        )
+    return f'<input type="hidden" class="dp-info-collect" value="[{", ".join(entries)}]">'
+
+
+def cards_html(site, count, seed=0, start=1):
+    """Product cards only, e.g. for extraction microbenchmarks; product ids are numbered from start"""
+    rng = random.Random(f"{site}-{seed}")
+    builder = CARD_BUILDERS[site]
+    return ''.join(builder(rng, index) for index in range(start, start + count))
+
+
+def synthetic_page(site, cards=48, page=1, noise_bytes=400000):
+    """A full search result page with the given number of product cards"""
+    rng = random.Random(f"{site}-page-{page}")
+    # Each page lists other products, as a site's later pages do
+    body = cards_html(site, cards, seed=page, start=(page - 1) * cards + 1)
+    tail = PAGE_TAILS.get(site, '')
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Search</title>'
+        f'<script>var config = {{"page": {page}, "payload": "{"x" * 20000}"}};</script>'
+        '<style>.a-section{margin:0}</style></head><body>'
+        f'<div id="nav">{_noise(rng, noise_bytes // 2)}</div>'
+        f'<div id="search"><div class="s-main-slot">{body}</div></div>{tail}'
+        f'<div id="footer">{_noise(rng, noise_bytes // 2)}</div>'
+        '</body></html>'
+    )
+
+
+def recorded_pages(site):
+    """Recorded pages for a site as (name, bytes), sorted by file name"""
+    site_dir = os.path.join(FIXTURES_DIR, site)
+    if not os.path.isdir(site_dir):
+        return []
+    pages = []
+    for name in sorted(os.listdir(site_dir)):
+        if name.endswith('.html'):
+            with open(os.path.join(site_dir, name), 'rb') as f:
+                pages.append((name, f.read()))
+    return pages
+
+
+def load_pages(site, synthetic_count=3):
+    """Recorded pages if any exist, otherwise synthetic ones"""
+    pages = recorded_pages(site)
+    if pages:
+        return pages
+    return [
+        (f'synthetic-page-{page}', synthetic_page(site, page=page).encode('utf-8'))
+        for page in range(1, synthetic_count + 1)
+    ]
+
+
+def wikipedia_response(term):
+    """Wikipedia search API JSON: the first recorded response if any, otherwise a synthetic one"""
+    site_dir = os.path.join(FIXTURES_DIR, 'wikipedia')
+    if os.path.isdir(site_dir):
+        for name in sorted(os.listdir(site_dir)):
+            if name.endswith('.json'):
+                with open(os.path.join(site_dir, name), 'rb') as f:
+                    return f.read()
+    rng = random.Random(f"wikipedia-{term}")
+    results = [
+        {
+            'ns': 0,
+            'title': f"{term.title()} ({index})" if index else term.title(),
+            'pageid': rng.randint(1000, 9999999),
+            'size': rng.randint(1000, 200000),
+            'wordcount': rng.randint(100, 20000),
+            'snippet': f'<span class="searchmatch">{term}</span> {"lorem ipsum " * 8}'
+        }
+        for index in range(10)
+    ]
+    return json.dumps({'batchcomplete': '', 'query': {'searchinfo': {'totalhits': 10}, 'search': results}}).encode('utf-8')
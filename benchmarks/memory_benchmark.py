@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Memory held by extracted products, and the time to encode them as JSON.
+
+Usage: python benchmarks/memory_benchmark.py [--sites amazon] [--count 10000]
+
+Extracts --count products per site from fixtures.cards_html and reports the
+memory the product list keeps alive (tracemalloc, after extraction, per
+10,000 products), split into the product containers and the field values
+they point to, plus the best-of-3 time product_record.dumps takes for the
+list, as the API serializes it.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import SITES, cards_html
+from html_parsing import parse_html
+from parse_benchmark import get_scraper_class
+from product_record import dumps
+
+PER = 10000
+
+
+def container_bytes(product):
+    """Size of the product record itself, plus its list fields, without the strings it points to"""
+    size = sys.getsizeof(product)
+    for value in product.values():
+        if isinstance(value, list):
+            size += sys.getsizeof(value)
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sites', nargs='+', default=SITES, choices=SITES)
+    parser.add_argument('--count', type=int, default=PER)
+    parser.add_argument('--backend', default=None, help='parser backend (default: SCRAPER_PARSER / fastest installed)')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    print(f"{'site':<10} {'products':>9} {'MB/10k':>8} {'objects MB/10k':>15} {'json ms/10k':>12}")
+    for site in args.sites:
+        scraper = get_scraper_class(site)()
+        root = parse_html(cards_html(site, args.count), args.backend)
+        cards = scraper.find_product_containers(root)
+
+        tracemalloc.start()
+        products = [scraper.extract_product_data(card) for card in cards]
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        objects = sum(container_bytes(product) for product in products)
+        encode = None
+        for _ in range(3):
+            start = time.perf_counter()
+            dumps(products)
+            elapsed = time.perf_counter() - start
+            encode = elapsed if encode is None else min(encode, elapsed)
+
+        scale = PER / len(products)
+        print(f"{site:<10} {len(products):>9} {retained * scale / 2 ** 20:>8.2f} {objects * scale / 2 ** 20:>15.2f} "
+              f"{encode * scale * 1000:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""Extractor microbenchmarks checked against recorded baselines.
+
+Usage: python benchmarks/micro_benchmark.py [--counts 10 100 10000] [--update] [--threshold 0.25]
+
+Times, per site and item count, extract_product_data over product cards,
+get_search_summary over extracted products, and
+SnapdealScraper.extract_hidden_data over the hidden input. Card markup
+comes from fixtures.cards_html, so counts are not limited by the saved
+pages. Each time is divided by a fixed pure-Python calibration loop.
+The loop is timed in rounds that alternate with the case's own rounds,
+and the median of the per-round ratios is kept, so a change in machine
+speed hits both sides of a ratio. This keeps baselines comparable across
+machines, and across load changes on a shared machine.
+
+Without --update, every case is compared with benchmarks/baselines.json.
+A case slower than its baseline by more than --threshold (default 25%)
+is measured once more and keeps the faster of its two measurements: a
+burst of load on a shared machine slows one measurement, a regression
+slows both. The script exits with status 1 if a case is still over the
+threshold. --update rewrites the baselines.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from fixtures import SITES, cards_html, snapdeal_hidden_input
+from html_parsing import parse_html, resolve_backend
+from parse_benchmark import get_scraper_class
+
+BASELINES_FILE = os.path.join(BENCHMARKS_DIR, 'baselines.json')
+
+DEFAULT_COUNTS = [10, 100, 10000]
+
+
+def calibration_workload():
+    # String, dict and arithmetic work, roughly the mix extraction code does
+    counts = {}
+    for i in range(60000):
+        key = f"item-{i % 512}"
+        counts[key] = counts.get(key, 0) + len(key.strip().lower()) * i % 7
+    return counts
+
+
+def loops_for(function, min_time=0.1):
+    """(calls, seconds) of a round of function that lasts at least min_time"""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return loops, elapsed
+        loops *= 2
+
+
+def seconds_per_call(function, loops):
+    # As timeit does, keep garbage collection out of the timing; with 10k
+    # cards alive its passes dominate the differences between rounds
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        return (time.perf_counter() - start) / loops
+    finally:
+        gc.enable()
+
+
+def calibrated(function, rounds):
+    """(seconds per call, calibration seconds) of the round with the median ratio of the two
+
+    Each round times the calibration loop, then function, so both halves
+    of a ratio see the same machine speed.
+    """
+    calibration_loops, _ = loops_for(calibration_workload)
+    loops, _ = loops_for(function)
+    pairs = []
+    for _ in range(rounds):
+        calibration = seconds_per_call(calibration_workload, calibration_loops)
+        pairs.append((seconds_per_call(function, loops), calibration))
+    pairs.sort(key=lambda pair: pair[0] / pair[1])
+    return pairs[(len(pairs) - 1) // 2]
+
+
+def repeats_for(count, repeat):
+    # The 10k cases take seconds each; fewer rounds keep the suite usable, an odd number keeps a middle ratio
+    return repeat if count <= 1000 else max(1, repeat // 2) | 1
+
+
+def run_cases(sites, counts, backend, repeat, names=None):
+    """{case name: (seconds per item, calibration seconds measured next to it)}, only the cases in names if given"""
+    results = {}
+
+    def measure(name, function, items, rounds):
+        if names is not None and name not in names:
+            return
+        seconds, calibration = calibrated(function, rounds)
+        results[name] = (seconds / items, calibration)
+
+    if names is not None:
+        sites = [site for site in sites if any(name.startswith(f"{site}.") for name in names)]
+    for site in sites:
+        scraper = get_scraper_class(site)()
+        root = parse_html(cards_html(site, max(counts)), backend)
+        cards = scraper.find_product_containers(root)
+        products = [scraper.extract_product_data(card) for card in cards]
+
+        for count in counts:
+            rounds = repeats_for(count, repeat)
+            subset = cards[:count]
+            measure(f"{site}.extract_product_data[{backend},{count}]",
+                    lambda: [scraper.extract_product_data(card) for card in subset], len(subset), rounds)
+
+            # Extracted products tiled up to count
+            tiled = (products * (count // len(products) + 1))[:count]
+            measure(f"{site}.get_search_summary[{count}]", lambda: scraper.get_search_summary(tiled), count, rounds)
+
+            if site == 'snapdeal':
+                hidden = parse_html(snapdeal_hidden_input(count), backend)
+                measure(f"snapdeal.extract_hidden_data[{backend},{count}]",
+                        lambda: scraper.extract_hidden_data(hidden), count, rounds)
+    return results
+
+
+def over_threshold(normalized, recorded, threshold):
+    return [name for name, value in normalized.items() if name in recorded and value / recorded[name] - 1 > threshold]
+
+
+def load_baselines():
+    try:
+        with open(BASELINES_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'cases': {}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sites', nargs='+', default=SITES, choices=SITES)
+    parser.add_argument('--counts', type=int, nargs='+', default=DEFAULT_COUNTS)
+    parser.add_argument('--backend', default=None, help='parser backend (default: SCRAPER_PARSER / fastest installed)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown over the baseline, 0.25 = 25%%')
+    parser.add_argument('--update', action='store_true', help='record this run as the new baselines')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    backend = resolve_backend(args.backend)
+
+    results = run_cases(args.sites, args.counts, backend, args.repeat)
+    normalized = {name: seconds / calibration for name, (seconds, calibration) in results.items()}
+
+    baselines = load_baselines()
+    recorded = baselines.get('cases', {})
+
+    suspects = [] if args.update else over_threshold(normalized, recorded, args.threshold)
+    if suspects:
+        print(f"Measuring {len(suspects)} case(s) over the threshold again")
+        for name, (seconds, calibration) in run_cases(args.sites, args.counts, backend, args.repeat,
+                                                      set(suspects)).items():
+            if seconds / calibration < normalized[name]:
+                results[name] = (seconds, calibration)
+                normalized[name] = seconds / calibration
+
+    regressions = []
+    print(f"{'case':<50} {'us/item':>9} {'baseline':>9} {'change':>8}")
+    for name, (seconds, calibration) in results.items():
+        baseline = recorded.get(name)
+        if baseline is None:
+            print(f"{name:<50} {seconds * 1e6:>9.2f} {'-':>9} {'new':>8}")
+            continue
+        # Compare calibrated times, then express the baseline in this machine's microseconds
+        change = normalized[name] / baseline - 1
+        flag = ''
+        if change > args.threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<50} {seconds * 1e6:>9.2f} {baseline * calibration * 1e6:>9.2f} {change:>+7.0%}{flag}")
+
+    if args.update:
+        recorded.update({name: float(f"{value:.4g}") for name, value in normalized.items()})
+        baselines = {
+            'recorded_with': {
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'backend': backend
+            },
+            'cases': dict(sorted(recorded.items()))
+        }
+        with open(BASELINES_FILE, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2)
+            f.write('\n')
+        print(f"Baselines written to {BASELINES_FILE}")
+        return 0
+
+    if regressions:
+        print(f"{len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
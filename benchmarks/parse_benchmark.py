@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Per-page parse + extract time for each HTML parser backend.
+
+Usage: python benchmarks/parse_benchmark.py [--sites amazon flipkart] [--repeat 5]
+
+Uses recorded pages from benchmarks/fixtures/<site>/ when present, synthetic
+pages otherwise (see fixtures.py). Also checks that every backend extracts
+the same products as BeautifulSoup.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import SITES, load_pages
+from html_parsing import available_backends, parse_html
+
+
+def get_scraper_class(site):
+    if site == 'amazon':
+        from amazon_scraper import AmazonScraper
+        return AmazonScraper
+    if site == 'flipkart':
+        from flipkart_scraper import FlipkartScraper
+        return FlipkartScraper
+    if site == 'snapdeal':
+        from snapdeal import SnapdealScraper
+        return SnapdealScraper
+    from jiomart import JioMartScraper
+    return JioMartScraper
+
+
+def parse_and_extract(scraper, content, backend):
+    soup = parse_html(content, backend)
+    containers = scraper.find_product_containers(soup)
+    return [scraper.extract_product_data(element) for element in containers]
+
+
+def time_backend(scraper, pages, backend, repeat):
+    """Best-of-repeat seconds per page, plus the extracted products"""
+    best = None
+    products = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        products = [parse_and_extract(scraper, content, backend) for _, content in pages]
+        elapsed = (time.perf_counter() - start) / len(pages)
+        best = elapsed if best is None else min(best, elapsed)
+    return best, products
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sites', nargs='+', default=SITES, choices=SITES)
+    parser.add_argument('--backends', nargs='+', default=available_backends())
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    # Scrapers log every container count; keep the report readable
+    logging.disable(logging.WARNING)
+
+    print(f"{'site':<10} {'backend':<11} {'page KB':>8} {'ms/page':>9} {'speedup':>8} {'products':>9} match")
+    for site in args.sites:
+        scraper = get_scraper_class(site)()
+        pages = load_pages(site)
+        page_kb = sum(len(content) for _, content in pages) / len(pages) / 1024
+
+        baseline_time, baseline_products = time_backend(scraper, pages, 'bs4', args.repeat)
+        for backend in args.backends:
+            if backend == 'bs4':
+                elapsed, products = baseline_time, baseline_products
+            else:
+                elapsed, products = time_backend(scraper, pages, backend, args.repeat)
+            count = sum(len(page) for page in products)
+            match = 'yes' if products == baseline_products else 'NO'
+            print(f"{site:<10} {backend:<11} {page_kb:>8.0f} {elapsed * 1000:>9.1f} "
+                  f"{baseline_time / elapsed:>7.1f}x {count:>9} {match}")
+
+
+if __name__ == '__main__':
+    main()
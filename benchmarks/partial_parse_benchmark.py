@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Full vs partial (PAGE_NODES) BeautifulSoup parse: time, peak memory and tree size.
+
+Usage: python benchmarks/partial_parse_benchmark.py [--sites amazon] [--repeat 5]
+
+Uses recorded pages from benchmarks/fixtures/<site>/ when present, synthetic
+pages otherwise. Peak memory is the tracemalloc peak while parsing one page.
+Also checks that both trees give the same products.
+"""
+import argparse
+import importlib
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import SITES, load_pages
+from html_parsing import parse_html
+from parse_benchmark import get_scraper_class
+
+
+def best_time(parse, pages, repeat):
+    """Best-of-repeat seconds per page"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _, content in pages:
+            parse(content)
+        elapsed = (time.perf_counter() - start) / len(pages)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def peak_memory(parse, content):
+    """Peak bytes allocated while parsing one page (the tree is kept alive until measured)"""
+    tracemalloc.start()
+    root = parse(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del root
+    return peak
+
+
+def tree_size(root):
+    return sum(1 for _ in root.descendants)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sites', nargs='+', default=SITES, choices=SITES)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    print(f"{'site':<10} {'mode':<8} {'ms/page':>9} {'peak MB':>8} {'nodes':>8} match")
+    for site in args.sites:
+        scraper_class = get_scraper_class(site)
+        page_nodes = importlib.import_module(scraper_class.__module__).PAGE_NODES
+        scraper = scraper_class()
+        pages = load_pages(site)
+        modes = {
+            'full': lambda content: parse_html(content, 'bs4'),
+            'partial': lambda content: parse_html(content, 'bs4', only=page_nodes)
+        }
+
+        results = {}
+        for mode, parse in modes.items():
+            elapsed = best_time(parse, pages, args.repeat)
+            peak = sum(peak_memory(parse, content) for _, content in pages) / len(pages)
+            roots = [parse(content) for _, content in pages]
+            nodes = sum(tree_size(root) for root in roots) / len(pages)
+            products = [
+                [scraper.extract_product_data(card) for card in scraper.find_product_containers(root)]
+                for root in roots
+            ]
+            results[mode] = products
+            match = 'yes' if products == results['full'] else 'NO'
+            print(f"{site:<10} {mode:<8} {elapsed * 1000:>9.1f} {peak / 2 ** 20:>8.1f} {nodes:>8.0f} {match}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""End-to-end scrape_*_products throughput against the local stand-in server.
+
+Usage: python benchmarks/scrape_benchmark.py [--sites amazon wikipedia] [--runs 10] [--latency 80 --error-rate 0.05]
+
+Starts benchmarks/standin_server.py in a subprocess (so its CPU time is not
+counted), points the scrapers at it with origin overrides and runs each
+site's scrape function --runs times. Request pacing and status backoff are
+disabled unless --paced is given; Retry-After sent with injected 429/503s
+is still honoured. The response cache is off unless --cache is given.
+Reports latency p50/p99 per scrape, products per second and CPU time per
+product, then the server's request counts per status.
+"""
+import argparse
+import importlib
+import json
+import logging
+import math
+import os
+import subprocess
+import sys
+import time
+from urllib.request import urlopen
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+# site -> (module, scrape function, accepts concurrency)
+SCRAPE_FUNCTIONS = {
+    'amazon': ('amazon_scraper', 'scrape_amazon_products', True),
+    'flipkart': ('flipkart_scraper', 'scrape_flipkart_products', True),
+    'snapdeal': ('snapdeal', 'scrape_snapdeal_products', True),
+    'jiomart': ('jiomart', 'scrape_jiomart_products', False),
+    'wikipedia': ('wiki_json', 'scrape_wikipedia_data', False),
+}
+
+SEARCH_TERMS = ['laptop', 'running shoes', 'biscuits', 'wireless earbuds', 'office chair']
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def start_server(args):
+    """Launch the stand-in server; returns (process, base URL, origin overrides)"""
+    command = [
+        sys.executable, os.path.join(BENCHMARKS_DIR, 'standin_server.py'), '--port', '0',
+        '--pages', str(args.server_pages), '--latency', str(args.latency), '--jitter', str(args.jitter),
+        '--error-rate', str(args.error_rate), '--error-statuses', *[str(status) for status in args.error_statuses],
+        '--seed', str(args.seed)
+    ]
+    if args.retry_after is not None:
+        command += ['--retry-after', str(args.retry_after)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline().strip()
+    if not line.startswith('SCRAPER_ORIGIN_OVERRIDES='):
+        process.terminate()
+        raise RuntimeError(f"Stand-in server did not start: {line!r}")
+    overrides = line.split('=', 1)[1]
+    base_url = overrides.split('=', 1)[1].split(',', 1)[0].rsplit('/', 1)[0]
+    return process, base_url, overrides
+
+
+def unpaced(policy, fetch_engine, rate_limiter):
+    """Copy of a site policy without request pacing, status backoff or caching"""
+    no_limit = rate_limiter.RateLimit(initial_rate=10000, min_rate=10000, max_rate=10000, burst=100)
+    return fetch_engine.FetchPolicy(rate_limit=no_limit, timeout=policy.timeout, status_backoff=None,
+                                    default_backoff=None, error_backoff=None, cache_ttl=None,
+                                    block_markers=policy.block_markers)
+
+
+def run_site(site, args):
+    """Per-run (seconds, cpu seconds, products) for one site"""
+    module_name, function_name, takes_concurrency = SCRAPE_FUNCTIONS[site]
+    scrape = getattr(importlib.import_module(module_name), function_name)
+
+    def call(term):
+        if site == 'wikipedia':
+            return scrape(term)
+        if takes_concurrency:
+            return scrape(term, max_pages=args.pages, concurrency=args.concurrency)
+        return scrape(term, max_pages=args.pages)
+
+    for index in range(args.warmup):
+        call(SEARCH_TERMS[index % len(SEARCH_TERMS)])
+
+    runs = []
+    for index in range(args.runs):
+        term = SEARCH_TERMS[index % len(SEARCH_TERMS)]
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        result = call(term)
+        runs.append((time.perf_counter() - wall_start, time.process_time() - cpu_start, len(result.get('products', []))))
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sites', nargs='+', default=list(SCRAPE_FUNCTIONS), choices=list(SCRAPE_FUNCTIONS))
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--pages', type=int, default=3, help='max_pages passed to the scrape function')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--parser', default=None, help='SCRAPER_PARSER backend for the run')
+    parser.add_argument('--paced', action='store_true', help="keep each site's rate limits and backoff")
+    parser.add_argument('--cache', action='store_true', help='leave the response cache on')
+    parser.add_argument('--server', default=None, help='use an already running stand-in server at this URL')
+    parser.add_argument('--server-pages', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.0, help='server latency in milliseconds')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-statuses', type=int, nargs='+', default=[429, 503])
+    parser.add_argument('--retry-after', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    # Read at import by html_parsing / response_cache, so set before the scrapers load
+    if args.parser:
+        os.environ['SCRAPER_PARSER'] = args.parser
+    if not args.cache:
+        os.environ['SCRAPER_CACHE'] = 'off'
+    logging.disable(logging.WARNING)
+
+    process = None
+    if args.server:
+        base_url = args.server.rstrip('/')
+        from standin_server import origin_overrides
+        overrides = origin_overrides(base_url)
+    else:
+        process, base_url, overrides = start_server(args)
+
+    try:
+        import fetch_engine
+        import rate_limiter
+        for pair in overrides.split(','):
+            origin, replacement = pair.split('=', 1)
+            fetch_engine.set_origin_override(origin, replacement)
+
+        if not args.paced:
+            for site in args.sites:
+                module = importlib.import_module(SCRAPE_FUNCTIONS[site][0])
+                if hasattr(module, 'FETCH_POLICY'):
+                    module.FETCH_POLICY = unpaced(module.FETCH_POLICY, fetch_engine, rate_limiter)
+
+        print(f"{'site':<10} {'runs':>5} {'products':>9} {'p50 ms':>8} {'p99 ms':>8} {'products/s':>11} {'cpu ms/prod':>12}")
+        for site in args.sites:
+            runs = run_site(site, args)
+            latencies = [wall for wall, _, _ in runs]
+            products = sum(count for _, _, count in runs)
+            cpu = sum(cpu for _, cpu, _ in runs)
+            wall = sum(latencies)
+            print(f"{site:<10} {len(runs):>5} {products / len(runs):>9.0f} {percentile(latencies, 0.5) * 1000:>8.0f} "
+                  f"{percentile(latencies, 0.99) * 1000:>8.0f} {products / wall if wall else 0:>11.1f} "
+                  f"{cpu * 1000 / products if products else 0:>12.2f}")
+
+        with urlopen(f"{base_url}/_stats") as response:
+            counts = json.load(response)
+        print('server responses: ' + ', '.join(f"{key}: {value}" for key, value in sorted(counts.items())))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=5)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""Local stand-in for the storefronts, serving fixture pages over HTTP.
+
+Usage: python benchmarks/standin_server.py [--port 8700] [--latency 50] [--error-rate 0.05]
+
+Each site is mounted under its own prefix (/amazon, /flipkart, /snapdeal,
+/jiomart, /wikipedia). Results page N is the Nth fixture page (cycling);
+pages after --pages get a results page with no products. A share of
+responses (--error-rate) is replaced with a 429 or 503 (--error-statuses),
+carrying Retry-After when --retry-after is set. GET /_stats returns
+request counts per site and status.
+
+Point the scrapers at it by setting, for the backend or any script:
+
+    SCRAPER_ORIGIN_OVERRIDES=https://www.amazon.in=http://127.0.0.1:8700/amazon,...
+
+which the server prints on startup.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import SITES, load_pages, synthetic_page, wikipedia_response
+
+# Live origin of each site, replaced by http://host:port/<site>
+ORIGINS = {
+    'amazon': 'https://www.amazon.in',
+    'flipkart': 'https://www.flipkart.com',
+    'snapdeal': 'https://www.snapdeal.com',
+    'jiomart': 'https://www.jiomart.com',
+    'wikipedia': 'https://en.wikipedia.org',
+}
+
+
+class StandinState:
+    """Pages, fault injection settings and counters shared by the handler threads"""
+
+    def __init__(self, pages=5, latency=0.0, jitter=0.0, error_rate=0.0, error_statuses=(429, 503),
+                 retry_after=None, seed=0):
+        self.pages = pages
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.retry_after = retry_after
+        self.site_pages = {site: [content for _, content in load_pages(site)] for site in SITES}
+        self.end_pages = {site: synthetic_page(site, cards=0, noise_bytes=20000).encode('utf-8') for site in SITES}
+        self.counts = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """(delay seconds, injected status or None) for one request"""
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            status = None
+            if self.error_rate and self._random.random() < self.error_rate:
+                status = self._random.choice(self.error_statuses)
+        return delay, status
+
+    def count(self, site, status):
+        key = f"{site} {status}"
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def page(self, site, number):
+        if number > self.pages:
+            return self.end_pages[site]
+        pages = self.site_pages[site]
+        return pages[(number - 1) % len(pages)]
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        # One line per request would dominate the output of a benchmark run
+        pass
+
+    def send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        state = self.server.state
+        parts = urlsplit(self.path)
+        if parts.path == '/_stats':
+            self.send_body(200, json.dumps(state.counts).encode('utf-8'), 'application/json')
+            return
+
+        site = parts.path.strip('/').split('/', 1)[0]
+        if site not in ORIGINS:
+            self.send_body(404, b'unknown site', 'text/plain')
+            return
+
+        delay, status = state.draw()
+        if delay:
+            time.sleep(delay)
+
+        if status is not None:
+            headers = {'Retry-After': str(state.retry_after)} if state.retry_after is not None else {}
+            state.count(site, status)
+            self.send_body(status, b'Too many requests', 'text/plain', headers)
+            return
+
+        query = parse_qs(parts.query)
+        if site == 'wikipedia':
+            term = query.get('srsearch', [''])[0]
+            body, content_type = wikipedia_response(term), 'application/json; charset=utf-8'
+        else:
+            try:
+                number = int(query.get('page', ['1'])[0])
+            except ValueError:
+                number = 1
+            body, content_type = state.page(site, number), 'text/html; charset=utf-8'
+        state.count(site, 200)
+        self.send_body(200, body, content_type)
+
+
+def origin_overrides(base_url):
+    """SCRAPER_ORIGIN_OVERRIDES value pointing every site at a server on base_url"""
+    return ','.join(f"{origin}={base_url}/{site}" for site, origin in ORIGINS.items())
+
+
+def create_server(port=0, host='127.0.0.1', **settings):
+    server = ThreadingHTTPServer((host, port), StandinHandler)
+    server.daemon_threads = True
+    server.state = StandinState(**settings)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8700, help='0 picks a free port')
+    parser.add_argument('--pages', type=int, default=5, help='results pages before the empty end page')
+    parser.add_argument('--latency', type=float, default=0.0, help='milliseconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random milliseconds, 0..jitter')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of responses replaced by an error')
+    parser.add_argument('--error-statuses', type=int, nargs='+', default=[429, 503])
+    parser.add_argument('--retry-after', type=int, default=None, help='Retry-After seconds sent with errors')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = create_server(
+        port=args.port, host=args.host, pages=args.pages, latency=args.latency / 1000,
+        jitter=args.jitter / 1000, error_rate=args.error_rate, error_statuses=args.error_statuses,
+        retry_after=args.retry_after, seed=args.seed
+    )
+    base_url = f"http://{args.host}:{server.server_address[1]}"
+    # Parent processes read the first line to find the port
+    print(f"SCRAPER_ORIGIN_OVERRIDES={origin_overrides(base_url)}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
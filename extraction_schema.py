@@ -0,0 +1,352 @@
+import atexit
+import json
+import os
+import threading
+import time
+import logging
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from html_parsing import CompiledSelector
+
+logger = logging.getLogger(__name__)
+
+# Lookups a selector may go without a hit before it is tried after the ones
+# that still match; 0 keeps every chain in its declared order
+SELECTOR_IDLE_LIMIT = int(os.environ.get('SCRAPER_SELECTOR_IDLE', '500'))
+
+# How often (in lookups) a chain recomputes its order; the lookup before each
+# reorder tries the selectors in declared order, probing demoted ones
+REORDER_INTERVAL = 50
+
+# File the hit counts are persisted to; unset keeps them in memory only
+SELECTOR_STATS_FILE = os.environ.get('SCRAPER_SELECTOR_STATS') or None
+
+# Minimum seconds between writes of the stats file
+SAVE_INTERVAL = 60
+
+
+def element_text(element):
+    return element.get_text(strip=True)
+
+
+class SelectorChain:
+    """Fallback selectors that learn which of them the site currently uses.
+
+    Every lookup records which selector produced the value (or a miss).
+    Selectors that have not hit for ``idle_limit`` lookups are moved behind
+    the ones that still do, so when the markup changes cards stop paying
+    for the dead selectors first. Selectors that still hit keep their
+    declared priority among themselves. A demoted selector is only reached
+    when every live one fails, so one lookup in REORDER_INTERVAL tries the
+    declared order instead; a demoted selector that matches that probe
+    moves back up at the reorder that follows it.
+
+    Counters are updated without a lock; a lost increment under concurrent
+    jobs only nudges a heuristic.
+    """
+
+    __slots__ = ('selectors', 'hits', 'last_hit', 'lookups', 'misses', 'ordered', 'declared', 'settled', 'idle_limit')
+
+    def __init__(self, selectors, idle_limit=SELECTOR_IDLE_LIMIT):
+        if isinstance(selectors, str):
+            selectors = [selectors]
+        self.selectors = [CompiledSelector(selector) for selector in selectors]
+        self.hits = [0] * len(self.selectors)
+        self.last_hit = [0] * len(self.selectors)
+        self.lookups = 0
+        self.misses = 0
+        self.idle_limit = idle_limit
+        # (declared index, selector) pairs in the order they are tried
+        self.declared = tuple(enumerate(self.selectors))
+        self.ordered = self.declared
+        # Order set by the last reorder(), which ordered only leaves for probes
+        self.settled = self.declared
+
+    def hit(self, index):
+        self.hits[index] += 1
+        self.last_hit[index] = self.lookups + 1
+        self._looked_up()
+
+    def miss(self):
+        self.misses += 1
+        self._looked_up()
+
+    def _looked_up(self):
+        self.lookups += 1
+        if not self.idle_limit:
+            return
+        position = self.lookups % REORDER_INTERVAL
+        if position == 0:
+            self.reorder()
+            selector_stats.maybe_save()
+        elif position == REORDER_INTERVAL - 1:
+            # Probe: the next lookup tries every selector in declared order, and reorder() runs right after it
+            self.ordered = self.declared
+
+    def is_idle(self, index):
+        return bool(self.idle_limit) and self.lookups - self.last_hit[index] > self.idle_limit
+
+    def reorder(self):
+        live = [index for index in range(len(self.selectors)) if not self.is_idle(index)]
+        idle = [index for index in range(len(self.selectors)) if self.is_idle(index)]
+        ordered = tuple((index, self.selectors[index]) for index in live + idle)
+        if [index for index, _ in ordered] != [index for index, _ in self.settled]:
+            logger.info(f"Selector order now {[self.selectors[index].selector for index in live + idle]} "
+                        f"({len(idle)} idle for {self.idle_limit}+ lookups)")
+        self.settled = ordered
+        self.ordered = ordered
+
+    def export(self):
+        """Counters to persist, keyed on selector text so edits to the list are tolerated"""
+        return {
+            'lookups': self.lookups,
+            'misses': self.misses,
+            'selectors': {
+                selector.selector: {'hits': self.hits[index], 'idle': self.lookups - self.last_hit[index]}
+                for index, selector in enumerate(self.selectors)
+            }
+        }
+
+    def restore(self, data):
+        self.lookups = data.get('lookups', 0)
+        self.misses = data.get('misses', 0)
+        saved = data.get('selectors', {})
+        for index, selector in enumerate(self.selectors):
+            counts = saved.get(selector.selector)
+            if counts:
+                self.hits[index] = counts.get('hits', 0)
+                self.last_hit[index] = self.lookups - counts.get('idle', 0)
+            else:
+                # New selector: give it a full idle window before demoting it
+                self.last_hit[index] = self.lookups
+        self.reorder()
+
+    def stats(self):
+        return {
+            'lookups': self.lookups,
+            'misses': self.misses,
+            # The declared first choice no longer matches: the site's markup has likely changed
+            'drifted': self.is_idle(0),
+            'order': [selector.selector for _, selector in self.settled],
+            'selectors': [
+                {
+                    'selector': selector.selector,
+                    'hits': self.hits[index],
+                    'hit_rate': round(self.hits[index] / self.lookups, 3) if self.lookups else 0.0,
+                    'idle': self.lookups - self.last_hit[index],
+                    'demoted': self.is_idle(index)
+                }
+                for index, selector in enumerate(self.selectors)
+            ]
+        }
+
+
+def merge_counts(saved, current, synced):
+    """Counts in the stats file after adding what a chain counted since synced.
+
+    saved is the file's entry for the chain, current its export() now and
+    synced its export() when it was last restored or saved (None if never).
+    Other processes' counts already in saved are kept, and a selector's
+    idle count restarts from this process's last hit if it hit since.
+    """
+    if not saved:
+        return current
+    synced = synced or {}
+    synced_selectors = synced.get('selectors', {})
+    new_lookups = current['lookups'] - synced.get('lookups', 0)
+    merged = {
+        'lookups': saved.get('lookups', 0) + new_lookups,
+        'misses': saved.get('misses', 0) + current['misses'] - synced.get('misses', 0),
+        'selectors': dict(saved.get('selectors', {}))
+    }
+    for selector, counts in current['selectors'].items():
+        on_file = merged['selectors'].get(selector)
+        if on_file is None:
+            merged['selectors'][selector] = counts
+            continue
+        new_hits = counts['hits'] - synced_selectors.get(selector, {}).get('hits', 0)
+        idle = on_file.get('idle', 0) + new_lookups
+        merged['selectors'][selector] = {
+            'hits': on_file.get('hits', 0) + new_hits,
+            'idle': min(idle, counts['idle']) if new_hits else idle
+        }
+    return merged
+
+
+class SelectorStats:
+    """Process-wide registry of selector chains, keyed on (site, field).
+
+    Counts are loaded from ``path`` when a chain is registered and written
+    back at most every SAVE_INTERVAL seconds and at exit. Re-registering a
+    key (a scraper module reloaded) carries the old chain's counts over.
+    Several processes (gunicorn workers) can share one file: each save
+    re-reads it under a lock and adds only what this process counted since
+    its last save (see merge_counts), so no worker's counts are lost.
+    """
+
+    def __init__(self, path=SELECTOR_STATS_FILE):
+        self.path = path
+        self._chains = {}
+        # export() of each chain when it was last restored or saved, keyed like _chains
+        self._synced = {}
+        self._lock = threading.Lock()
+        self._last_save = time.monotonic()
+        self._saved = self._load() if path else {}
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring selector stats in {self.path}: {e}")
+            return {}
+
+    def register(self, site, name, chain):
+        with self._lock:
+            previous = self._chains.get((site, name))
+            self._chains[(site, name)] = chain
+        if previous is not None:
+            data = previous.export()
+        else:
+            data = self._saved.get(site, {}).get(name)
+            with self._lock:
+                self._synced[(site, name)] = data
+        if data:
+            chain.restore(data)
+        return chain
+
+    def snapshot(self):
+        with self._lock:
+            chains = dict(self._chains)
+        sites = {}
+        for (site, name), chain in sorted(chains.items()):
+            sites.setdefault(site, {})[name] = chain.stats()
+        return sites
+
+    def drifted(self):
+        """'site.field' names whose first declared selector has stopped matching"""
+        with self._lock:
+            chains = dict(self._chains)
+        return sorted(f"{site}.{name}" for (site, name), chain in chains.items() if chain.is_idle(0))
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            chains = dict(self._chains)
+            self._last_save = time.monotonic()
+        # One temporary file per process, replaced into place under the lock file
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(f"{self.path}.lock", 'a', encoding='utf-8') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                data = self._load()
+                exported = {}
+                for (site, name), chain in chains.items():
+                    exported[(site, name)] = current = chain.export()
+                    fields = data.setdefault(site, {})
+                    fields[name] = merge_counts(fields.get(name), current, self._synced.get((site, name)))
+                with open(temporary, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=2)
+                os.replace(temporary, self.path)
+        except OSError as e:
+            logger.warning(f"Could not write selector stats to {self.path}: {e}")
+            return
+        with self._lock:
+            self._synced.update(exported)
+
+    def maybe_save(self):
+        if self.path and time.monotonic() - self._last_save >= SAVE_INTERVAL:
+            self.save()
+
+
+selector_stats = SelectorStats()
+atexit.register(selector_stats.save)
+
+
+def selector_chain(site, name, selectors):
+    """A SelectorChain registered for stats, for lookups outside a Schema (e.g. product containers)"""
+    return selector_stats.register(site, name, SelectorChain(selectors))
+
+
+class Field:
+    """How to extract one value from a product card.
+
+    selectors: CSS selectors tried in priority order (see SelectorChain), compiled once when the schema is defined
+    attr: read this attribute instead of the text; elements without it (or with it empty) are skipped
+    value: callable(element) -> raw value, instead of text / attr
+    parse: callable(raw) -> final value; returning None moves on to the next selector
+    many: use every element matched by the first selector that matches any, giving a list
+    """
+
+    __slots__ = ('chain', 'attr', 'value', 'parse', 'many')
+
+    def __init__(self, selectors, attr=None, value=None, parse=None, many=False):
+        self.chain = SelectorChain(selectors)
+        self.attr = attr
+        self.value = value or element_text
+        self.parse = parse
+        self.many = many
+
+    def _raw(self, element):
+        if self.attr:
+            return element.get(self.attr)
+        return self.value(element)
+
+    def extract(self, card):
+        """Value for this field from card, or None when no selector produced one"""
+        chain = self.chain
+        for index, selector in chain.ordered:
+            if self.many:
+                elements = selector.select(card)
+                if not elements:
+                    continue
+                values = [self._raw(element) for element in elements]
+                chain.hit(index)
+                return self.parse(values) if self.parse else values
+
+            element = selector.select_one(card)
+            if element is None:
+                continue
+            raw = self._raw(element)
+            if self.attr and not raw:
+                continue
+            value = self.parse(raw) if self.parse else raw
+            if value is not None:
+                chain.hit(index)
+                return value
+        chain.miss()
+        return None
+
+
+class Schema:
+    """Named Fields for one site, executed by a single extraction loop.
+
+    extract() returns only the fields that matched, so callers can
+    ``product_data.update(...)`` over their defaults. Each field's
+    selector chain is registered under (site, field name) for stats.
+    """
+
+    def __init__(self, site, **fields):
+        self.site = site
+        self.fields = fields
+        for name, field in fields.items():
+            selector_stats.register(site, name, field.chain)
+
+    def extract(self, card, names=None):
+        values = {}
+        for name in names or self.fields:
+            value = self.fields[name].extract(card)
+            if value is not None:
+                values[name] = value
+        return values
+
+    def extract_field(self, card, name):
+        return self.fields[name].extract(card)
@@ -0,0 +1,328 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+import logging
+
+import httpx
+
+import metrics
+from rate_limiter import DomainRateLimiter, DEFAULT_RATE_LIMIT
+from response_cache import ResponseCache, CACHE_ENABLED
+
+logger = logging.getLogger(__name__)
+
+# Maximum in-flight requests per domain, shared by every scraper in the process
+DEFAULT_DOMAIN_CONCURRENCY = 2
+
+# Upper bounds on how long a single retry wait may be
+MAX_BACKOFF_SECONDS = 60
+MAX_RETRY_AFTER_SECONDS = 120
+
+RETRY_AFTER_STATUSES = (429, 503)
+
+
+def parse_origin_overrides(value):
+    """'https://www.amazon.in=http://127.0.0.1:8700/amazon,...' -> {origin: replacement}"""
+    overrides = {}
+    for pair in value.split(','):
+        if '=' in pair:
+            origin, replacement = pair.split('=', 1)
+            overrides[origin.strip().rstrip('/')] = replacement.strip().rstrip('/')
+    return overrides
+
+
+# Requests to these origins go to the replacement instead, e.g. a local stand-in
+# server for benchmarks (see benchmarks/standin_server.py). Cache keys and rate
+# limits stay on the original URL.
+ORIGIN_OVERRIDES = parse_origin_overrides(os.environ.get('SCRAPER_ORIGIN_OVERRIDES', ''))
+
+
+def set_origin_override(origin, replacement=None):
+    """Send requests for origin to replacement; None removes the override"""
+    origin = origin.rstrip('/')
+    if replacement is None:
+        ORIGIN_OVERRIDES.pop(origin, None)
+    else:
+        ORIGIN_OVERRIDES[origin] = replacement.rstrip('/')
+
+
+def rewrite_url(url):
+    """url with its origin replaced when an override is set for it"""
+    for origin, replacement in ORIGIN_OVERRIDES.items():
+        if url == origin or url.startswith(origin + '/') or url.startswith(origin + '?'):
+            return replacement + url[len(origin):]
+    return url
+
+
+class FetchPolicy:
+    """Per-site pacing and retry behaviour.
+
+    rate_limit: RateLimit bounds for the domain's adaptive limiter (see rate_limiter)
+    status_backoff: status code -> (min, max) seconds to wait before retrying
+    default_backoff: wait for other non-200 statuses (None retries straight away)
+    error_backoff: wait after a transport error or timeout
+    cache_ttl: seconds a 200 response is served from the response cache (None disables caching)
+    block_markers: byte strings that identify a captcha / robot-check page served with a 200
+    site: scraper label for metrics (the request's domain when unset)
+    """
+
+    def __init__(self, rate_limit=DEFAULT_RATE_LIMIT, timeout=15, status_backoff=None,
+                 default_backoff=None, error_backoff=(5, 10), cache_ttl=None, block_markers=(), site=None):
+        self.site = site
+        self.rate_limit = rate_limit
+        self.timeout = timeout
+        self.status_backoff = status_backoff or {}
+        self.default_backoff = default_backoff
+        self.error_backoff = error_backoff
+        self.cache_ttl = cache_ttl
+        self.block_markers = block_markers
+
+    def is_block_page(self, content):
+        return any(marker in content for marker in self.block_markers)
+
+
+DEFAULT_POLICY = FetchPolicy()
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def jittered_backoff(delay_range, attempt):
+    """Random delay from delay_range, doubled for each earlier attempt"""
+    return min(random.uniform(*delay_range) * (2 ** attempt), MAX_BACKOFF_SECONDS)
+
+
+class FetchEngine:
+    """Shared async HTTP client for the e-commerce scrapers.
+
+    Runs an asyncio loop on a background thread with a single pooled
+    httpx.AsyncClient (keep-alive connections are reused across scrapers and
+    searches). Requests are limited per domain, both in flight and in rate:
+    each domain's DomainRateLimiter speeds up while responses are 200 and
+    backs off on 429/503 or block pages, for every job in the process.
+    Failed attempts are retried with jittered backoff that honours
+    Retry-After on 429/503. Pages whose policy sets a cache_ttl go through the shared
+    ResponseCache: fresh hits skip the network (and the request delay), stale
+    entries are revalidated with the site's ETag / Last-Modified. ``fetch`` is a blocking wrapper for synchronous scraper code;
+    ``fetch_async`` can be awaited from the engine loop.
+    """
+
+    def __init__(self, max_connections=100, max_keepalive_connections=20, cache=None):
+        self.pid = os.getpid()
+        self.cache = cache if cache is not None else (ResponseCache() if CACHE_ENABLED else None)
+        self._domain_limits = {}
+        self._domain_semaphores = {}
+        self._rate_limiters = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='fetch-engine', daemon=True)
+        self._thread.start()
+
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections
+        )
+        self._client = self.run(self._create_client(limits))
+
+    async def _create_client(self, limits):
+        return httpx.AsyncClient(limits=limits, follow_redirects=True)
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the engine loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def set_domain_limit(self, domain, limit):
+        """Override the in-flight request limit for a domain"""
+        self._domain_limits[domain] = limit
+        self._domain_semaphores.pop(domain, None)
+
+    def _domain_semaphore(self, domain):
+        # Only touched from the loop thread, so no lock is needed
+        semaphore = self._domain_semaphores.get(domain)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self._domain_limits.get(domain, DEFAULT_DOMAIN_CONCURRENCY))
+            self._domain_semaphores[domain] = semaphore
+        return semaphore
+
+    def _cached_response(self, url, entry, source):
+        headers = dict(entry.headers)
+        headers['X-Cache'] = source
+        return httpx.Response(200, headers=headers, content=entry.content, request=httpx.Request('GET', url))
+
+    async def _cache_call(self, method, *args):
+        """Call a ResponseCache method; off the loop when the cache has a directory, so no fetch waits on disk"""
+        if self.cache.cache_dir:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    def _rate_limiter(self, domain, policy):
+        # Loop thread only, like the semaphores; the first policy seen for a domain sets its bounds
+        limiter = self._rate_limiters.get(domain)
+        if limiter is None:
+            limiter = DomainRateLimiter(policy.rate_limit)
+            self._rate_limiters[domain] = limiter
+        return limiter
+
+    async def fetch_async(self, url, headers=None, policy=None, max_retries=3, use_cache=True, cancelled=None):
+        """Fetch url, returning the 200 response or None once retries are exhausted.
+
+        headers may be a dict or a callable taking the attempt number, so
+        callers can rotate user agents or add a Referer on retries.
+        Responses served from the cache carry an X-Cache header (HIT or REVALIDATED).
+        cancelled (a callable) is asked whenever the domain's rate limiter has
+        a slot for an attempt; when it returns True the request is not sent
+        and None is returned.
+        """
+        policy = policy or DEFAULT_POLICY
+        domain = urlparse(url).netloc
+        site = policy.site or domain
+        cache = self.cache if use_cache and policy.cache_ttl else None
+        stale = None
+        if cache is not None:
+            entry, stale = await self._cache_call(cache.check, url)
+            if entry is not None:
+                metrics.CACHE_RESPONSES.labels(site, 'hit').inc()
+                return self._cached_response(url, entry, 'HIT')
+
+        semaphore = self._domain_semaphore(domain)
+        limiter = self._rate_limiter(domain, policy)
+
+        for attempt in range(max_retries):
+            request_headers = headers(attempt) if callable(headers) else headers
+            if stale is not None:
+                request_headers = {**(request_headers or {}), **stale.validators()}
+            wait = None
+            reason = 'backoff'
+            if attempt:
+                metrics.HTTP_RETRIES.labels(site).inc()
+
+            try:
+                # Wait for the domain's rate limiter while holding one of its in-flight slots
+                async with semaphore:
+                    metrics.SLEEP_SECONDS.labels(site, 'rate_limit').observe(await limiter.acquire())
+                    if cancelled is not None and cancelled():
+                        # No longer wanted (e.g. a page past the end of the results); the slot goes to the next request
+                        limiter.refund()
+                        logger.info(f"Not fetching {url}: cancelled")
+                        return None
+                    started = time.perf_counter()
+                    try:
+                        response = await self._client.get(rewrite_url(url), headers=request_headers, timeout=policy.timeout)
+                    finally:
+                        metrics.HTTP_SECONDS.labels(site).observe(time.perf_counter() - started)
+
+                status = response.status_code
+                blocked = status == 200 and policy.is_block_page(response.content)
+                metrics.HTTP_REQUESTS.labels(site, 'blocked' if blocked else status).inc()
+
+                if status == 200 and not blocked:
+                    limiter.on_success()
+                    if cache is not None:
+                        await self._cache_call(cache.store, url, response.content, response.headers, policy.cache_ttl)
+                    return response
+
+                if status == 304 and stale is not None:
+                    await self._cache_call(cache.refresh, stale, policy.cache_ttl, response.headers)
+                    metrics.CACHE_RESPONSES.labels(site, 'revalidated').inc()
+                    return self._cached_response(url, stale, 'REVALIDATED')
+
+                if blocked:
+                    # Captcha / robot check page: back off as for a 429
+                    logger.warning(f"Block page served, waiting before retry {attempt + 1}")
+                    limiter.on_throttle()
+                    status = 429
+                elif status == 429:
+                    logger.warning(f"Rate limited (429), waiting before retry {attempt + 1}")
+                elif status == 503:
+                    logger.warning(f"Service unavailable (503), waiting before retry {attempt + 1}")
+                else:
+                    logger.warning(f"Status code {status}, attempt {attempt + 1}")
+
+                if status in RETRY_AFTER_STATUSES and not blocked:
+                    wait = parse_retry_after(response.headers.get('Retry-After'))
+                    if wait is not None:
+                        reason = 'retry_after'
+                        # Spread out clients released at the same moment
+                        wait = min(wait, MAX_RETRY_AFTER_SECONDS) + random.uniform(0, 1)
+                    # Slow the whole domain down, pausing it for any Retry-After
+                    limiter.on_throttle(wait)
+
+                if wait is None:
+                    backoff = policy.status_backoff.get(status, policy.default_backoff)
+                    if backoff:
+                        wait = jittered_backoff(backoff, attempt)
+
+            except httpx.HTTPError as e:
+                logger.error(f"Request failed: {e}, attempt {attempt + 1}")
+                metrics.HTTP_REQUESTS.labels(site, 'error').inc()
+                if policy.error_backoff:
+                    wait = jittered_backoff(policy.error_backoff, attempt)
+
+            if wait and attempt < max_retries - 1:
+                metrics.SLEEP_SECONDS.labels(site, reason).observe(wait)
+                await asyncio.sleep(wait)
+
+        return None
+
+    def fetch(self, url, headers=None, policy=None, max_retries=3, use_cache=True, cancelled=None):
+        """Blocking wrapper around fetch_async for synchronous callers"""
+        return self.run(self.fetch_async(url, headers=headers, policy=policy, max_retries=max_retries,
+                                         use_cache=use_cache, cancelled=cancelled))
+
+    def discard_cached(self, url):
+        """Forget a cached page, e.g. when it parsed to no products"""
+        if self.cache is not None:
+            self.cache.discard(url)
+
+    def rate_limit_stats(self):
+        """Current adaptive rate and counters per domain"""
+        async def collect():
+            return {domain: limiter.stats() for domain, limiter in self._rate_limiters.items()}
+        return self.run(collect())
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache is not None else {'enabled': False}
+
+    def fetch_many(self, urls, headers=None, policy=None, max_retries=3):
+        """Fetch several URLs concurrently; returns responses (or None) in input order"""
+        async def gather():
+            return await asyncio.gather(*[
+                self.fetch_async(url, headers=headers, policy=policy, max_retries=max_retries)
+                for url in urls
+            ])
+        return self.run(gather())
+
+    def close(self):
+        self.run(self._client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Process-wide FetchEngine, recreated after a fork since the loop thread does not survive it"""
+    global _engine
+    engine = _engine
+    if engine is not None and engine.pid == os.getpid():
+        return engine
+    with _engine_lock:
+        if _engine is None or _engine.pid != os.getpid():
+            _engine = FetchEngine()
+        return _engine
@@ -4,6 +4,8 @@ import ProfileDropdown from './components/ProfileDropdown';
 import Login from './components/Login';
 import RequestsPage from './components/RequestsPage';
 
+const JOB_POLL_INTERVAL_MS = 2000;
+
 function App() {
   const [scrapers, setScrapers] = useState({});
   const [selectedScraper, setSelectedScraper] = useState(null);
@@ -105,22 +107,92 @@ function App() {
     setParameters(prev => ({ ...prev, [paramName]: value }));
   };
 
+  // Scrapes run as background jobs; poll until the result is ready
+  const waitForJob = async (jobId) => {
+    while (true) {
+      const response = await axios.get(`/api/jobs/${jobId}/result`);
+      if (response.status !== 202) {
+        return response.data;
+      }
+      await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    }
+  };
+
+  // Streaming scrapers send NDJSON events: products per page, then the summary
+  const streamScrape = async () => {
+    const response = await fetch('/api/scrape/stream', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ scraper_id: selectedScraper, parameters: parameters, format: 'ndjson' })
+    });
+    if (!response.ok) {
+      const body = await response.json().catch(() => ({}));
+      throw new Error(body.error || 'Scraping failed');
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let products = [];
+
+    const handleEvent = (event) => {
+      if (event.event === 'page') {
+        products = products.concat(event.products);
+        setResults({ search_term: parameters.search_term, products: products, summary: { total_products: products.length } });
+      } else if (event.event === 'summary') {
+        const { event: _, ...summary } = event;
+        setResults({ ...summary, products: products });
+        if (summary.error) setError(summary.error);
+      } else if (event.event === 'result') {
+        setResults(event.data);
+      } else if (event.event === 'error') {
+        setError(event.error);
+      }
+    };
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split('\n');
+      buffer = lines.pop();
+      lines.filter(line => line.trim()).forEach(line => handleEvent(JSON.parse(line)));
+    }
+    if (buffer.trim()) handleEvent(JSON.parse(buffer));
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     setLoading(true);
     setError(null);
     setResults(null);
 
+    if (scrapers[selectedScraper]?.stream_function_name) {
+      try {
+        await streamScrape();
+      } catch (error) {
+        setError(error.message || 'Network error occurred');
+      } finally {
+        setLoading(false);
+      }
+      return;
+    }
+
     try {
       const response = await axios.post('/api/scrape', {
         scraper_id: selectedScraper,
         parameters: parameters
       });
 
-      if (response.data.success) {
-        setResults(response.data.data);
+      // Cached results come back straight away, otherwise poll the queued job
+      const jobResult = response.status === 202
+        ? await waitForJob(response.data.job_id)
+        : response.data;
+
+      if (jobResult.success) {
+        setResults(jobResult.data);
       } else {
-        setError(response.data.error || 'Scraping failed');
+        setError(jobResult.error || 'Scraping failed');
       }
     } catch (error) {
       setError(error.response?.data?.error || 'Network error occurred');
@@ -0,0 +1,335 @@
+import os
+import re
+from itertools import islice
+import logging
+
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer
+
+logger = logging.getLogger(__name__)
+
+try:
+    import lxml.html
+    from lxml.cssselect import CSSSelector
+except ImportError:
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+# Fastest first; 'bs4' (BeautifulSoup + html.parser) is always available
+BACKEND_PREFERENCE = ['selectolax', 'lxml', 'bs4']
+
+# BeautifulSoup leaves these out of get_text(), the other backends drop them at parse time
+NON_TEXT_TAGS = ('script', 'style')
+
+# Backend used when a scraper doesn't ask for one: 'auto' picks the fastest installed
+DEFAULT_BACKEND = os.environ.get('SCRAPER_PARSER', 'auto')
+
+
+def available_backends():
+    backends = []
+    if LexborHTMLParser is not None:
+        backends.append('selectolax')
+    if lxml is not None:
+        backends.append('lxml')
+    backends.append('bs4')
+    return backends
+
+
+def resolve_backend(backend=None):
+    """Name of the backend to use, falling back to bs4 when the requested one isn't installed"""
+    backend = backend or DEFAULT_BACKEND
+    available = available_backends()
+    if backend == 'auto':
+        return available[0]
+    if backend not in BACKEND_PREFERENCE:
+        raise ValueError(f"Unknown parser backend '{backend}', expected one of {BACKEND_PREFERENCE}")
+    if backend not in available:
+        logger.warning(f"Parser backend '{backend}' is not installed, falling back to bs4")
+        return 'bs4'
+    return backend
+
+
+def to_text(content):
+    if isinstance(content, bytes):
+        return content.decode('utf-8', errors='replace')
+    return content
+
+
+# One compound selector: optional tag name, then .class and [attr] / [attr="value"] parts
+SIMPLE_SELECTOR_RE = re.compile(r'^([a-zA-Z][\w-]*)?((?:\.[\w-]+|\[[\w-]+(?:="[^"]*")?\])*)$')
+SIMPLE_PART_RE = re.compile(r'\.([\w-]+)|\[([\w-]+)(="([^"]*)")?\]')
+
+
+class PartialParse(SoupStrainer):
+    """Limits a BeautifulSoup parse to the elements matching any of the given selectors.
+
+    Only top-level matches and their subtrees are built, everything else on
+    the page (navigation, footers, scripts) is skipped by the tokenizer
+    without creating Tag objects. Selectors must be simple compounds such
+    as 'li.item', '.a.b', '[data-id]' or 'div[data-type="x"]', since
+    ancestors are not available while the page is streamed. The lxml and
+    selectolax backends build the whole tree in C and ignore this.
+    """
+
+    def __init__(self, selectors):
+        super().__init__()
+        self.selectors = list(selectors)
+        self.rules = []
+        for selector in self.selectors:
+            match = SIMPLE_SELECTOR_RE.match(selector)
+            if not selector or not match:
+                raise ValueError(f"PartialParse only takes simple selectors, got '{selector}'")
+            classes = set()
+            attrs = []
+            for class_name, attr, has_value, value in SIMPLE_PART_RE.findall(match.group(2)):
+                if class_name:
+                    classes.add(class_name)
+                else:
+                    attrs.append((attr, value if has_value else None))
+            self.rules.append((match.group(1), classes, attrs))
+
+    def keeps(self, name, attrs):
+        """Whether an element with this tag name and raw attribute dict is kept"""
+        element_classes = None
+        for tag, classes, required in self.rules:
+            if tag and tag != name:
+                continue
+            if classes:
+                if element_classes is None:
+                    element_classes = set((attrs.get('class') or '').split())
+                if not classes <= element_classes:
+                    continue
+            if all(attrs.get(attr) is not None and (value is None or attrs.get(attr) == value)
+                   for attr, value in required):
+                return True
+        return False
+
+    # BeautifulSoup >= 4.13 asks this before creating a top-level tag
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        return self.keeps(name, attrs or {})
+
+    # BeautifulSoup < 4.13 asks this instead
+    def search_tag(self, markup_name=None, markup_attrs={}):
+        return self.keeps(markup_name, markup_attrs or {})
+
+    def __repr__(self):
+        return f"PartialParse({self.selectors!r})"
+
+
+def parse_html(content, backend=None, only=None):
+    """Parse a page and return its root node.
+
+    Every backend exposes the subset of the BeautifulSoup Tag API the
+    scrapers use (select, select_one, get, [], get_text, str), so
+    extract_product_data runs unchanged on any of them. 'bs4' returns a
+    real BeautifulSoup object, built from only the elements a PartialParse
+    passed as ``only`` keeps.
+    """
+    backend = resolve_backend(backend)
+    if backend == 'selectolax':
+        tree = LexborHTMLParser(to_text(content))
+        tree.strip_tags(list(NON_TEXT_TAGS))
+        return SelectolaxNode(tree.root)
+    if backend == 'lxml':
+        root = lxml.html.document_fromstring(to_text(content))
+        for element in list(root.iter(*NON_TEXT_TAGS)):
+            element.drop_tree()
+        return LxmlNode(root)
+    return BeautifulSoup(content, 'html.parser', parse_only=only)
+
+
+def parse_containers(content, backend, only, find):
+    """Parse a results page down to ``only`` and return (root, find(root)).
+
+    When the partial tree gives no containers (markup changed so that only
+    a fallback selector needing the rest of the page matches), the page is
+    parsed again in full.
+    """
+    root = parse_html(content, backend, only=only)
+    found = find(root)
+    if not found and only is not None and isinstance(root, BeautifulSoup):
+        logger.info("No containers in the partial parse, parsing the full page")
+        root = parse_html(content, backend)
+        found = find(root)
+    return root, found
+
+
+def _lineage(node):
+    """Identity keys of node and then each of its ancestors, for a node from any backend"""
+    if isinstance(node, SelectolaxNode):
+        current = node.node
+        while current is not None:
+            yield current.mem_id
+            current = current.parent
+    elif isinstance(node, LxmlNode):
+        # lxml keeps one proxy per element while it is referenced, so id() is stable here
+        yield id(node.element)
+        for ancestor in node.element.iterancestors():
+            yield id(ancestor)
+    else:
+        yield id(node)
+        for parent in node.parents:
+            yield id(parent)
+
+
+def outermost(nodes):
+    """nodes without the ones nested inside another of them, in their original order
+
+    Fallback container selectors such as [data-asin] match a product card
+    and wrappers inside it too; only the outermost match is a whole card.
+    """
+    if len(nodes) < 2:
+        return nodes
+    matched = {next(_lineage(node)) for node in nodes}
+    kept = [node for node in nodes if not any(key in matched for key in islice(_lineage(node), 1, None))]
+    if len(kept) < len(nodes):
+        logger.debug(f"Dropped {len(nodes) - len(kept)} containers nested in other containers")
+    return kept
+
+
+class LxmlNode:
+    """BeautifulSoup-like wrapper around an lxml element"""
+
+    __slots__ = ('element',)
+
+    # Compiled CSSSelector per selector string, shared by all pages
+    _selectors = {}
+
+    def __init__(self, element):
+        self.element = element
+
+    @classmethod
+    def _compile(cls, selector):
+        compiled = cls._selectors.get(selector)
+        if compiled is None:
+            compiled = CSSSelector(selector)
+            cls._selectors[selector] = compiled
+        return compiled
+
+    def _matches(self, selector):
+        # Accepts a selector string or an already compiled CSSSelector
+        compiled = selector if callable(selector) else self._compile(selector)
+        matches = compiled(self.element)
+        # CSSSelector matches descendant-or-self (self comes first); BeautifulSoup only descendants
+        if matches and matches[0] is self.element:
+            del matches[0]
+        return matches
+
+    def select(self, selector):
+        return [LxmlNode(match) for match in self._matches(selector)]
+
+    def select_one(self, selector):
+        matches = self._matches(selector)
+        return LxmlNode(matches[0]) if matches else None
+
+    def get(self, key, default=None):
+        value = self.element.get(key)
+        if value is None:
+            return default
+        if key == 'class':
+            return value.split()
+        return value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get_text(self, separator='', strip=False):
+        texts = self.element.itertext()
+        if strip:
+            return separator.join(text.strip() for text in texts if text.strip())
+        return separator.join(texts)
+
+    def __str__(self):
+        return lxml.html.tostring(self.element, encoding='unicode', with_tail=False)
+
+
+class SelectolaxNode:
+    """BeautifulSoup-like wrapper around a selectolax (lexbor) node"""
+
+    __slots__ = ('node',)
+
+    def __init__(self, node):
+        self.node = node
+
+    def _matches(self, selector):
+        matches = self.node.css(selector)
+        # lexbor matches the node itself too (self comes first); BeautifulSoup only descendants
+        if matches and matches[0] == self.node:
+            del matches[0]
+        return matches
+
+    def select(self, selector):
+        return [SelectolaxNode(match) for match in self._matches(selector)]
+
+    def select_one(self, selector):
+        first = self.node.css_first(selector)
+        if first is None:
+            return None
+        if first != self.node:
+            return SelectolaxNode(first)
+        matches = self._matches(selector)
+        return SelectolaxNode(matches[0]) if matches else None
+
+    def get(self, key, default=None):
+        attributes = self.node.attributes
+        if key not in attributes:
+            return default
+        value = attributes[key]
+        if value is None:
+            # Boolean attribute such as <input disabled>
+            value = ''
+        if key == 'class':
+            return value.split()
+        return value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get_text(self, separator='', strip=False):
+        return self.node.text(deep=True, separator=separator, strip=strip)
+
+    def __str__(self):
+        return self.node.html
+
+
+class CompiledSelector:
+    """A CSS selector compiled once, up front, for every installed backend.
+
+    select / select_one take a node from any backend (BeautifulSoup Tag,
+    LxmlNode or SelectolaxNode) and skip per-call selector parsing and cache
+    lookups. selectolax has no compiled form, so it gets the string.
+    """
+
+    __slots__ = ('selector', '_soupsieve', '_lxml')
+
+    def __init__(self, selector):
+        self.selector = selector
+        self._soupsieve = soupsieve.compile(selector)
+        self._lxml = LxmlNode._compile(selector) if lxml is not None else None
+
+    def select_one(self, node):
+        if isinstance(node, SelectolaxNode):
+            return node.select_one(self.selector)
+        if isinstance(node, LxmlNode):
+            return node.select_one(self._lxml)
+        return self._soupsieve.select_one(node)
+
+    def select(self, node):
+        if isinstance(node, SelectolaxNode):
+            return node.select(self.selector)
+        if isinstance(node, LxmlNode):
+            return node.select(self._lxml)
+        return self._soupsieve.select(node)
+
+    def __repr__(self):
+        return f"CompiledSelector({self.selector!r})"
@@ -1,5 +1,3 @@
-import requests
-from bs4 import BeautifulSoup
 import json
 import re
 import time
@@ -7,14 +5,202 @@ import random
 from urllib.parse import quote
 import logging
 
+import metrics
+from fetch_engine import FetchPolicy, get_engine
+from rate_limiter import RateLimit
+from extraction_schema import Field, Schema, selector_chain
+from html_parsing import CompiledSelector, PartialParse, outermost, parse_containers, parse_html
+from product_record import json_default, product_record
+import product_store
+from search_summary import product_summary
+from page_fetcher import SeenProducts, PAGE_OK, PAGE_FAILED
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Label for this scraper's selector stats and metrics
+SITE = 'jiomart'
+
+# Request pacing and retry behaviour for jiomart.com (longer delays, it blocks aggressively)
+FETCH_POLICY = FetchPolicy(
+    site=SITE,
+    rate_limit=RateLimit(initial_rate=0.15, min_rate=0.03, max_rate=0.5),
+    timeout=20,
+    status_backoff={400: (10, 20), 429: (20, 40), 403: (15, 30)},
+    default_backoff=(5, 10),
+    error_backoff=(10, 20),
+    cache_ttl=1800
+)
+
+# Used by extract_product_data, compiled once per process
+NON_AMOUNT_RE = re.compile(r'[^\d.]')
+VARIANT_VALUE = CompiledSelector('.variant_value')
+
+# data-* attributes of the GTM events element
+GTM_ATTRIBUTES = ('name', 'id', 'manu', 'brandid', 'cate', 'subcate', 'l4category', 'vertical',
+                  'price', 'sellername', 'image', 'alternate')
+
+
+def gtm_attributes(element):
+    return {name: element.get('data-' + name, '') for name in GTM_ATTRIBUTES}
+
+
+def product_name(element):
+    # The title attribute sometimes holds the untruncated name
+    name = element.get_text(strip=True)
+    title_attr = element.get('title')
+    if title_attr and len(title_attr) > len(name):
+        return title_attr
+    return name
+
+
+def absolute_url(href):
+    if href.startswith('/'):
+        return 'https://www.jiomart.com' + href
+    if href.startswith('https://'):
+        return href
+    return 'https://www.jiomart.com/' + href
+
+
+def rupee_text(text):
+    return text if '₹' in text else None
+
+
+def parse_amount(text, default):
+    amount = NON_AMOUNT_RE.sub('', text)
+    if amount:
+        try:
+            return float(amount)
+        except ValueError:
+            pass
+    return default
+
+
+def image_source(element):
+    return element.get('src') or element.get('data-src')
+
+
+def variant_value(element):
+    value = VARIANT_VALUE.select_one(element)
+    return value.get_text(strip=True) if value else None
+
+
+def food_type(src):
+    if 'non-veg' in src:
+        return 'non-veg'
+    if 'veg' in src:
+        return 'veg'
+    return None
+
+
+# Selector fallbacks per field; compiled once at import
+PRODUCT_SCHEMA = Schema(
+    SITE,
+    gtm=Field('.gtmEvents', value=gtm_attributes),
+    name=Field([
+        '.plp-card-details-name',
+        '.jm-body-xs.jm-fc-primary-grey-80',
+        'h2 span',
+        '[title]'
+    ], value=product_name),
+    url=Field([
+        'a[href*="/p/"]',
+        '.plp-card-wrapper[href]',
+        'a.plp-card-wrapper'
+    ], attr='href', parse=absolute_url),
+    price=Field([
+        '.jm-heading-xxs.jm-mb-xxs',
+        '.plp-card-details-price span.jm-heading-xxs',
+        'span.jm-heading-xxs'
+    ], parse=rupee_text),
+    original_price=Field([
+        '.line-through',
+        '.jm-fc-primary-grey-60.line-through',
+        'span.line-through'
+    ], parse=rupee_text),
+    discount_percentage=Field([
+        '.jm-badge',
+        '.plp-card-details-discount .jm-badge',
+        'span.jm-badge'
+    ], parse=lambda text: text if '%' in text and 'off' in text.lower() else None),
+    image_url=Field([
+        'img[src*="jiomart.com/images"]',
+        '.plp-card-image img[src]',
+        'img.lazyloaded[src]',
+        'img[data-src]'
+    ], value=image_source, parse=lambda src: src if src and 'jiomart-default-image' not in src else None),
+    is_fulfilled_by_jiomart=Field('.jm-badge-popular-curve', value=lambda element: element.get_text(),
+                                  parse=lambda text: 'Fulfilled By JioMart' in text),
+    variant_info=Field('.variant_dropdown', value=variant_value),
+    food_type=Field('.plp-card-foodtype img', value=lambda element: element.get('src', ''), parse=food_type)
+)
+
+# Fields read on every card; name and price are only needed when the GTM data lacks them
+CARD_FIELDS = [name for name in PRODUCT_SCHEMA.fields if name not in ('name', 'price')]
+
+
+def card_key(element):
+    """Product id on the card (its GTM events data-id, else data-objid), known before extraction"""
+    gtm = element.select_one('.gtmEvents[data-id]')
+    if gtm is not None:
+        return gtm.get('data-id')
+    return element.get('data-id') or element.get('data-objid')
+
+
+# Product card selectors, tried in order of which ones the site currently matches
+PRODUCT_CONTAINERS = selector_chain(SITE, 'containers', [
+    '.ais-InfiniteHits-item',
+    'li.ais-InfiniteHits-item',
+    '.plp-card-wrapper',
+    'a.plp-card-wrapper',
+    '[data-objid]',
+    '.gtmEvents'
+])
+
+# Elements a results page is reduced to when parsing with bs4: product cards and the load-more button
+PAGE_NODES = PartialParse([
+    '.ais-InfiniteHits-item',
+    '.plp-card-wrapper',
+    '[data-objid]',
+    '.gtmEvents',
+    '.ais-InfiniteHits-loadMore'
+])
+
+# Fields of one product card, with their defaults; shared fields repeat across products
+JioMartProduct = product_record('JioMartProduct', {
+    'name': '',
+    'url': '',
+    'price': '',
+    'original_price': '',
+    'discount_percentage': '',
+    'savings_amount': 0,
+    'image_url': '',
+    'brand': '',
+    'price_numeric': 0,
+    'original_price_numeric': 0,
+    'product_id': '',
+    'seller_name': '',
+    'manufacturer': '',
+    'category': '',
+    'subcategory': '',
+    'l4category': '',
+    'vertical': '',
+    'is_fulfilled_by_jiomart': False,
+    'variant_info': '',
+    'food_type': 'veg'  # Default to veg based on the icon in sample
+}, shared=(
+    'discount_percentage', 'brand', 'seller_name', 'manufacturer', 'category', 'subcategory',
+    'l4category', 'vertical', 'variant_info', 'food_type'
+))
+
 class JioMartScraper:
-    def __init__(self):
+    def __init__(self, parser=None):
         self.base_url = "https://www.jiomart.com/search/{search_term}"
-        self.session = requests.Session()
+        self.engine = get_engine()
+        
+        # HTML parser backend (see html_parsing), None uses SCRAPER_PARSER / fastest installed
+        self.parser = parser
         
         # More realistic and recent user agents
         self.user_agents = [
@@ -42,12 +228,12 @@ class JioMartScraper:
             'sec-ch-ua-platform': '"macOS"'
         }
         
-        # Set up session with cookies
-        self.session.cookies.update({
+        # Session cookies sent with every request
+        self.cookies = {
             'lang': 'en',
             'deviceId': f'web-{random.randint(10000000, 99999999)}-{random.randint(1000, 9999)}-{random.randint(1000, 9999)}-{random.randint(1000, 9999)}-{random.randint(100000000000, 999999999999)}',
             'visitId': str(random.randint(1000000000000, 9999999999999))
-        })
+        }
     
     def get_random_user_agent(self):
         return random.choice(self.user_agents)
@@ -70,91 +256,31 @@ class JioMartScraper:
         return url
     
     def make_request(self, url, max_retries=3):
-        """Make HTTP request with enhanced stealth techniques"""
-        for attempt in range(max_retries):
-            try:
-                # Create fresh headers for each request
-                headers = self.base_headers.copy()
-                headers['User-Agent'] = self.get_random_user_agent()
-                
-                # Add referer for subsequent requests
-                if attempt > 0:
-                    headers['Referer'] = 'https://www.jiomart.com/'
-                
-                # Random delay between requests (longer delays)
-                time.sleep(random.uniform(5, 10))
-                
-                logger.info(f"Attempting request to: {url}")
-                response = self.session.get(url, headers=headers, timeout=20)
-                
-                logger.info(f"Response status: {response.status_code}")
-                
-                if response.status_code == 200:
-                    return response
-                elif response.status_code == 400:
-                    logger.warning(f"Bad request (400) - possibly blocked. Attempt {attempt + 1}")
-                    time.sleep(random.uniform(10, 20))
-                elif response.status_code == 429:
-                    logger.warning(f"Rate limited (429), waiting before retry {attempt + 1}")
-                    time.sleep(random.uniform(20, 40))
-                elif response.status_code == 403:
-                    logger.warning(f"Forbidden (403) - access denied. Attempt {attempt + 1}")
-                    time.sleep(random.uniform(15, 30))
-                else:
-                    logger.warning(f"Status code {response.status_code}, attempt {attempt + 1}")
-                    time.sleep(random.uniform(5, 10))
-                    
-            except requests.RequestException as e:
-                logger.error(f"Request failed: {e}, attempt {attempt + 1}")
-                time.sleep(random.uniform(10, 20))
+        """Make HTTP request through the shared fetch engine with enhanced stealth headers"""
+        def build_headers(attempt):
+            # Create fresh headers for each request
+            headers = self.base_headers.copy()
+            headers['User-Agent'] = self.get_random_user_agent()
+            headers['Cookie'] = '; '.join(f"{name}={value}" for name, value in self.cookies.items())
+            
+            # Add referer for subsequent requests
+            if attempt > 0:
+                headers['Referer'] = 'https://www.jiomart.com/'
+            return headers
         
-        return None
+        logger.info(f"Attempting request to: {url}")
+        return self.engine.fetch(url, headers=build_headers, policy=FETCH_POLICY, max_retries=max_retries)
     
     def extract_product_data(self, product_element):
         """Extract data from a single JioMart product element"""
-        product_data = {
-            'name': '',
-            'url': '',
-            'price': '',
-            'original_price': '',
-            'discount_percentage': '',
-            'savings_amount': 0,
-            'image_url': '',
-            'brand': '',
-            'price_numeric': 0,
-            'original_price_numeric': 0,
-            'product_id': '',
-            'seller_name': '',
-            'manufacturer': '',
-            'category': '',
-            'subcategory': '',
-            'l4category': '',
-            'vertical': '',
-            'is_fulfilled_by_jiomart': False,
-            'variant_info': '',
-            'food_type': 'veg'  # Default to veg based on the icon in sample
-        }
+        product_data = JioMartProduct()
         
         try:
+            values = PRODUCT_SCHEMA.extract(product_element, names=CARD_FIELDS)
+            
             # Extract from GTM Events data attributes (most reliable source)
-            gtm_element = product_element.select_one('.gtmEvents')
-            if gtm_element:
-                # Extract data attributes
-                data_attrs = {
-                    'name': gtm_element.get('data-name', ''),
-                    'id': gtm_element.get('data-id', ''),
-                    'manu': gtm_element.get('data-manu', ''),
-                    'brandid': gtm_element.get('data-brandid', ''),
-                    'cate': gtm_element.get('data-cate', ''),
-                    'subcate': gtm_element.get('data-subcate', ''),
-                    'l4category': gtm_element.get('data-l4category', ''),
-                    'vertical': gtm_element.get('data-vertical', ''),
-                    'price': gtm_element.get('data-price', ''),
-                    'sellername': gtm_element.get('data-sellername', ''),
-                    'image': gtm_element.get('data-image', ''),
-                    'alternate': gtm_element.get('data-alternate', '')
-                }
-                
+            data_attrs = values.get('gtm')
+            if data_attrs is not None:
                 # Set extracted data
                 product_data['name'] = data_attrs['name']
                 product_data['product_id'] = data_attrs['id']
@@ -176,138 +302,30 @@ class JioMartScraper:
             
             # Extract product name from visible elements (fallback)
             if not product_data['name']:
-                name_selectors = [
-                    '.plp-card-details-name',
-                    '.jm-body-xs.jm-fc-primary-grey-80',
-                    'h2 span',
-                    '[title]'
-                ]
-                
-                for selector in name_selectors:
-                    name_element = product_element.select_one(selector)
-                    if name_element:
-                        product_data['name'] = name_element.get_text(strip=True)
-                        # Also check title attribute
-                        title_attr = name_element.get('title')
-                        if title_attr and len(title_attr) > len(product_data['name']):
-                            product_data['name'] = title_attr
-                        break
-            
-            # Extract URL
-            url_selectors = [
-                'a[href*="/p/"]',
-                '.plp-card-wrapper[href]',
-                'a.plp-card-wrapper'
-            ]
+                name = PRODUCT_SCHEMA.extract_field(product_element, 'name')
+                if name is not None:
+                    product_data['name'] = name
             
-            for selector in url_selectors:
-                url_element = product_element.select_one(selector)
-                if url_element and url_element.get('href'):
-                    href = url_element['href']
-                    if href.startswith('/'):
-                        product_data['url'] = 'https://www.jiomart.com' + href
-                    elif href.startswith('https://'):
-                        product_data['url'] = href
-                    else:
-                        product_data['url'] = 'https://www.jiomart.com/' + href
-                    break
+            product_data['url'] = values.get('url', '')
             
             # Extract current price from visible elements
             if not product_data['price']:
-                price_selectors = [
-                    '.jm-heading-xxs.jm-mb-xxs',
-                    '.plp-card-details-price span.jm-heading-xxs',
-                    'span.jm-heading-xxs'
-                ]
-                
-                for selector in price_selectors:
-                    price_element = product_element.select_one(selector)
-                    if price_element:
-                        price_text = price_element.get_text(strip=True)
-                        if '₹' in price_text:
-                            product_data['price'] = price_text
-                            # Extract numeric value
-                            price_numeric = re.sub(r'[^\d.]', '', price_text)
-                            if price_numeric:
-                                try:
-                                    product_data['price_numeric'] = float(price_numeric)
-                                except:
-                                    pass
-                            break
+                price_text = PRODUCT_SCHEMA.extract_field(product_element, 'price')
+                if price_text is not None:
+                    product_data['price'] = price_text
+                    product_data['price_numeric'] = parse_amount(price_text, product_data['price_numeric'])
             
             # Extract original price (MRP)
-            original_price_selectors = [
-                '.line-through',
-                '.jm-fc-primary-grey-60.line-through',
-                'span.line-through'
-            ]
-            
-            for selector in original_price_selectors:
-                original_price_element = product_element.select_one(selector)
-                if original_price_element:
-                    original_price_text = original_price_element.get_text(strip=True)
-                    if '₹' in original_price_text:
-                        product_data['original_price'] = original_price_text
-                        # Extract numeric value
-                        price_numeric = re.sub(r'[^\d.]', '', original_price_text)
-                        if price_numeric:
-                            try:
-                                product_data['original_price_numeric'] = float(price_numeric)
-                            except:
-                                pass
-                        break
+            original_price_text = values.get('original_price')
+            if original_price_text is not None:
+                product_data['original_price'] = original_price_text
+                product_data['original_price_numeric'] = parse_amount(original_price_text, product_data['original_price_numeric'])
             
-            # Extract discount percentage
-            discount_selectors = [
-                '.jm-badge',
-                '.plp-card-details-discount .jm-badge',
-                'span.jm-badge'
-            ]
-            
-            for selector in discount_selectors:
-                discount_element = product_element.select_one(selector)
-                if discount_element:
-                    discount_text = discount_element.get_text(strip=True)
-                    if '%' in discount_text and 'off' in discount_text.lower():
-                        product_data['discount_percentage'] = discount_text
-                        break
-            
-            # Extract image URL
-            image_selectors = [
-                'img[src*="jiomart.com/images"]',
-                '.plp-card-image img[src]',
-                'img.lazyloaded[src]',
-                'img[data-src]'
-            ]
-            
-            for selector in image_selectors:
-                image_element = product_element.select_one(selector)
-                if image_element:
-                    src = image_element.get('src') or image_element.get('data-src')
-                    if src and 'jiomart-default-image' not in src:
-                        product_data['image_url'] = src
-                        break
-            
-            # Check if fulfilled by JioMart
-            fulfillment_element = product_element.select_one('.jm-badge-popular-curve')
-            if fulfillment_element and 'Fulfilled By JioMart' in fulfillment_element.get_text():
-                product_data['is_fulfilled_by_jiomart'] = True
-            
-            # Extract variant information (like size options)
-            variant_element = product_element.select_one('.variant_dropdown')
-            if variant_element:
-                variant_value = variant_element.select_one('.variant_value')
-                if variant_value:
-                    product_data['variant_info'] = variant_value.get_text(strip=True)
-            
-            # Check food type (veg/non-veg)
-            food_type_element = product_element.select_one('.plp-card-foodtype img')
-            if food_type_element:
-                src = food_type_element.get('src', '')
-                if 'non-veg' in src:
-                    product_data['food_type'] = 'non-veg'
-                elif 'veg' in src:
-                    product_data['food_type'] = 'veg'
+            product_data['discount_percentage'] = values.get('discount_percentage', '')
+            product_data['image_url'] = values.get('image_url', '')
+            product_data['is_fulfilled_by_jiomart'] = values.get('is_fulfilled_by_jiomart', False)
+            product_data['variant_info'] = values.get('variant_info', '')
+            product_data['food_type'] = values.get('food_type', product_data['food_type'])
             
             # Calculate savings if both prices are available
             if product_data['price_numeric'] and product_data['original_price_numeric']:
@@ -324,10 +342,27 @@ class JioMartScraper:
         
         return product_data
     
-    def search_products(self, search_term, max_pages=5):
-        """Search for products and extract data with proper URL encoding"""
-        all_products = []
+    def find_product_containers(self, soup):
+        """Product card elements on a parsed results page"""
+        # Find product containers using multiple selectors
+        for index, selector in PRODUCT_CONTAINERS.ordered:
+            products = selector.select(soup)
+            if products:
+                logger.info(f"Found {len(products)} products using selector: {selector.selector}")
+                PRODUCT_CONTAINERS.hit(index)
+                # [data-objid] can match a card and elements inside it
+                return outermost(products)
         
+        PRODUCT_CONTAINERS.miss()
+        return []
+    
+    def iter_search_pages(self, search_term, max_pages=5, seen=None):
+        """Yield (page, status, products) for each results page as soon as it is parsed
+        
+        Products repeated across pages are returned once; pass a
+        SeenProducts as seen to read how many repeats were skipped.
+        """
+        seen = seen if seen is not None else SeenProducts()
         for page in range(1, max_pages + 1):
             logger.info(f"Scraping page {page} for '{search_term}'")
             
@@ -339,33 +374,19 @@ class JioMartScraper:
             
             if not response:
                 logger.error(f"Failed to fetch page {page}")
+                yield page, PAGE_FAILED, []
                 continue
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Find product containers using multiple selectors
-            product_selectors = [
-                '.ais-InfiniteHits-item',
-                'li.ais-InfiniteHits-item',
-                '.plp-card-wrapper',
-                'a.plp-card-wrapper',
-                '[data-objid]',
-                '.gtmEvents'
-            ]
-            
-            products_found = []
-            for selector in product_selectors:
-                products = soup.select(selector)
-                if products:
-                    products_found = products
-                    logger.info(f"Found {len(products)} products using selector: {selector}")
-                    break
+            with metrics.PARSE_SECONDS.labels(SITE).time():
+                soup, products_found = parse_containers(response.content, self.parser, PAGE_NODES, self.find_product_containers)
             
             if not products_found:
                 logger.warning(f"No products found on page {page}")
+                # Don't keep serving a block or empty page from the response cache
+                self.engine.discard_cached(url)
                 # Try alternative selectors for debugging
                 logger.info("Trying alternative selectors for debugging...")
-                all_divs = soup.find_all('div', class_=True)
+                all_divs = soup.select('div[class]')
                 logger.info(f"Found {len(all_divs)} divs with classes")
                 
                 # Look for common product container patterns
@@ -378,30 +399,43 @@ class JioMartScraper:
             
             logger.info(f"Found {len(products_found)} product containers on page {page}")
             
-            page_products = 0
+            page_products = []
             for product_element in products_found:
-                product_data = self.extract_product_data(product_element)
+                # Cards this job already extracted are skipped before extraction
+                key = card_key(product_element)
+                if seen.is_duplicate(key):
+                    continue
+                with metrics.EXTRACT_SECONDS.labels(SITE).time():
+                    product_data = self.extract_product_data(product_element)
                 
-                # Only add products with meaningful data
+                # Only add products with meaningful data, once per job (by id or canonical URL when the card had no key)
                 if product_data['name'] and (product_data['price'] or product_data['url']):
-                    all_products.append(product_data)
-                    page_products += 1
+                    if seen.claim(key or product_store.product_key(SITE, product_data)):
+                        page_products.append(product_data)
             
-            logger.info(f"Extracted {page_products} valid products from page {page}")
+            logger.info(f"Extracted {len(page_products)} valid products from page {page}")
             
             # If no products found on this page, might be end of results
-            if page_products == 0:
+            if not page_products:
                 logger.info("No valid products found on this page, stopping pagination")
                 break
             
+            yield page, PAGE_OK, page_products
+            
             # Check if there are more pages
             load_more_button = soup.select_one('.ais-InfiniteHits-loadMore')
             if not load_more_button or 'disabled' in load_more_button.get('class', []):
                 logger.info("No more pages available")
                 break
             
-            # Random delay between pages
-            time.sleep(random.uniform(8, 15))
+    
+    def search_products(self, search_term, max_pages=5, seen=None):
+        """Search for products and extract data with proper URL encoding"""
+        all_products = []
+        
+        for page, status, products in self.iter_search_pages(search_term, max_pages, seen=seen):
+            if status == PAGE_OK:
+                all_products.extend(products)
         
         return all_products
     
@@ -409,7 +443,7 @@ class JioMartScraper:
         """Save data to JSON file"""
         try:
             with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+                json.dump(data, f, indent=2, ensure_ascii=False, default=json_default)
             logger.info(f"Data saved to {filename}")
             return True
         except Exception as e:
@@ -417,47 +451,22 @@ class JioMartScraper:
             return False
     
     def get_search_summary(self, products):
-        """Generate summary statistics"""
+        """Generate summary statistics (price and discount fields come from search_summary)"""
         if not products:
             return {'total_products': 0}
         
-        total_products = len(products)
-        products_with_price = [p for p in products if p.get('price_numeric', 0) > 0]
-        
-        summary = {
-            'total_products': total_products,
-            'products_with_price': len(products_with_price),
-            'products_with_discounts': len([p for p in products if p.get('discount_percentage')]),
-            'fulfilled_by_jiomart': len([p for p in products if p.get('is_fulfilled_by_jiomart')]),
-            'brands_found': list(set([p['brand'] for p in products if p.get('brand')])),
-            'categories_found': list(set([p['category'] for p in products if p.get('category')])),
-            'sellers_found': list(set([p['seller_name'] for p in products if p.get('seller_name')])),
-            'price_range': {},
-            'avg_discount': 0,
+        # JioMart cards carry no rating; prices include paise
+        summary, columns = product_summary(products, ratings=False, integer_mean=False)
+        summary.update({
+            'fulfilled_by_jiomart': columns.count('is_fulfilled_by_jiomart'),
+            'brands_found': columns.distinct('brand'),
+            'categories_found': columns.distinct('category'),
+            'sellers_found': columns.distinct('seller_name'),
             'food_types': {
-                'veg': len([p for p in products if p.get('food_type') == 'veg']),
-                'non_veg': len([p for p in products if p.get('food_type') == 'non-veg'])
-            }
-        }
-        
-        if products_with_price:
-            prices = [p['price_numeric'] for p in products_with_price]
-            summary['price_range'] = {
-                'min_price': min(prices),
-                'max_price': max(prices),
-                'avg_price': round(sum(prices) / len(prices), 2)
+                'veg': columns.count_equal('food_type', 'veg'),
+                'non_veg': columns.count_equal('food_type', 'non-veg')
             }
-        
-        # Calculate average discount
-        discount_products = []
-        for p in products:
-            if p.get('discount_percentage'):
-                discount_match = re.search(r'(\d+)', p['discount_percentage'])
-                if discount_match:
-                    discount_products.append(int(discount_match.group(1)))
-        if discount_products:
-            summary['avg_discount'] = round(sum(discount_products) / len(discount_products), 1)
-        
+        })
         return summary
 
 # Alternative browser automation approach (requires selenium)
@@ -513,8 +522,8 @@ def scrape_jiomart_with_selenium(search_term, max_pages=3):
                 logger.warning(f"Timeout waiting for products on page {page}")
                 continue
             
-            # Get page source and parse with BeautifulSoup
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
+            # Get page source and parse it
+            soup = parse_html(driver.page_source, scraper.parser)
             
             # Extract products using the same logic
             product_elements = soup.select('.ais-InfiniteHits-item')
@@ -557,11 +566,15 @@ def scrape_jiomart_products(search_term, max_pages=3):
     logger.info(f"Searching for '{search_term}' on JioMart...")
     logger.info(f"Example URL will be: {scraper.build_search_url(search_term, 1)}")
     
-    products = scraper.search_products(search_term, max_pages=max_pages)
+    seen = SeenProducts()
+    products = scraper.search_products(search_term, max_pages=max_pages, seen=seen)
     
     if products:
         # Generate summary
-        summary = scraper.get_search_summary(products)
+        with metrics.SUMMARY_SECONDS.labels(SITE).time():
+            summary = scraper.get_search_summary(products)
+        # Listings skipped because the job had already extracted the product
+        summary['duplicates_skipped'] = seen.duplicates
         
         # Prepare final data structure
         result = {
@@ -657,15 +670,20 @@ def main():
     result_json = scrape_jiomart_products_robust(search_term, max_pages)
     
     # Output JSON to console
-    print(json.dumps(result_json, indent=2, ensure_ascii=False))
+    print(json.dumps(result_json, indent=2, ensure_ascii=False, default=json_default))
     
     # Also save to file
     filename = f"jiomart_{search_term.replace(' ', '_')}_{int(time.time())}.json"
     with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(result_json, f, indent=2, ensure_ascii=False)
+        json.dump(result_json, f, indent=2, ensure_ascii=False, default=json_default)
     
     print(f"\n\nData also saved to: {filename}", file=sys.stderr)
     
+    # And to the product store, when SCRAPER_PRODUCT_DB is set
+    stored = product_store.save_search_result(SITE, result_json)
+    if stored:
+        print(f"Stored {stored} products in {product_store.DB_PATH}", file=sys.stderr)
+    
     # Print summary
     if result_json.get('summary', {}).get('total_products', 0) > 0:
         summary = result_json['summary']
@@ -34,7 +34,7 @@ try:
         
 except ImportError as e:
     print(f"❌ Import error: {e}")
-    print("💡 Run: pip install flask flask-cors requests beautifulsoup4")
+    print("💡 Run: pip install flask flask-cors requests beautifulsoup4 httpx")
 except Exception as e:
     print(f"❌ Error: {e}")
     import traceback
@@ -0,0 +1,110 @@
+"""Prometheus metrics for every stage of a scrape, exported by the backend at /api/metrics.
+
+Metrics are prometheus_client Counters and Histograms. Under gunicorn
+with several workers, gunicorn.conf.py sets PROMETHEUS_MULTIPROC_DIR
+before the app is imported, so every worker writes its samples there and
+render() adds up all workers, whichever one answers the scrape. Without
+prometheus_client installed (running a scraper on its own), the metrics
+record nothing.
+"""
+import os
+from contextlib import contextmanager
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+
+# Seconds, for request / parse / job durations
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Seconds, for work done per product or per page in-process
+FAST_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+# Bytes, for response sizes
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+CONTENT_TYPE = prometheus_client.CONTENT_TYPE_LATEST if prometheus_client else 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class NoMetric:
+    """Stands in for a metric, and its children, when prometheus_client is not installed"""
+
+    def labels(self, *values, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def observe(self, value):
+        pass
+
+    @contextmanager
+    def time(self):
+        yield
+
+
+def multiprocess_dir():
+    """Directory the workers share samples through, None outside multiprocess mode"""
+    return os.environ.get('PROMETHEUS_MULTIPROC_DIR') or os.environ.get('prometheus_multiproc_dir')
+
+
+def Counter(name, documentation, labelnames=()):
+    if prometheus_client is None:
+        return NoMetric()
+    return prometheus_client.Counter(name, documentation, labelnames)
+
+
+def Histogram(name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+    if prometheus_client is None:
+        return NoMetric()
+    return prometheus_client.Histogram(name, documentation, labelnames, buckets=buckets)
+
+
+def render():
+    """Every metric in the Prometheus text format, summed over all workers in multiprocess mode"""
+    if prometheus_client is None:
+        return ''
+    if multiprocess_dir():
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry).decode('utf-8')
+
+
+if prometheus_client is not None:
+    # The *_created series only give each label set's first-use time, which nothing here reads
+    prometheus_client.disable_created_metrics()
+
+# Fetch stage (fetch_engine); status is the HTTP code, 'blocked' for a captcha page or 'error' for transport errors
+HTTP_REQUESTS = Counter('scraper_http_requests_total', 'Outgoing page requests by scraper and response status',
+                        ['scraper', 'status'])
+HTTP_SECONDS = Histogram('scraper_http_request_seconds', 'Time for one outgoing request attempt', ['scraper'])
+HTTP_RETRIES = Counter('scraper_http_retries_total', 'Request attempts after the first for the same URL', ['scraper'])
+CACHE_RESPONSES = Counter('scraper_response_cache_total', 'Pages served from the response cache (hit or revalidated)',
+                          ['scraper', 'result'])
+SLEEP_SECONDS = Histogram('scraper_sleep_seconds',
+                          'Time spent waiting before a request: rate_limit, retry_after or backoff',
+                          ['scraper', 'reason'])
+
+# Parse and extraction stages (scrapers)
+PARSE_SECONDS = Histogram('scraper_parse_seconds', 'Time to parse one results page and find its product cards',
+                          ['scraper'], buckets=FAST_BUCKETS + (0.5, 1.0, 2.5))
+EXTRACT_SECONDS = Histogram('scraper_extract_seconds', 'Time to extract one product card', ['scraper'],
+                            buckets=FAST_BUCKETS)
+SUMMARY_SECONDS = Histogram('scraper_summary_seconds', 'Time to build the search summary of one scrape', ['scraper'],
+                            buckets=FAST_BUCKETS)
+
+# Whole scrapes and API responses (backend)
+SCRAPES = Counter('scraper_scrapes_total', 'Scraper runs by outcome (completed, error, failed)', ['scraper', 'outcome'])
+SCRAPE_SECONDS = Histogram('scraper_scrape_seconds', 'Wall time of one scraper run', ['scraper'])
+SERIALIZE_SECONDS = Histogram('scraper_serialize_seconds', 'Time to serialize an API response carrying scrape results',
+                              ['scraper'], buckets=FAST_BUCKETS)
+RESPONSE_BYTES = Histogram('scraper_response_bytes', 'Size of API responses carrying scrape results',
+                           ['scraper'], buckets=SIZE_BUCKETS)
+STORE_SECONDS = Histogram('scraper_store_seconds', 'Time to write one batch of products to the product store',
+                          ['scraper'], buckets=FAST_BUCKETS + (0.5, 1.0, 2.5))
+MATCH_SECONDS = Histogram('scraper_match_seconds', 'Time to add one batch of products to the cross-site matching index',
+                          ['scraper'], buckets=FAST_BUCKETS + (0.5, 1.0, 2.5))
@@ -0,0 +1,401 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+import metrics
+import product_store
+from html_parsing import parse_containers
+
+logger = logging.getLogger(__name__)
+
+# Page outcomes reported by a scraper's scrape_page
+PAGE_OK = 'ok'
+PAGE_FAILED = 'failed'
+PAGE_EMPTY = 'empty'
+PAGE_SKIPPED = 'skipped'
+
+# Events yielded by the scrapers' stream_* generators
+EVENT_PAGE = 'page'
+EVENT_PAGE_FAILED = 'page_failed'
+EVENT_SUMMARY = 'summary'
+
+# A results range such as '49-96 of 352 results' or 'Showing 1 – 24 of 3,016 results for'
+RESULT_RANGE_RE = re.compile(r'(\d[\d,]*)\s*[-–]\s*(\d[\d,]*)\s+of\s+(over\s+|more than\s+)?(\d[\d,]*)', re.IGNORECASE)
+
+# page=N in a pagination link
+PAGE_PARAM_RE = re.compile(r'[?&]page=(\d+)')
+
+
+class SeenProducts:
+    """Keys of the products one scrape job has extracted, shared by its pages and their threads
+
+    Pages skip cards whose key (known before extraction) was already
+    claimed, and claim a key once its card gave a valid product, so a
+    product listed again (Amazon repeats sponsored results on every page,
+    nested or duplicated cards) is extracted and returned once, and a card
+    that fails to extract doesn't hide a later one with the same key. With
+    concurrency > 1 the copy kept is the one on whichever page is parsed
+    first.
+    """
+
+    def __init__(self):
+        self._keys = set()
+        self._lock = threading.Lock()
+        self.duplicates = 0
+
+    def is_duplicate(self, key):
+        """True (counted as a duplicate) when key was already claimed in this job; claims nothing"""
+        if not key:
+            return False
+        with self._lock:
+            if key in self._keys:
+                self.duplicates += 1
+                return True
+        return False
+
+    def claim(self, key):
+        """True the first time key is claimed in this job, or when there is no key; False (a duplicate) afterwards"""
+        if not key:
+            return True
+        with self._lock:
+            if key in self._keys:
+                self.duplicates += 1
+                return False
+            self._keys.add(key)
+            return True
+
+
+class PageLimit:
+    """Last results page of one scrape job, lowered as its pages find where the results end
+
+    Starts at max_pages. A page that finds the end (no next-page link, the
+    result count reached, the previous page served again, no products)
+    calls stop_after, and iter_pages neither starts nor yields pages after
+    the last page; scrape_page doesn't send the request of a page that
+    became past_end while it waited for the rate limiter. Setting
+    cancel_event (the job's) stops the job the same way at its next page
+    or request. Shared by the job's pages and their threads.
+    """
+
+    def __init__(self, max_pages, max_products=None, cancel_event=None):
+        self.last_page = max_pages
+        self.max_products = max_products
+        self.cancel_event = cancel_event
+        self._found = {}
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+
+    def found(self, page, count):
+        """Record the number of products page returned"""
+        with self._lock:
+            self._found[page] = count
+
+    def cancelled(self):
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+    def skip(self, page):
+        """True when page should not be fetched: the job was cancelled or the page is past_end"""
+        return self.cancelled() or self.past_end(page)
+
+    def past_end(self, page):
+        """True when page is not needed: it is after the last page, or earlier pages found max_products"""
+        if page > self.last_page:
+            return True
+        if not self.max_products:
+            return False
+        with self._lock:
+            return sum(count for done, count in self._found.items() if done < page) >= self.max_products
+
+    def stop_after(self, page, reason):
+        """Make page the last one (unless an earlier page already is)"""
+        with self._lock:
+            if page >= self.last_page:
+                return
+            self.last_page = page
+        logger.info(f"Results end at page {page}: {reason}")
+
+    def repeated(self, page, fingerprint):
+        """True when a page's cards (fingerprint, e.g. their product ids) are the page before it served again
+
+        Sites asked for a page past the end often serve the last page once
+        more. When the page after this one was parsed first with the same
+        cards, that page already holds the products and becomes the last one.
+        """
+        if not fingerprint or not any(fingerprint):
+            return False
+        with self._lock:
+            self._fingerprints[page] = fingerprint
+            before = self._fingerprints.get(page - 1)
+            after = self._fingerprints.get(page + 1)
+        if before == fingerprint:
+            self.stop_after(page - 1, f"page {page} repeats it")
+            return True
+        if after == fingerprint:
+            self.stop_after(page + 1, f"it repeats page {page}")
+        return False
+
+
+def range_complete(text):
+    """True when a result count such as '49-96 of 96 results' shows the last result; False for 'of over 10,000'"""
+    match = RESULT_RANGE_RE.search(text or '')
+    if not match or match.group(3):
+        return False
+    return int(match.group(2).replace(',', '')) >= int(match.group(4).replace(',', ''))
+
+
+def linked_pages(links):
+    """Highest page=N among the hrefs of pagination links, 0 when none has one"""
+    pages = [int(match.group(1)) for link in links for match in PAGE_PARAM_RE.finditer(link.get('href') or '')]
+    return max(pages, default=0)
+
+
+def iter_pages(page_task, max_pages, concurrency=1, limit=None, max_products=None):
+    """Run page_task(page) for pages 1..max_pages and yield (page, status, products) in page order.
+
+    page_task returns a (status, products) tuple, PAGE_SKIPPED for a page it
+    found past the end before fetching it. Iteration stops after the first
+    empty page, after limit.last_page (a PageLimit page_task lowers when it
+    finds the end of the results) and once max_products products were
+    yielded; the page that reaches max_products is cut to fit. With
+    concurrency > 1 pages are fetched and parsed on a thread pool of that
+    size (requests are still limited per domain by the fetch engine), and
+    pages past the end that have not started yet are skipped. Pacing
+    between requests is left to the fetch engine's per-domain rate limiter.
+    """
+    limit = limit if limit is not None else PageLimit(max_pages, max_products)
+    remaining = max_products or None
+    pages = range(1, max_pages + 1)
+
+    def results(page, status, products):
+        """(page, status, products) cut to max_products, and whether it is the last page to yield"""
+        nonlocal remaining
+        if remaining is not None:
+            products = products[:remaining]
+            remaining -= len(products)
+        done = status == PAGE_EMPTY or page >= limit.last_page or remaining == 0
+        if remaining == 0 and page < limit.last_page:
+            logger.info(f"Reached {max_products} products on page {page}")
+        return (page, status, products), done
+
+    if concurrency <= 1:
+        for page in pages:
+            if limit.cancelled():
+                logger.info(f"Cancelled before page {page}")
+                return
+            status, products = page_task(page)
+            if status == PAGE_SKIPPED or page > limit.last_page:
+                # The page found it is past the end (the previous page again)
+                return
+            result, done = results(page, status, products)
+            yield result
+            if done:
+                return
+        return
+
+    def run(page):
+        # Pages queued behind the end of the results or enough products, or after a cancel, are never fetched
+        if limit.skip(page):
+            return PAGE_SKIPPED, []
+        status, products = page_task(page)
+        limit.found(page, len(products))
+        if status == PAGE_EMPTY:
+            limit.stop_after(page, 'no products')
+        return status, products
+
+    with ThreadPoolExecutor(max_workers=min(concurrency, max_pages), thread_name_prefix='page-fetch') as executor:
+        futures = [(page, executor.submit(run, page)) for page in pages]
+        try:
+            for page, future in futures:
+                status, products = future.result()
+                if limit.cancelled():
+                    logger.info(f"Cancelled after page {page - 1}")
+                    return
+                if status == PAGE_SKIPPED or page > limit.last_page:
+                    # Later pages are past the end of the results
+                    return
+                result, done = results(page, status, products)
+                yield result
+                if done:
+                    return
+        finally:
+            # Don't start pages nobody will consume
+            for _, pending in futures:
+                pending.cancel()
+
+
+class ResultsPageScraper:
+    """Fetch / parse / extract pipeline of the scrapers whose results pages are numbered
+
+    A subclass sets site (the label of its selector stats and metrics),
+    page_nodes (the PartialParse a results page is reduced to) and card_key
+    (a card's product id, known before extraction), and provides engine,
+    parser, build_page_url, make_request, find_product_containers,
+    results_end, extract_product_data and get_search_summary.
+    """
+
+    site = None
+    page_nodes = None
+
+    @staticmethod
+    def card_key(element):
+        return None
+
+    def parse_page(self, content, page=1, seen=None, limit=None):
+        """Parse one results page and extract its products, returns (status, products)
+
+        seen (a SeenProducts shared by the job's pages) skips products the
+        job already extracted; without it only repeats within the page are.
+        limit (the job's PageLimit) is told when this is the last page.
+        """
+        seen = seen if seen is not None else SeenProducts()
+        with metrics.PARSE_SECONDS.labels(self.site).time():
+            root, products_found = parse_containers(content, self.parser, self.page_nodes, self.find_product_containers)
+        if not products_found:
+            logger.warning(f"No products found on page {page}")
+            return PAGE_EMPTY, []
+
+        logger.info(f"Found {len(products_found)} product containers on page {page}")
+
+        if limit is not None:
+            # A page past the end serving the previous page again adds nothing
+            if limit.repeated(page, tuple(map(self.card_key, products_found))):
+                return PAGE_OK, []
+            end = self.results_end(root, page)
+            if end:
+                limit.stop_after(page, end)
+
+        page_products = []
+        for product_element in products_found:
+            # Cards this job already extracted are skipped before extraction
+            key = self.card_key(product_element)
+            if seen.is_duplicate(key):
+                continue
+            with metrics.EXTRACT_SECONDS.labels(self.site).time():
+                product_data = self.extract_product_data(product_element)
+
+            # Only add products with meaningful data, once per job (by id or canonical URL when the card had no key)
+            if product_data['name'] and (product_data['price'] or product_data['url']):
+                if seen.claim(key or product_store.product_key(self.site, product_data)):
+                    page_products.append(product_data)
+
+        return PAGE_OK, page_products
+
+    def scrape_page(self, search_term, page, seen=None, limit=None):
+        """Fetch and extract one results page, returns (status, products)"""
+        logger.info(f"Scraping page {page} for '{search_term}'")
+
+        url = self.build_page_url(search_term, page)
+        # A page found to be past the end (or cancelled) while it waits for the rate limiter is not requested
+        cancelled = (lambda: limit.skip(page)) if limit is not None else None
+        response = self.make_request(url, cancelled=cancelled)
+
+        if not response:
+            if cancelled is not None and cancelled():
+                return PAGE_SKIPPED, []
+            return PAGE_FAILED, []
+
+        status, products = self.parse_page(response.content, page, seen, limit)
+        if status != PAGE_OK:
+            # Don't keep serving a block or empty page from the response cache
+            self.engine.discard_cached(url)
+        return status, products
+
+    def iter_search_pages(self, search_term, max_pages=5, concurrency=1, seen=None, max_products=None,
+                          cancel_event=None):
+        """Yield (page, status, products) for each results page as soon as it is parsed
+
+        status is PAGE_OK or PAGE_FAILED; iteration stops at the first empty
+        page, after the last page results_end or a repeated page reveals,
+        and once max_products products were yielded. With concurrency > 1
+        up to that many pages are fetched and parsed in parallel and still
+        yielded in page order. Products repeated across pages are returned
+        once; pass a SeenProducts as seen to read how many repeats were
+        skipped. Setting cancel_event stops before the next page.
+        """
+        seen = seen if seen is not None else SeenProducts()
+        limit = PageLimit(max_pages, max_products, cancel_event)
+        pages = iter_pages(
+            lambda page: self.scrape_page(search_term, page, seen, limit),
+            max_pages,
+            concurrency=concurrency,
+            limit=limit,
+            max_products=max_products
+        )
+        for page, status, products in pages:
+            if status == PAGE_FAILED:
+                logger.error(f"Failed to fetch page {page}")
+            elif status == PAGE_EMPTY:
+                break
+            yield page, status, products
+
+    def search_products(self, search_term, max_pages=5, concurrency=1, max_products=None):
+        """Search for products and extract data
+
+        With concurrency > 1 up to that many pages are fetched and parsed in
+        parallel (still bounded by the per-host limit in the fetch engine)
+        and merged back in page order.
+        """
+        all_products = []
+
+        for page, status, products in self.iter_search_pages(search_term, max_pages, concurrency, max_products=max_products):
+            if status == PAGE_OK:
+                all_products.extend(products)
+
+        return all_products
+
+
+def stream_products(scraper, search_term, max_pages=3, concurrency=1, max_products=None, cancel_event=None):
+    """Scrape a ResultsPageScraper's site page by page, behind each site's stream_*_products
+
+    Yields a 'page' event with each page's products as soon as it is parsed
+    ('page_failed' for pages that could not be fetched), then a 'summary'
+    event with the same fields as the site's scrape_*_products minus 'products'.
+    When cancel_event is set the scrape stops at the next page, and the
+    summary covers the pages scraped so far and has 'cancelled': True.
+    """
+    products = []
+    seen = SeenProducts()
+
+    pages_scraped = 0
+
+    pages = scraper.iter_search_pages(search_term, max_pages=max_pages, concurrency=concurrency, seen=seen,
+                                      max_products=max_products, cancel_event=cancel_event)
+    for page, status, page_products in pages:
+        pages_scraped += 1
+        if status == PAGE_FAILED:
+            yield {'event': EVENT_PAGE_FAILED, 'page': page}
+            continue
+        products.extend(page_products)
+        yield {'event': EVENT_PAGE, 'page': page, 'products': page_products}
+
+    with metrics.SUMMARY_SECONDS.labels(scraper.site).time():
+        summary = scraper.get_search_summary(products) if products else {'total_products': 0}
+    # Listings skipped because the job had already extracted the product
+    summary['duplicates_skipped'] = seen.duplicates
+    summary_event = {
+        'event': EVENT_SUMMARY,
+        'search_term': search_term,
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'total_pages_scraped': pages_scraped,
+        'summary': summary
+    }
+    if cancel_event is not None and cancel_event.is_set():
+        summary_event['cancelled'] = True
+    if not products:
+        summary_event['error'] = 'No products found'
+    yield summary_event
+
+
+def collect_events(events):
+    """Build the classic result dict (summary fields plus 'products') from a stream_* generator"""
+    products = []
+    result = {}
+    for event in events:
+        if event['event'] == EVENT_PAGE:
+            products.extend(event['products'])
+        elif event['event'] == EVENT_SUMMARY:
+            result = {key: value for key, value in event.items() if key != 'event'}
+    result['products'] = products
+    return result
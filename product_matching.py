@@ -0,0 +1,391 @@
+"""Cross-site product matching for the e-commerce scrapers.
+
+Each scrape returns its own list, and comparing the same item across
+Amazon, Flipkart, Snapdeal and JioMart meant comparing every pair of
+products. ProductMatcher normalizes titles into brand, word, model and
+size/quantity tokens (normalize_title), and indexes each product's MinHash
+signature under LSH bands. Only products sharing a band are compared.
+Each product costs a fixed number of bucket lookups, so building the
+index is near-linear. A candidate pair is linked when its token sets are
+similar enough and nothing contradicts the match (a different brand,
+storage size, pack weight or model number). Linked products form clusters
+(union-find), and products can be added at any time as new results
+arrive.
+"""
+import re
+import threading
+import zlib
+from collections import defaultdict
+from itertools import islice
+
+import numpy as np
+
+from product_store import product_key
+
+# Signature length is BANDS * ROWS; two products become candidates when all ROWS
+# hashes of any band agree: ~93% of pairs at Jaccard 0.5, ~44% at 0.3
+BANDS = 20
+ROWS = 3
+NUM_PERM = BANDS * ROWS
+
+# Token-set Jaccard similarity a candidate pair needs to be linked; one title usually
+# extends the other (Amazon's long titles), and when instead each has words the other
+# lacks ('Noise Laptop 4' / 'Noise Monitor 4') the stricter threshold applies
+MATCH_THRESHOLD = 0.5
+DISJOINT_THRESHOLD = 0.7
+
+# Members of one LSH bucket a new product is compared with (the most recent ones);
+# a bucket holding every 'Samsung ... 128GB' listing would otherwise make indexing quadratic
+MAX_BUCKET_CANDIDATES = 20
+
+# Universal hashing (a * x + b) mod p with a Mersenne prime; products stay below 2**63
+PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)
+HASH_A = _rng.integers(1, PRIME, size=NUM_PERM, dtype=np.int64)
+HASH_B = _rng.integers(0, PRIME, size=NUM_PERM, dtype=np.int64)
+
+# Words that make a different product of the same model (iPhone 15 vs iPhone 15 Pro)
+VARIANT_WORDS = frozenset(('pro', 'max', 'plus', 'mini', 'ultra', 'lite', 'air', 'neo', 'fe'))
+
+# Words that say nothing about which product it is
+STOPWORDS = frozenset((
+    'a', 'an', 'and', 'the', 'of', 'for', 'with', 'in', 'on', 'by', 'to', 'from', 'new', 'latest', 'original',
+    'combo', 'set', 'model', 'edition', 'version', 'free', 'best', 'buy', 'online', 'pack', 'size'
+))
+
+# Size / quantity units and the canonical unit and factor they convert to
+UNITS = {
+    'gb': ('gb', 1), 'tb': ('gb', 1024), 'mb': ('mb', 1),
+    'kg': ('g', 1000), 'kgs': ('g', 1000), 'g': ('g', 1), 'gm': ('g', 1), 'gms': ('g', 1), 'gram': ('g', 1),
+    'grams': ('g', 1), 'mg': ('mg', 1),
+    'l': ('ml', 1000), 'ltr': ('ml', 1000), 'litre': ('ml', 1000), 'liter': ('ml', 1000), 'ml': ('ml', 1),
+    'inch': ('in', 1), 'inches': ('in', 1), 'in': ('in', 1), 'cm': ('cm', 1), 'mm': ('mm', 1),
+    'w': ('w', 1), 'watt': ('w', 1), 'mah': ('mah', 1), 'hz': ('hz', 1),
+    'pc': ('pc', 1), 'pcs': ('pc', 1), 'piece': ('pc', 1), 'pieces': ('pc', 1)
+}
+QUANTITY_RE = re.compile(r'\b(\d+(?:\.\d+)?)\s*(' + '|'.join(sorted(UNITS, key=len, reverse=True)) + r')\b')
+PACK_RE = re.compile(r'\b(?:pack|set|combo|box) of (\d+)\b|\b(\d+)\s*x\b')
+# Network generations, not grams
+NETWORK_TOKENS = frozenset(('2g', '3g', '4g', '5g'))
+# Hyphens next to a digit are part of a model number (A-52, 55-inch), others separate words (Parle-G)
+JOINED_RE = re.compile(r'(?<=\d)-(?=\w)|(?<=\w)-(?=\d)')
+WORD_RE = re.compile(r'[a-z0-9]+(?:\.[0-9]+)?')
+
+
+def _number(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else f"{value:g}"
+
+
+class Title:
+    """Normalized title: tokens for similarity, plus the brand, models and quantities that must not conflict"""
+
+    __slots__ = ('tokens', 'brand', 'models', 'variants', 'quantities')
+
+    def __init__(self, tokens, brand, models, variants, quantities):
+        self.tokens = tokens
+        self.brand = brand
+        self.models = models
+        self.variants = variants
+        self.quantities = quantities
+
+
+def normalize_title(name, brand=''):
+    """Title of a product name: lowercase word tokens, model tokens (letters with digits, or bare
+    numbers), and quantities in canonical units ('1.5 L' -> '1500ml', '1TB' -> '1024gb')
+
+    brand defaults to the first word of the name, as the scrapers' brand fields usually are.
+    """
+    text = JOINED_RE.sub('', (name or '').lower())
+
+    quantities = defaultdict(set)
+
+    def quantity(match):
+        if match.group(0) in NETWORK_TOKENS:
+            return match.group(0)
+        canonical, factor = UNITS[match.group(2)]
+        quantities[canonical].add(_number(float(match.group(1)) * factor) + canonical)
+        return ' '
+
+    def pack(match):
+        quantities['pack'].add('pack' + (match.group(1) or match.group(2)))
+        return ' '
+
+    text = PACK_RE.sub(pack, QUANTITY_RE.sub(quantity, text))
+
+    words = []
+    models = []
+    for word in WORD_RE.findall(text):
+        if word in STOPWORDS or len(word) < 2 and not word.isdigit():
+            continue
+        if any(char.isdigit() for char in word):
+            models.append(word)
+        elif len(word) > 3 and word[-1] == 's' and word[-2] != 's':
+            # Headphones / headphone
+            word = word[:-1]
+        words.append(word)
+
+    brand = (brand or '').lower().strip() or (words[0] if words and not words[0][0].isdigit() else '')
+    tokens = frozenset(words).union(*quantities.values())
+    return Title(tokens, brand, frozenset(models), tokens & VARIANT_WORDS,
+                 {unit: frozenset(values) for unit, values in quantities.items()})
+
+
+def minhash(tokens):
+    """MinHash signature (NUM_PERM values) of a token set"""
+    hashes = np.fromiter((zlib.crc32(token.encode('utf-8')) for token in tokens), dtype=np.int64, count=len(tokens))
+    hashes %= PRIME
+    return ((np.outer(HASH_A, hashes) + HASH_B[:, None]) % PRIME).min(axis=1)
+
+
+def band_keys(signature):
+    """LSH bucket keys of a signature, one per band"""
+    data = signature.tobytes()
+    width = len(data) // BANDS
+    return [(band, data[band * width:(band + 1) * width]) for band in range(BANDS)]
+
+
+def is_match(a, b, threshold=MATCH_THRESHOLD, disjoint_threshold=DISJOINT_THRESHOLD):
+    """Whether two titles are the same product: similar enough, and without conflicts"""
+    shared = len(a.tokens & b.tokens)
+    if not shared:
+        return False
+    score = shared / (len(a.tokens) + len(b.tokens) - shared)
+    if score < threshold:
+        return False
+    if score < disjoint_threshold and shared < len(a.tokens) and shared < len(b.tokens):
+        return False
+    return not conflicts(a, b)
+
+
+def conflicts(a, b):
+    """Whether two similar titles still describe different products
+
+    Brands conflict when neither appears among the other's words (brand
+    fields are often just the first word of the name). Quantities conflict
+    when both give different values in the same unit (128GB vs 256GB),
+    variants when one is e.g. a Pro and the other isn't, and models when
+    both have model tokens and share none.
+    """
+    if a.brand and b.brand and a.brand != b.brand and a.brand not in b.tokens and b.brand not in a.tokens:
+        return True
+    if a.variants != b.variants:
+        return True
+    for unit, values in a.quantities.items():
+        if b.quantities.get(unit, values) != values:
+            return True
+    return bool(a.models and b.models and not a.models & b.models)
+
+
+class MatchedProduct:
+    __slots__ = ('key', 'name', 'brand', 'price', 'url', 'title', 'bands')
+
+    def __init__(self, key, name, brand, price, url, title, bands):
+        self.key = key
+        self.name = name
+        self.brand = brand
+        self.price = price
+        self.url = url
+        self.title = title
+        self.bands = bands
+
+    def to_dict(self):
+        site, product_id = self.key
+        return {'site': site, 'product_id': product_id, 'name': self.name, 'brand': self.brand,
+                'price': self.price, 'url': self.url}
+
+
+class ProductMatcher:
+    """Incremental LSH index of products from every site, clustering the ones that are the same item
+
+    Products are keyed on (site, product_id). Adding a product that is
+    already indexed updates its price and URL. When its title changed, its
+    links are recomputed.
+    """
+
+    def __init__(self, threshold=MATCH_THRESHOLD, disjoint_threshold=DISJOINT_THRESHOLD,
+                 max_bucket_candidates=MAX_BUCKET_CANDIDATES):
+        self.threshold = threshold
+        self.disjoint_threshold = disjoint_threshold
+        self.max_bucket_candidates = max_bucket_candidates
+        self._products = {}
+        # Bucket members as insertion-ordered dict keys: most recent last, O(1) removal
+        self._buckets = defaultdict(dict)
+        self._links = defaultdict(set)
+        self._parents = {}
+        self._lock = threading.Lock()
+        self._counters = {'added': 0, 'updated': 0, 'compared': 0, 'linked': 0}
+
+    def __len__(self):
+        return len(self._products)
+
+    # Union-find over linked products; every product is its own root until linked
+
+    def _find(self, key):
+        parents = self._parents
+        root = key
+        while parents.get(root, root) != root:
+            root = parents[root]
+        while key != root:
+            parents[key], key = root, parents.get(key, key)
+        return root
+
+    def _union(self, a, b):
+        root_a, root_b = self._find(a), self._find(b)
+        if root_a != root_b:
+            # The smaller key is the root, so a cluster's id doesn't depend on insertion order
+            if root_b < root_a:
+                root_a, root_b = root_b, root_a
+            self._parents[root_b] = root_a
+
+    def add(self, site, product_id, name, brand='', price=None, url=''):
+        """Index one product; returns the number of products it was linked to"""
+        key = (site, product_id)
+        title = normalize_title(name, brand)
+        with self._lock:
+            existing = self._products.get(key)
+            if existing is not None:
+                existing.price, existing.url = price, url
+                if existing.title.tokens == title.tokens and existing.title.brand == title.brand:
+                    self._counters['updated'] += 1
+                    return len(self._links.get(key, ()))
+                self._remove(key)
+            if not title.tokens:
+                return 0
+
+            bands = band_keys(minhash(title.tokens))
+            product = MatchedProduct(key, name, brand, price, url, title, bands)
+            candidates = set()
+            for band in bands:
+                members = self._buckets[band]
+                candidates.update(islice(reversed(members), self.max_bucket_candidates))
+                members[key] = None
+            self._products[key] = product
+            self._counters['added'] += 1
+
+            linked = 0
+            self._counters['compared'] += len(candidates)
+            tokens, size, threshold = title.tokens, len(title.tokens), self.threshold
+            for other_key in candidates:
+                other = self._products[other_key].title
+                # Most candidates fail the base threshold; check it inline before the full test
+                shared = len(tokens & other.tokens)
+                if shared < threshold * (size + len(other.tokens) - shared):
+                    continue
+                if is_match(title, other, threshold, self.disjoint_threshold):
+                    self._links[key].add(other_key)
+                    self._links[other_key].add(key)
+                    self._union(key, other_key)
+                    linked += 1
+            self._counters['linked'] += linked
+            return linked
+
+    def add_products(self, site, products):
+        """Index scraped products (records or dicts) of one site; those without a stable id are skipped"""
+        for product in products:
+            product_id = product_key(site, product)
+            if product_id is None or not product.get('name'):
+                continue
+            price = product.get('price_numeric')
+            self.add(site, product_id, product['name'], product.get('brand') or '',
+                     float(price) if isinstance(price, (int, float)) and price > 0 else None, product.get('url') or '')
+
+    def add_stored(self, rows):
+        """Index rows of ProductStore.iter_products(); returns how many were read"""
+        count = 0
+        for row in rows:
+            self.add(row['site'], row['product_id'], row['name'], row['brand'], row['price'], row['url'])
+            count += 1
+        return count
+
+    def _component(self, key):
+        """Keys connected to key by links, key included (lock held)"""
+        members = {key}
+        pending = [key]
+        while pending:
+            for other in self._links.get(pending.pop(), ()):
+                if other not in members:
+                    members.add(other)
+                    pending.append(other)
+        return members
+
+    def _remove(self, key):
+        """Drop a product, its bucket entries and links, and re-link its old cluster without it (lock held)"""
+        product = self._products.pop(key)
+        for band in product.bands:
+            members = self._buckets[band]
+            del members[key]
+            if not members:
+                del self._buckets[band]
+        component = self._component(key)
+        for other_key in self._links.pop(key, ()):
+            self._links[other_key].discard(key)
+            if not self._links[other_key]:
+                del self._links[other_key]
+        # Union-find can't split a cluster; only the removed product's cluster can change, so rebuild just it
+        for member in component:
+            self._parents.pop(member, None)
+        for member in component:
+            for other_key in self._links.get(member, ()):
+                self._union(member, other_key)
+
+    def _cluster(self, root, members):
+        products = sorted((self._products[key] for key in members), key=lambda product: product.key)
+        prices = [product.price for product in products if product.price is not None]
+        sites = sorted({product.key[0] for product in products})
+        cluster = {
+            'cluster_id': ':'.join(root),
+            'sites': sites,
+            'size': len(products),
+            'products': [product.to_dict() for product in products]
+        }
+        if prices:
+            cluster['price_range'] = {'min_price': min(prices), 'max_price': max(prices)}
+            cluster['cheapest'] = min((product for product in products if product.price is not None),
+                                      key=lambda product: product.price).to_dict()
+        return cluster
+
+    def clusters(self, min_sites=2, site=None, text=None, limit=100):
+        """Clusters of linked products, those spanning the most sites (then the largest) first
+
+        min_sites: clusters covering fewer sites are left out. site: only
+        clusters with a product from that site. text: only clusters with a
+        product whose name contains every word of it.
+        """
+        words = (text or '').lower().split()
+        with self._lock:
+            groups = defaultdict(list)
+            for key in self._links:
+                groups[self._find(key)].append(key)
+            selected = []
+            for root, members in groups.items():
+                sites = {key[0] for key in members}
+                if len(sites) < min_sites or (site and site not in sites):
+                    continue
+                if words and not any(all(word in self._products[key].name.lower() for word in words)
+                                     for key in members):
+                    continue
+                selected.append((root, members, len(sites)))
+            selected.sort(key=lambda group: (-group[2], -len(group[1]), group[0]))
+            return [self._cluster(root, members) for root, members, _ in selected[:limit]]
+
+    def cluster_of(self, site, product_id):
+        """Cluster containing a product (just the product itself when it matched nothing), or None"""
+        key = (site, product_id)
+        with self._lock:
+            if key not in self._products:
+                return None
+            # The cluster is the product's connected component of links
+            members = self._component(key)
+            return self._cluster(self._find(key), members)
+
+    def stats(self):
+        with self._lock:
+            roots = {self._find(key) for key in self._links}
+            return {
+                'products': len(self._products),
+                'linked_products': len(self._links),
+                'clusters': len(roots),
+                'buckets': len(self._buckets),
+                **self._counters
+            }
@@ -0,0 +1,151 @@
+"""Compact product records shared by the scrapers.
+
+A scraped product used to be a dict of 18-22 keys, most of them empty
+strings, and whole jobs keep thousands of them alive. product_record()
+builds a slotted class per site instead: one pointer per field and no
+per-product hash table. Values of fields that repeat across products
+(brands, badges, delivery dates) are interned, so each distinct string is
+stored once per process. Records read and write like the dicts they
+replace, so extraction and summary code is unchanged, and encode to the
+same JSON through json_default (json.dump) or dumps() (the API).
+"""
+import json
+import sys
+from operator import attrgetter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Value of an optional field that was never set; such fields are left out of the output
+UNSET = object()
+
+
+class ProductRecord:
+    """Base of the per-site record classes; use product_record() to create one"""
+
+    __slots__ = ()
+
+    # Set by product_record()
+    fields = ()
+    _defaults = ()
+    _copied = ()
+    _names = frozenset()
+    _optional = frozenset()
+    _shared = frozenset()
+    _values = None
+
+    def __init__(self):
+        for name, default in self._defaults:
+            setattr(self, name, default)
+        # Mutable defaults (lists) get a fresh copy per record
+        for name, default in self._copied:
+            setattr(self, name, default.copy())
+
+    def __getitem__(self, name):
+        if name in self._names:
+            value = getattr(self, name)
+            if value is not UNSET:
+                return value
+        raise KeyError(name)
+
+    def __setitem__(self, name, value):
+        if name not in self._names:
+            raise KeyError(f"{type(self).__name__} has no field {name!r}")
+        if name in self._shared and type(value) is str:
+            value = sys.intern(value)
+        setattr(self, name, value)
+
+    def __contains__(self, name):
+        return name in self._names and getattr(self, name) is not UNSET
+
+    def get(self, name, default=None):
+        if name in self._names:
+            value = getattr(self, name)
+            if value is not UNSET:
+                return value
+        return default
+
+    def update(self, values):
+        for name, value in values.items():
+            self[name] = value
+
+    def items(self):
+        return [(name, value) for name, value in zip(self.fields, self._values(self)) if value is not UNSET]
+
+    def keys(self):
+        return [name for name, _ in self.items()]
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.items())
+
+    def to_dict(self):
+        """Plain dict of the set fields, in declaration order"""
+        return {name: value for name, value in zip(self.fields, self._values(self)) if value is not UNSET}
+
+    def __eq__(self, other):
+        if isinstance(other, ProductRecord):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+def product_record(name, fields, optional=(), shared=()):
+    """Slotted record class named name
+
+    fields maps every always-present field to its default, in output order.
+    optional lists fields that are only output once set (e.g. Amazon's
+    emi_info); they come after the others. shared lists fields with few
+    distinct values, whose strings are interned when set.
+    """
+    names = tuple(fields) + tuple(optional)
+    # attrgetter of a single name returns the value itself, not a 1-tuple
+    values = attrgetter(*names) if len(names) > 1 else staticmethod(lambda record: (getattr(record, names[0]),))
+    defaults = {**fields, **{field: UNSET for field in optional}}
+    return type(name, (ProductRecord,), {
+        '__slots__': names,
+        'fields': names,
+        '_defaults': tuple((field, value) for field, value in defaults.items() if not isinstance(value, list)),
+        '_copied': tuple((field, value) for field, value in defaults.items() if isinstance(value, list)),
+        '_names': frozenset(names),
+        '_optional': frozenset(optional),
+        '_shared': frozenset(shared),
+        '_values': values
+    })
+
+
+def json_default(value):
+    """default= hook for json.dump / json.dumps that encodes product records as objects"""
+    if isinstance(value, ProductRecord):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value, sort_keys=False, indent=None, default=json_default):
+    """JSON text of scrape results for the API
+
+    Uses orjson when it is installed, which encodes records several times
+    faster than json, and json otherwise. Values orjson rejects (integers
+    over 64 bits, non-string keys) and indents other than 2 go through json.
+    default must handle product records, like json_default.
+    """
+    if orjson is not None and indent in (None, 2):
+        option = (orjson.OPT_SORT_KEYS if sort_keys else 0) | (orjson.OPT_INDENT_2 if indent else 0)
+        try:
+            return orjson.dumps(value, default=default, option=option).decode('utf-8')
+        except TypeError:
+            pass
+    return json.dumps(value, ensure_ascii=False, sort_keys=sort_keys, indent=indent, default=default)
@@ -0,0 +1,432 @@
+"""SQLite store of scraped products and their price history.
+
+Scrape results used to last only as long as the API response, or land in
+one JSON file per main() run. ProductStore upserts every product keyed on
+site + a stable id (see product_key), adds a price_history row only when
+a product's price differs from the last one stored, and remembers which
+search terms returned it. Questions like "what did this cost last week"
+are then one indexed query instead of a re-scrape. Each save() is a
+single transaction, so a page of products costs one commit.
+
+Product names, brands, categories and specifications are also indexed
+with FTS5 (products_fts, kept in sync by triggers), so search() answers
+free-text queries over everything scraped so far without going to the
+sites.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+import logging
+
+from product_record import dumps
+
+logger = logging.getLogger(__name__)
+
+# Database file; unset leaves the scrapers' main() without a store, 'off' also disables the backend's
+DB_PATH = os.environ.get('SCRAPER_PRODUCT_DB') or None
+DISABLED_VALUES = ('off', '0', 'false')
+
+# Sites whose products are stored (Wikipedia results are articles, not products)
+STORED_SITES = ('amazon', 'flipkart', 'snapdeal', 'jiomart')
+
+# Record field holding each site's product id; Flipkart's is the pid URL parameter
+ID_FIELDS = {'amazon': 'asin', 'snapdeal': 'product_id', 'jiomart': 'product_id'}
+
+# Record fields whose text goes into the category column of the search index (JioMart's category tree)
+CATEGORY_FIELDS = ('category', 'subcategory', 'l4category', 'vertical')
+
+# Search index column weights for bm25(): name, brand, category, specifications
+SEARCH_WEIGHTS = (10.0, 5.0, 2.0, 1.0)
+
+# products has an integer rowid (id) for the external-content search index
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    site TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    url TEXT NOT NULL,
+    brand TEXT NOT NULL,
+    category TEXT NOT NULL DEFAULT '',
+    specifications TEXT NOT NULL DEFAULT '',
+    price REAL,
+    original_price REAL,
+    rating REAL,
+    data TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    UNIQUE (site, product_id)
+);
+CREATE INDEX IF NOT EXISTS products_last_seen ON products (last_seen);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+    name, brand, category, specifications,
+    content='products', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+    INSERT INTO products_fts (rowid, name, brand, category, specifications)
+    VALUES (new.id, new.name, new.brand, new.category, new.specifications);
+END;
+CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, brand, category, specifications)
+    VALUES ('delete', old.id, old.name, old.brand, old.category, old.specifications);
+END;
+-- Re-indexing only when the text changed keeps repeat scrapes of the same products cheap
+CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, brand, category, specifications ON products
+WHEN old.name IS NOT new.name OR old.brand IS NOT new.brand
+    OR old.category IS NOT new.category OR old.specifications IS NOT new.specifications
+BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, brand, category, specifications)
+    VALUES ('delete', old.id, old.name, old.brand, old.category, old.specifications);
+    INSERT INTO products_fts (rowid, name, brand, category, specifications)
+    VALUES (new.id, new.name, new.brand, new.category, new.specifications);
+END;
+
+CREATE TABLE IF NOT EXISTS price_history (
+    site TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    observed_at REAL NOT NULL,
+    price REAL NOT NULL,
+    original_price REAL,
+    PRIMARY KEY (site, product_id, observed_at)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS search_products (
+    search_term TEXT NOT NULL,
+    site TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (search_term, site, product_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS search_products_last_seen ON search_products (search_term, last_seen);
+"""
+
+# A history row only when the price (or MRP) moved since the product was last stored
+INSERT_HISTORY = """
+INSERT OR REPLACE INTO price_history (site, product_id, observed_at, price, original_price)
+SELECT :site, :product_id, :seen_at, :price, :original_price
+WHERE :price IS NOT NULL AND NOT EXISTS (
+    SELECT 1 FROM products
+    WHERE site = :site AND product_id = :product_id AND price IS :price AND original_price IS :original_price
+)
+"""
+
+# A product seen without a price keeps its last known one
+UPSERT_PRODUCT = """
+INSERT INTO products (site, product_id, name, url, brand, category, specifications, price, original_price, rating,
+                      data, first_seen, last_seen)
+VALUES (:site, :product_id, :name, :url, :brand, :category, :specifications, :price, :original_price, :rating,
+        :data, :seen_at, :seen_at)
+ON CONFLICT (site, product_id) DO UPDATE SET
+    name = excluded.name,
+    url = excluded.url,
+    brand = excluded.brand,
+    category = excluded.category,
+    specifications = excluded.specifications,
+    rating = COALESCE(excluded.rating, products.rating),
+    price = COALESCE(excluded.price, products.price),
+    original_price = CASE WHEN excluded.price IS NULL THEN products.original_price ELSE excluded.original_price END,
+    data = excluded.data,
+    last_seen = excluded.last_seen
+"""
+
+UPSERT_SEARCH = """
+INSERT INTO search_products (search_term, site, product_id, first_seen, last_seen)
+VALUES (:search_term, :site, :product_id, :seen_at, :seen_at)
+ON CONFLICT (search_term, site, product_id) DO UPDATE SET last_seen = excluded.last_seen
+"""
+
+PRODUCT_COLUMNS = ('site', 'product_id', 'name', 'url', 'brand', 'category', 'specifications', 'price',
+                   'original_price', 'rating', 'data', 'first_seen', 'last_seen')
+
+def normalize_term(search_term):
+    """Search terms are stored trimmed, lowercased and with whitespace collapsed, like result cache keys"""
+    return ' '.join(str(search_term).split()).lower()
+
+
+def product_key(site, product):
+    """Stable id of a product on its site, or None when it has none
+
+    asin (Amazon) or product_id (Snapdeal, JioMart), Flipkart's pid URL
+    parameter, and otherwise the product URL's path.
+    """
+    field = ID_FIELDS.get(site)
+    if field:
+        value = product.get(field)
+        if value:
+            return str(value)
+    url = product.get('url')
+    if not url:
+        return None
+    parts = urlsplit(url)
+    if site == 'flipkart':
+        pid = parse_qs(parts.query).get('pid')
+        if pid:
+            return pid[0]
+    return parts.path if parts.path not in ('', '/') else None
+
+
+def stored_price(value):
+    """Numeric price as stored: None for the 0 the scrapers use when a card shows no price"""
+    if isinstance(value, (int, float)) and value > 0:
+        return float(value)
+    return None
+
+
+def stored_rating(value):
+    """Star rating as stored: the rating text ('4.3') as a number, None when there is none"""
+    try:
+        rating = float(value)
+    except (TypeError, ValueError):
+        return None
+    return rating if 0 < rating <= 5 else None
+
+
+def search_text(product, fields):
+    """Non-empty text values of fields (list fields flattened) joined with spaces, for the search index"""
+    parts = []
+    for field in fields:
+        value = product.get(field)
+        if isinstance(value, list):
+            parts.extend(str(item) for item in value if item)
+        elif value:
+            parts.append(str(value))
+    return ' '.join(parts)
+
+
+def match_expression(text):
+    """FTS5 query for free text: every word must match, the last one as a prefix; None without words
+
+    Words are quoted, so user input can't inject FTS5 operators or column filters.
+    """
+    words = re.findall(r'\w+', text.lower())
+    if not words:
+        return None
+    return ' '.join(f'"{word}"' for word in words) + '*'
+
+
+def parse_time(value):
+    """Unix seconds from a number or an ISO 8601 date / date-time string; ValueError otherwise"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = str(value).strip()
+    if re.fullmatch(r'\d+(\.\d+)?', value):
+        return float(value)
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+class ProductStore:
+    """Products and price history in one SQLite file, shared by every thread
+
+    Each thread gets its own connection; the database runs in WAL mode so
+    reads don't wait for a page being written. A connection must not be
+    used across a fork (gunicorn's preloaded master forking its workers),
+    so the forking thread closes its own first. Used as a context manager,
+    the store closes the calling thread's connection on exit.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+        _open_stores.add(self)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        """Close this thread's connection; the next call on the thread opens a new one"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            self._local.connection = None
+            connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def save(self, site, products, search_term=None, seen_at=None):
+        """Upsert products seen on site (for search_term) in one transaction; returns the number stored
+
+        Products without a stable id are skipped. A product listed twice in
+        one call is stored once, with its last listing.
+        """
+        seen_at = time.time() if seen_at is None else seen_at
+        rows = {}
+        for product in products:
+            product_id = product_key(site, product)
+            if product_id is None:
+                continue
+            rows[product_id] = {
+                'site': site,
+                'product_id': product_id,
+                'name': product.get('name') or '',
+                'url': product.get('url') or '',
+                'brand': product.get('brand') or '',
+                'category': search_text(product, CATEGORY_FIELDS),
+                'specifications': search_text(product, ('specifications',)),
+                'price': stored_price(product.get('price_numeric')),
+                'original_price': stored_price(product.get('original_price_numeric')),
+                'rating': stored_rating(product.get('rating')),
+                'data': dumps(product),
+                'seen_at': seen_at
+            }
+        if not rows:
+            return 0
+
+        rows = list(rows.values())
+        connection = self._connection()
+        with connection:
+            # History first: it compares against the price the upsert is about to replace
+            connection.executemany(INSERT_HISTORY, rows)
+            connection.executemany(UPSERT_PRODUCT, rows)
+            if search_term:
+                term = normalize_term(search_term)
+                connection.executemany(UPSERT_SEARCH, [{**row, 'search_term': term} for row in rows])
+        return len(rows)
+
+    @staticmethod
+    def _product(row):
+        product = dict(row)
+        product['data'] = json.loads(product['data'])
+        return product
+
+    def get_product(self, site, product_id):
+        """Stored product (columns plus its last scraped fields under 'data'), or None"""
+        row = self._connection().execute(
+            f'SELECT {", ".join(PRODUCT_COLUMNS)} FROM products WHERE site = ? AND product_id = ?', (site, product_id)
+        ).fetchone()
+        return self._product(row) if row is not None else None
+
+    def price_history(self, site, product_id, since=None, until=None):
+        """Price changes of a product, oldest first, optionally limited to [since, until]"""
+        rows = self._connection().execute(
+            'SELECT observed_at, price, original_price FROM price_history '
+            'WHERE site = ? AND product_id = ? AND observed_at >= ? AND observed_at <= ? ORDER BY observed_at',
+            (site, product_id, since if since is not None else float('-inf'),
+             until if until is not None else float('inf'))
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def price_at(self, site, product_id, at):
+        """The price in effect at time at (the last change at or before it), or None"""
+        row = self._connection().execute(
+            'SELECT observed_at, price, original_price FROM price_history '
+            'WHERE site = ? AND product_id = ? AND observed_at <= ? ORDER BY observed_at DESC LIMIT 1',
+            (site, product_id, at)
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def term_products(self, search_term, site=None, since=None, limit=100):
+        """Products returned for search_term (optionally on one site, seen since a time), most recent first"""
+        query = (
+            f'SELECT {", ".join("p." + column for column in PRODUCT_COLUMNS)}, s.last_seen AS term_last_seen '
+            'FROM search_products s JOIN products p ON p.site = s.site AND p.product_id = s.product_id '
+            'WHERE s.search_term = ? AND s.last_seen >= ?'
+        )
+        arguments = [normalize_term(search_term), since if since is not None else float('-inf')]
+        if site:
+            query += ' AND s.site = ?'
+            arguments.append(site)
+        query += ' ORDER BY s.last_seen DESC LIMIT ?'
+        arguments.append(limit)
+        return [self._product(row) for row in self._connection().execute(query, arguments)]
+
+    def search(self, text, site=None, min_price=None, max_price=None, min_rating=None, since=None, limit=50):
+        """Stored products matching free text, best match first (bm25 over name, brand, category, specifications)
+
+        Filters: site, price range, minimum rating and last seen since a
+        time. Each product carries its relevance (higher is better).
+        """
+        expression = match_expression(text)
+        if expression is None:
+            return []
+        weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS)
+        query = (
+            f'SELECT {", ".join("p." + column for column in PRODUCT_COLUMNS)}, '
+            f'-bm25(products_fts, {weights}) AS relevance '
+            'FROM products_fts JOIN products p ON p.id = products_fts.rowid WHERE products_fts MATCH ?'
+        )
+        arguments = [expression]
+        for condition, value in (('p.site = ?', site), ('p.price >= ?', min_price), ('p.price <= ?', max_price),
+                                 ('p.rating >= ?', min_rating), ('p.last_seen >= ?', since)):
+            if value is not None:
+                query += f' AND {condition}'
+                arguments.append(value)
+        query += ' ORDER BY relevance DESC LIMIT ?'
+        arguments.append(limit)
+        products = []
+        for row in self._connection().execute(query, arguments):
+            product = self._product(row)
+            product['relevance'] = round(product['relevance'], 3)
+            products.append(product)
+        return products
+
+    def iter_products(self, batch_size=1000):
+        """site, product_id, name, brand, price and url of every stored product, oldest first (rows)"""
+        cursor = self._connection().execute('SELECT site, product_id, name, brand, price, url FROM products ORDER BY id')
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+
+    def stats(self):
+        connection = self._connection()
+        counts = {}
+        for table in ('products', 'price_history', 'search_products'):
+            counts[table] = connection.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        return {'path': self.path, **counts}
+
+
+# Stores whose connections are closed before a fork, by one hook for the whole process
+_open_stores = weakref.WeakSet()
+
+
+def _close_before_fork():
+    for store in list(_open_stores):
+        store.close()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=_close_before_fork)
+
+
+def open_store(path=DB_PATH):
+    """ProductStore at path, or None when path is unset or 'off'"""
+    if not path or path.lower() in DISABLED_VALUES:
+        return None
+    return ProductStore(path)
+
+
+def save_search_result(site, result, path=DB_PATH):
+    """Store a scrape_*_products result when SCRAPER_PRODUCT_DB is set (used by the scrapers' main())"""
+    if not result.get('products'):
+        return 0
+    store = open_store(path)
+    if store is None:
+        return 0
+    with store:
+        try:
+            return store.save(site, result['products'], search_term=result.get('search_term'))
+        except sqlite3.Error as e:
+            logger.warning(f"Could not store {site} products in {path}: {e}")
+            return 0
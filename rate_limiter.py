@@ -0,0 +1,99 @@
+import asyncio
+import random
+import time
+
+# Multiplier range applied to every computed wait so requests don't land on a fixed cadence
+JITTER = (1.0, 1.5)
+
+
+class RateLimit:
+    """Requests-per-second bounds for an adaptive domain limiter.
+
+    initial_rate: rate a domain starts at
+    min_rate / max_rate: bounds the rate adapts between
+    increase: added to the rate after each successful response (additive increase)
+    decrease: factor the rate is multiplied by on 429/503 or a block page (multiplicative decrease)
+    burst: requests that may go out back to back after an idle period
+    """
+
+    def __init__(self, initial_rate=0.3, min_rate=0.05, max_rate=1.0, increase=0.05, decrease=0.5, burst=1):
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.burst = burst
+
+
+DEFAULT_RATE_LIMIT = RateLimit()
+
+
+class DomainRateLimiter:
+    """Token bucket whose refill rate follows AIMD feedback from the responses.
+
+    Only used from the fetch engine's event loop, so it needs no thread
+    locking; waiting requests get their slots in the order they asked. A
+    throttling response also pauses the whole domain (for Retry-After when
+    given), which every job fetching from that domain then waits out.
+    """
+
+    def __init__(self, limit=DEFAULT_RATE_LIMIT):
+        self.limit = limit
+        self.rate = limit.initial_rate
+        self.tokens = float(limit.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.successes = 0
+        self.throttles = 0
+        self.waited = 0.0
+        # Waiters queue here (asyncio.Lock wakes them in order), so requests go out in the order they asked
+        self._queue = asyncio.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.limit.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Wait for a request slot, first come first served; returns the seconds spent waiting"""
+        started = time.monotonic()
+        async with self._queue:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    waited = time.monotonic() - started
+                    self.waited += waited
+                    return waited
+                await asyncio.sleep((1 - self.tokens) / self.rate * random.uniform(*JITTER))
+
+    def refund(self):
+        """Give back a slot acquire() handed out for a request that was not sent"""
+        self.tokens = min(self.limit.burst, self.tokens + 1)
+
+    def on_success(self):
+        self.successes += 1
+        self.rate = min(self.limit.max_rate, self.rate + self.limit.increase)
+
+    def on_throttle(self, pause=None):
+        """Slow down after a 429/503 or block page; pause (seconds) holds the domain entirely"""
+        self.throttles += 1
+        self.rate = max(self.limit.min_rate, self.rate * self.limit.decrease)
+        # Drop any saved-up burst so the next request waits a full interval
+        self.tokens = min(self.tokens, 0.0)
+        if pause:
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+
+    def stats(self):
+        return {
+            'rate': round(self.rate, 3),
+            'min_rate': self.limit.min_rate,
+            'max_rate': self.limit.max_rate,
+            'successes': self.successes,
+            'throttles': self.throttles,
+            'paused_for': round(max(0.0, self.paused_until - time.monotonic()), 1),
+            'total_wait_seconds': round(self.waited, 1)
+        }
@@ -0,0 +1,343 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Entries kept in memory before the least recently used one is evicted
+DEFAULT_MAX_ENTRIES = int(os.environ.get('SCRAPER_CACHE_SIZE', '256'))
+
+# Total size of the bodies kept in memory, per process (each gunicorn worker has its own cache)
+DEFAULT_MAX_BYTES = int(os.environ.get('SCRAPER_CACHE_BYTES', str(32 * 1024 * 1024)))
+
+# SCRAPER_CACHE=off disables response caching for every scraper
+CACHE_ENABLED = os.environ.get('SCRAPER_CACHE', 'on').lower() not in ('off', '0', 'false')
+
+# Directory for the on-disk store; unset keeps the cache in memory only
+DEFAULT_CACHE_DIR = os.environ.get('SCRAPER_CACHE_DIR') or None
+
+# The on-disk store drops entries stored longer ago than this, then the oldest ones until its bodies fit in the size
+DEFAULT_DISK_MAX_AGE = int(os.environ.get('SCRAPER_CACHE_DIR_MAX_AGE', str(7 * 24 * 3600)))
+DEFAULT_DISK_MAX_BYTES = int(os.environ.get('SCRAPER_CACHE_DIR_BYTES', str(512 * 1024 * 1024)))
+
+# Disk writes between sweeps of the on-disk store
+SWEEP_INTERVAL = 200
+
+# Bodies and temp files younger than this are never swept: their metadata may still be on its way
+SWEEP_GRACE_SECONDS = 60
+
+# Only these response headers are kept, the rest are of no use to the scrapers
+STORED_HEADERS = ('content-type', 'etag', 'last-modified')
+
+
+def normalize_url(url):
+    """Cache key for a URL: lowercase scheme/host, sorted query, no fragment"""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', query, ''))
+
+
+class CacheEntry:
+    """A cached 200 response body with its validators"""
+
+    __slots__ = ('url', 'content', 'headers', 'stored_at', 'expires_at', 'digest')
+
+    def __init__(self, url, content, headers, stored_at, expires_at, digest=None):
+        self.url = url
+        self.content = content
+        self.headers = headers
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+        # sha256 of content, naming its body file on disk
+        self.digest = digest
+
+    def is_fresh(self, now=None):
+        return (now or time.time()) < self.expires_at
+
+    @property
+    def etag(self):
+        return self.headers.get('etag')
+
+    @property
+    def last_modified(self):
+        return self.headers.get('last-modified')
+
+    def validators(self):
+        """Conditional request headers for revalidating a stale entry"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """In-memory LRU of page responses, optionally backed by a directory on disk.
+
+    Entries are keyed on the normalized URL and expire after the TTL given
+    when they are stored. Expired entries are kept (within the LRU bounds) so
+    they can be revalidated with If-None-Match / If-Modified-Since when the
+    site sent an ETag or Last-Modified header. The memory LRU is bounded by
+    both max_entries and max_bytes of bodies; a body larger than max_bytes
+    is only kept on disk.
+
+    On disk, bodies are named by their sha256 and never change, and each
+    URL's metadata (validators, expiry and its body's digest) is a separate
+    file. Both are written to a temp file of their own and renamed into
+    place, so processes and threads storing the same URL can't pair one
+    response's body with another's validators, and a 304 rewrites only the
+    metadata. Every SWEEP_INTERVAL writes the directory is swept down to
+    disk_max_age and disk_max_bytes. The disk methods block; the fetch
+    engine calls them off its event loop.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                 disk_max_age=DEFAULT_DISK_MAX_AGE, disk_max_bytes=DEFAULT_DISK_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.disk_max_age = disk_max_age
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'revalidated': 0, 'stores': 0, 'evictions': 0, 'disk_hits': 0,
+                          'swept': 0}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _meta_path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _body_path(self, digest):
+        return os.path.join(self.cache_dir, digest + '.body')
+
+    def _read_disk(self, key):
+        try:
+            with open(self._meta_path(key), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('url') != key or not meta.get('body'):
+                return None
+            with open(self._body_path(meta['body']), 'rb') as f:
+                content = f.read()
+        except (OSError, ValueError):
+            return None
+        return CacheEntry(key, content, meta['headers'], meta['stored_at'], meta['expires_at'], meta['body'])
+
+    def _replace(self, path, data):
+        """Write data to path through a temp file of this writer's own, so no reader sees it half written"""
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def _write_meta(self, entry):
+        meta = {
+            'url': entry.url,
+            'headers': entry.headers,
+            'stored_at': entry.stored_at,
+            'expires_at': entry.expires_at,
+            'body': entry.digest
+        }
+        self._replace(self._meta_path(entry.url), json.dumps(meta).encode('utf-8'))
+
+    def _write_disk(self, entry, body=True):
+        """Write an entry's metadata, and its body first unless only the metadata changed"""
+        try:
+            if body:
+                entry.digest = hashlib.sha256(entry.content).hexdigest()
+                # Rewritten even when present, which renews its mtime against a concurrent sweep
+                self._replace(self._body_path(entry.digest), entry.content)
+            self._write_meta(entry)
+        except OSError as e:
+            logger.warning(f"Could not write cache entry for {entry.url}: {e}")
+            return
+        with self._lock:
+            self._writes += 1
+            sweep = self._writes % SWEEP_INTERVAL == 0
+        if sweep:
+            self.sweep()
+
+    def sweep(self, now=None):
+        """Drop disk entries older than disk_max_age, then the oldest until the bodies fit in disk_max_bytes
+
+        Bodies no entry refers to any more are deleted with them. Returns the
+        number of files removed. Safe to run from several processes at once.
+        """
+        if not self.cache_dir:
+            return 0
+        now = time.time() if now is None else now
+        metas = []
+        bodies = {}
+        leftovers = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if name.endswith('.json'):
+                    with open(path, 'r', encoding='utf-8') as f:
+                        meta = json.load(f)
+                    metas.append((meta.get('stored_at', 0), path, meta.get('body')))
+                elif name.endswith('.body'):
+                    stat = os.stat(path)
+                    bodies[name[:-len('.body')]] = (path, stat.st_size, stat.st_mtime)
+                elif name.startswith('.tmp-'):
+                    leftovers.append((path, os.stat(path).st_mtime))
+            except (OSError, ValueError):
+                continue
+
+        removed = []
+        kept = set()
+        kept_bytes = 0
+        # Newest first: keep entries while they are young enough and their bodies fit
+        for stored_at, path, digest in sorted(metas, key=lambda meta: meta[0], reverse=True):
+            body = bodies.get(digest)
+            size = body[1] if body is not None and digest not in kept else 0
+            if body is None or now - stored_at > self.disk_max_age or kept_bytes + size > self.disk_max_bytes:
+                removed.append(path)
+                continue
+            kept.add(digest)
+            kept_bytes += size
+        for digest, (path, _, mtime) in bodies.items():
+            if digest not in kept and now - mtime > SWEEP_GRACE_SECONDS:
+                removed.append(path)
+        removed.extend(path for path, mtime in leftovers if now - mtime > SWEEP_GRACE_SECONDS)
+
+        count = 0
+        for path in removed:
+            try:
+                os.remove(path)
+                count += 1
+            except OSError:
+                pass
+        with self._lock:
+            self._counters['swept'] += count
+        if count:
+            logger.info(f"Swept {count} files from the response cache in {self.cache_dir}")
+        return count
+
+    def _forget(self, key):
+        # Caller holds the lock
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry.content)
+
+    def _remember(self, entry):
+        with self._lock:
+            self._forget(entry.url)
+            if len(entry.content) > self.max_bytes:
+                return
+            self._entries[entry.url] = entry
+            self._bytes += len(entry.content)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._forget(next(iter(self._entries)))
+                self._counters['evictions'] += 1
+
+    def lookup(self, url):
+        """Cached entry for url (fresh or stale), or None"""
+        key = normalize_url(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        if self.cache_dir:
+            entry = self._read_disk(key)
+            if entry is not None:
+                self._count('disk_hits')
+                self._remember(entry)
+                return entry
+        return None
+
+    def get(self, url):
+        """Fresh cached entry for url, counting the hit or miss"""
+        fresh, _ = self.check(url)
+        return fresh
+
+    def check(self, url):
+        """(fresh entry, None) on a hit, (None, stale entry or None) on a miss; counts the hit or miss"""
+        entry = self.lookup(url)
+        if entry is not None and entry.is_fresh():
+            self._count('hits')
+            return entry, None
+        self._count('misses')
+        return None, entry
+
+    def store(self, url, content, headers, ttl):
+        """Cache a 200 response body for ttl seconds"""
+        now = time.time()
+        kept = {name: headers[name] for name in STORED_HEADERS if headers.get(name)}
+        entry = CacheEntry(normalize_url(url), content, kept, now, now + ttl)
+        self._remember(entry)
+        self._count('stores')
+        if self.cache_dir:
+            self._write_disk(entry)
+        return entry
+
+    def refresh(self, entry, ttl, headers=None):
+        """Extend a stale entry after the site answered 304 Not Modified"""
+        now = time.time()
+        if headers:
+            entry.headers.update({name: headers[name] for name in STORED_HEADERS if headers.get(name)})
+        entry.stored_at = now
+        entry.expires_at = now + ttl
+        self._remember(entry)
+        self._count('revalidated')
+        if self.cache_dir:
+            # The body is unchanged (and already on disk) unless the entry came from before the digests
+            self._write_disk(entry, body=entry.digest is None)
+        return entry
+
+    def discard(self, url):
+        """Drop a cached page, e.g. one that turned out to be a block or empty page"""
+        key = normalize_url(url)
+        with self._lock:
+            self._forget(key)
+        if self.cache_dir:
+            # The body may be shared with another URL's entry; the sweep deletes it once nothing refers to it
+            try:
+                os.remove(self._meta_path(key))
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.cache_dir:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(('.json', '.body')) or name.startswith('.tmp-'):
+                    try:
+                        os.remove(os.path.join(self.cache_dir, name))
+                    except OSError:
+                        pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['max_entries'] = self.max_entries
+        stats['max_bytes'] = self.max_bytes
+        stats['disk'] = self.cache_dir is not None
+        return stats
@@ -0,0 +1,381 @@
+"""Columnar search summaries shared by the scrapers.
+
+get_search_summary used to walk the product list once per statistic and
+could only report min/max/avg. ProductColumns reads each field out of the
+products once, keeps numeric fields as NumPy arrays, and every statistic
+(counts, min/max/mean/median, percentiles, histograms) is computed on
+those arrays. Lists shorter than NUMPY_MIN_PRODUCTS, the usual size of a
+job, get the same statistics from plain-Python loops over sorted lists
+instead. Each scraper's get_search_summary adds its own counts to
+product_summary().
+"""
+import re
+from bisect import bisect_left, bisect_right
+from operator import attrgetter
+
+import numpy as np
+
+from product_record import UNSET
+
+# Percentiles reported for prices, ratings and discounts; p50 is also the median
+PERCENTILES = (10, 25, 50, 75, 90)
+PERCENTILE_FRACTIONS = np.array(PERCENTILES) / 100
+PERCENTILE_FRACTIONS_LIST = PERCENTILE_FRACTIONS.tolist()
+PERCENTILE_KEYS = [f"p{p}" for p in PERCENTILES]
+
+# Below this many products the statistics are computed in plain Python: NumPy's fixed cost
+# (array creation, sorts, searchsorted; about 150 us a summary) is more than short lists take in loops
+NUMPY_MIN_PRODUCTS = 200
+
+# Log-spaced price bins: prices on one search span two or three orders of magnitude
+PRICE_HISTOGRAM_BINS = 10
+
+# Discount distribution buckets, in percent
+DISCOUNT_EDGES = tuple(range(0, 101, 10))
+
+# Star rating buckets
+RATING_EDGES = (0, 1, 2, 3, 4, 5)
+
+# 'lo-hi' distribution keys of the fixed edges above
+BUCKET_LABELS = {edges: [f"{lo}-{hi}" for lo, hi in zip(edges, edges[1:])] for edges in (DISCOUNT_EDGES, RATING_EDGES)}
+
+# First number in a text like '23% off' or 'Save 23%'
+NUMBER_RE = re.compile(r'(\d+(?:\.\d+)?)')
+
+
+def rounded(value, digits=2):
+    # np.round's rounding (scale, round half to even, unscale), a few times cheaper than round(value, digits)
+    scale = 10 ** digits
+    return round(float(value) * scale) / scale
+
+
+class ProductColumns:
+    """Fields of a product list, each read once and cached as a list or NumPy array"""
+
+    def __init__(self, products):
+        self.products = products
+        self.size = len(products)
+        self._lists = {}
+        self._arrays = {}
+        # Fields a record class leaves UNSET until assigned (Amazon's emi_info); only those need the UNSET check
+        self._optional = set().union(*(getattr(cls, '_optional', ()) for cls in set(map(type, products))))
+
+    def values(self, name, default=None):
+        """Field values in product order; default for products without the field"""
+        values = self._lists.get(name)
+        if values is None:
+            try:
+                # Records: attribute reads in C, no per-product method call
+                values = list(map(attrgetter(name), self.products))
+                if name in self._optional and UNSET in values:
+                    values = [default if value is UNSET else value for value in values]
+            except AttributeError:
+                values = [product.get(name, default) for product in self.products]
+            self._lists[name] = values
+        return values
+
+    def numbers(self, name):
+        """Numeric field as a float array (NaN where missing); numeric strings like ratings are parsed"""
+        array = self._arrays.get(name)
+        if array is None:
+            values = self.values(name, 0)
+            try:
+                array = np.fromiter(values, dtype=float, count=len(values))
+            except (TypeError, ValueError):
+                # Text such as ratings, with '' for products that have none
+                array = self._parsed(values, self._number)
+            self._arrays[name] = array
+        return array
+
+    def percentages(self, name):
+        """First number of each text field ('23% off' -> 23) as a float array, NaN where there is none"""
+        key = ('%', name)
+        array = self._arrays.get(key)
+        if array is None:
+            array = self._parsed(self.values(name, ''), self._percentage)
+            self._arrays[key] = array
+        return array
+
+    def floats(self, name):
+        """numbers() as a list of floats, for the plain-Python statistics"""
+        key = ('float', name)
+        floats = self._lists.get(key)
+        if floats is None:
+            values = self.values(name, 0)
+            try:
+                floats = list(map(float, values))
+            except (TypeError, ValueError):
+                floats = self._parsed_list(values, self._number)
+            self._lists[key] = floats
+        return floats
+
+    def percentage_floats(self, name):
+        """percentages() as a list of floats, for the plain-Python statistics"""
+        key = ('%', name)
+        floats = self._lists.get(key)
+        if floats is None:
+            floats = self._parsed_list(self.values(name, ''), self._percentage)
+            self._lists[key] = floats
+        return floats
+
+    @staticmethod
+    def _parsed_list(values, parse):
+        """parse applied to each distinct value once (ratings and discounts repeat a lot)"""
+        parsed = {value: parse(value) for value in set(values)}
+        return list(map(parsed.__getitem__, values))
+
+    @staticmethod
+    def _parsed(values, parse):
+        """_parsed_list as a float array"""
+        parsed = {value: parse(value) for value in set(values)}
+        return np.fromiter(map(parsed.__getitem__, values), dtype=float, count=len(values))
+
+    @staticmethod
+    def _number(value):
+        if not value:
+            return np.nan
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return np.nan
+
+    @staticmethod
+    def _percentage(value):
+        match = NUMBER_RE.search(value) if value else None
+        return float(match.group(1)) if match else np.nan
+
+    def count(self, name):
+        """Products whose field is truthy"""
+        return len(list(filter(None, self.values(name))))
+
+    def count_equal(self, name, value):
+        return self.values(name).count(value)
+
+    def distinct(self, name):
+        """Distinct truthy values, in first-seen order"""
+        return [value for value in dict.fromkeys(self.values(name)) if value]
+
+
+def numeric_stats(ordered, digits=2):
+    """count / min / max / mean / median / percentiles of a sorted 1-D array without NaNs
+
+    Percentiles interpolate linearly between the closest ranks, like
+    numpy.percentile's default, but read straight off the sorted array:
+    np.percentile and np.median would each sort a copy again.
+    """
+    if not ordered.size:
+        return {'count': 0}
+    positions = (ordered.size - 1) * PERCENTILE_FRACTIONS
+    below = positions.astype(int)
+    above = np.minimum(below + 1, ordered.size - 1)
+    points = ordered[below] + (ordered[above] - ordered[below]) * (positions - below)
+    points = np.round(points, digits).tolist()
+    return {
+        'count': int(ordered.size),
+        'min': rounded(ordered[0], digits),
+        'max': rounded(ordered[-1], digits),
+        'mean': rounded(ordered.sum() / ordered.size, digits),
+        'median': points[PERCENTILES.index(50)],
+        'percentiles': {f"p{p}": point for p, point in zip(PERCENTILES, points)}
+    }
+
+
+def bucket_counts(ordered, edges):
+    """Values per bucket [edges[i], edges[i + 1]) of a sorted array; the last bucket includes its upper edge"""
+    positions = np.searchsorted(ordered, edges)
+    positions[-1] = np.searchsorted(ordered, edges[-1], side='right')
+    return (positions[1:] - positions[:-1]).tolist()
+
+
+def distribution(ordered, edges):
+    """{'lo-hi': count} over fixed bucket edges"""
+    counts = bucket_counts(ordered, np.asarray(edges, dtype=float))
+    return {f"{lo}-{hi}": count for lo, hi, count in zip(edges, edges[1:], counts)}
+
+
+def price_histogram(ordered, bins=PRICE_HISTOGRAM_BINS):
+    """Counts over log-spaced bins between the lowest and highest price"""
+    low, high = ordered[0], ordered[-1]
+    if low == high:
+        return {'edges': [rounded(low), rounded(high)], 'counts': [int(ordered.size)]}
+    edges = low * (high / low) ** (np.arange(bins + 1) / bins)
+    edges[-1] = high
+    return {'edges': np.round(edges, 2).tolist(), 'counts': bucket_counts(ordered, edges)}
+
+
+def list_stats(ordered, digits=2):
+    """numeric_stats of a sorted list of floats without NaNs"""
+    if not ordered:
+        return {'count': 0}
+    last = len(ordered) - 1
+    points = []
+    for fraction in PERCENTILE_FRACTIONS_LIST:
+        position = last * fraction
+        below = int(position)
+        low = ordered[below]
+        high = ordered[below + 1] if below < last else low
+        points.append(rounded(low + (high - low) * (position - below), digits))
+    return {
+        'count': last + 1,
+        'min': rounded(ordered[0], digits),
+        'max': rounded(ordered[-1], digits),
+        'mean': rounded(sum(ordered) / (last + 1), digits),
+        'median': points[PERCENTILES.index(50)],
+        'percentiles': dict(zip(PERCENTILE_KEYS, points))
+    }
+
+
+def list_bucket_counts(ordered, edges):
+    """bucket_counts of a sorted list"""
+    positions = [bisect_left(ordered, edge) for edge in edges[:-1]]
+    positions.append(bisect_right(ordered, edges[-1]))
+    return [high - low for low, high in zip(positions, positions[1:])]
+
+
+def list_distribution(ordered, edges):
+    """distribution of a sorted list"""
+    labels = BUCKET_LABELS.get(edges) or [f"{lo}-{hi}" for lo, hi in zip(edges, edges[1:])]
+    return dict(zip(labels, list_bucket_counts(ordered, edges)))
+
+
+def list_price_histogram(ordered, bins=PRICE_HISTOGRAM_BINS):
+    """price_histogram of a sorted list"""
+    low, high = ordered[0], ordered[-1]
+    if low == high:
+        return {'edges': [rounded(low), rounded(high)], 'counts': [len(ordered)]}
+    ratio = high / low
+    edges = [low * ratio ** (step / bins) for step in range(bins)]
+    edges.append(high)
+    return {'edges': list(map(rounded, edges)), 'counts': list_bucket_counts(ordered, edges)}
+
+
+def price_summary(columns, integer_mean=True):
+    """Price fields of a summary: the price_range the API has always returned plus price_stats / price_histogram
+
+    integer_mean keeps avg_price as the floor of the mean, like the scrapers
+    with whole-rupee prices always reported it.
+    """
+    listed = columns.numbers('price_numeric')
+    priced = np.flatnonzero(listed > 0)
+    prices = listed[priced]
+    summary = {'products_with_price': int(prices.size), 'price_range': {}}
+    if not prices.size:
+        return summary
+
+    # min / max are the products' own values, so int prices stay ints
+    raw = columns.values('price_numeric')
+    summary['price_range'] = {
+        'min_price': raw[priced[prices.argmin()]],
+        'max_price': raw[priced[prices.argmax()]],
+        'avg_price': int(prices.sum()) // int(prices.size) if integer_mean else rounded(prices.sum() / prices.size)
+    }
+    ordered = np.sort(prices)
+    summary['price_stats'] = numeric_stats(ordered)
+    summary['price_histogram'] = price_histogram(ordered)
+
+    # Discount implied by the two price columns, for products listing an MRP above the price
+    originals = columns.numbers('original_price_numeric')
+    discounted = (originals > listed) & (listed > 0)
+    if discounted.any():
+        savings = (originals[discounted] - listed[discounted]) / originals[discounted] * 100
+        summary['savings_percent_stats'] = numeric_stats(np.sort(savings), digits=1)
+    return summary
+
+
+def list_price_summary(columns, integer_mean=True):
+    """price_summary in plain Python"""
+    listed = columns.floats('price_numeric')
+    priced = [index for index, price in enumerate(listed) if price > 0]
+    summary = {'products_with_price': len(priced), 'price_range': {}}
+    if not priced:
+        return summary
+
+    raw = columns.values('price_numeric')
+    prices = [listed[index] for index in priced]
+    summary['price_range'] = {
+        'min_price': raw[min(priced, key=listed.__getitem__)],
+        'max_price': raw[max(priced, key=listed.__getitem__)],
+        'avg_price': int(sum(prices)) // len(prices) if integer_mean else rounded(sum(prices) / len(prices))
+    }
+    ordered = sorted(prices)
+    summary['price_stats'] = list_stats(ordered)
+    summary['price_histogram'] = list_price_histogram(ordered)
+
+    savings = [
+        (original - price) / original * 100
+        for original, price in zip(columns.floats('original_price_numeric'), listed)
+        if original > price > 0
+    ]
+    if savings:
+        summary['savings_percent_stats'] = list_stats(sorted(savings), digits=1)
+    return summary
+
+
+def rating_summary(columns):
+    """avg_rating plus rating_stats / rating_distribution; ratings are parsed from their text"""
+    ratings = columns.numbers('rating')
+    # NaNs (unparsed ratings) sort to the end
+    ratings = np.sort(ratings)[:np.count_nonzero(~np.isnan(ratings))]
+    if not ratings.size:
+        return {'avg_rating': 0}
+    return {
+        'avg_rating': rounded(ratings.sum() / ratings.size),
+        'rating_stats': numeric_stats(ratings),
+        'rating_distribution': distribution(ratings, RATING_EDGES)
+    }
+
+
+def discount_summary(columns, name='discount_percentage'):
+    """avg_discount plus discount_stats / discount_distribution from the discount text"""
+    discounts = columns.percentages(name)
+    discounts = np.sort(discounts)[:np.count_nonzero(~np.isnan(discounts))]
+    if not discounts.size:
+        return {'avg_discount': 0}
+    return {
+        'avg_discount': rounded(discounts.sum() / discounts.size, 1),
+        'discount_stats': numeric_stats(discounts, digits=1),
+        'discount_distribution': distribution(discounts, DISCOUNT_EDGES)
+    }
+
+
+def list_rating_summary(columns):
+    """rating_summary in plain Python"""
+    # NaN (an unparsed rating) is the only value not equal to itself
+    ratings = sorted(rating for rating in columns.floats('rating') if rating == rating)
+    if not ratings:
+        return {'avg_rating': 0}
+    return {
+        'avg_rating': rounded(sum(ratings) / len(ratings)),
+        'rating_stats': list_stats(ratings),
+        'rating_distribution': list_distribution(ratings, RATING_EDGES)
+    }
+
+
+def list_discount_summary(columns, name='discount_percentage'):
+    """discount_summary in plain Python"""
+    discounts = sorted(discount for discount in columns.percentage_floats(name) if discount == discount)
+    if not discounts:
+        return {'avg_discount': 0}
+    return {
+        'avg_discount': rounded(sum(discounts) / len(discounts), 1),
+        'discount_stats': list_stats(discounts, digits=1),
+        'discount_distribution': list_distribution(discounts, DISCOUNT_EDGES)
+    }
+
+
+def product_summary(products, ratings=True, discounts=True, integer_mean=True):
+    """Summary fields every site shares; returns (summary, columns) so scrapers can add their own counts"""
+    columns = ProductColumns(products)
+    summary = {'total_products': columns.size}
+    if columns.size < NUMPY_MIN_PRODUCTS:
+        prices, rating_fields, discount_fields = list_price_summary, list_rating_summary, list_discount_summary
+    else:
+        prices, rating_fields, discount_fields = price_summary, rating_summary, discount_summary
+    summary.update(prices(columns, integer_mean=integer_mean))
+    if ratings:
+        summary['products_with_rating'] = columns.count('rating')
+        summary.update(rating_fields(columns))
+    if discounts:
+        summary['products_with_discounts'] = columns.count('discount_percentage')
+        summary.update(discount_fields(columns))
+    return summary, columns
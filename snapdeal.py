@@ -1,5 +1,3 @@
-import requests
-from bs4 import BeautifulSoup
 import json
 import re
 import time
@@ -7,14 +5,205 @@ import random
 from urllib.parse import quote_plus
 import logging
 
+from fetch_engine import FetchPolicy, get_engine
+from rate_limiter import RateLimit
+from extraction_schema import Field, Schema, selector_chain
+from html_parsing import PartialParse, outermost
+from product_record import json_default, product_record
+import product_store
+from search_summary import product_summary
+from page_fetcher import ResultsPageScraper, stream_products, collect_events
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class SnapdealScraper:
-    def __init__(self):
+# Label for this scraper's selector stats and metrics
+SITE = 'snapdeal'
+
+# Request pacing and retry behaviour for snapdeal.com
+FETCH_POLICY = FetchPolicy(
+    site=SITE,
+    rate_limit=RateLimit(initial_rate=0.3, min_rate=0.05, max_rate=1.0),
+    timeout=15,
+    status_backoff={429: (10, 20)},
+    error_backoff=(5, 10),
+    cache_ttl=900
+)
+
+# Patterns used by extract_product_data, compiled once per process
+NON_DIGIT_RE = re.compile(r'[^\d]')
+WIDTH_RE = re.compile(r'width:\s*([^;]+)')
+BACKGROUND_RE = re.compile(r'background:\s*([^;]+)')
+RATING_COUNT_RE = re.compile(r'\((\d+)\)')
+ORDERS_RE = re.compile(r'(\d+)\s*orders?\s*in\s*last\s*(\d+)\s*days?', re.IGNORECASE)
+BRAND_PATTERNS = [
+    re.compile(r'^([A-Za-z\s]+?)[\s\-]+'),  # Brand before dash or space
+    re.compile(r'^([A-Za-z]+)'),            # First word
+]
+
+
+def product_name(element):
+    # The title attribute sometimes holds the untruncated name
+    name = element.get_text(strip=True)
+    title_attr = element.get('title')
+    if title_attr and len(title_attr) > len(name):
+        return title_attr
+    return name
+
+
+def absolute_url(href):
+    if href.startswith('https://'):
+        return href
+    if href.startswith('/'):
+        return 'https://www.snapdeal.com' + href
+    return 'https://www.snapdeal.com/' + href
+
+
+def price_sources_of(element):
+    return element.get_text(strip=True), element.get('data-price')
+
+
+def parse_discount(text):
+    return text if '%' in text and 'off' in text.lower() else ''
+
+
+def parse_rating_count(text):
+    # Number in parentheses like "(765)", or a bare number
+    match = RATING_COUNT_RE.search(text)
+    if match:
+        return match.group(1)
+    return text if text.isdigit() else ''
+
+
+def size_option(element):
+    return element.get('class', []), element.get_text(strip=True)
+
+
+# Selector fallbacks per field; compiled once at import
+PRODUCT_SCHEMA = Schema(
+    SITE,
+    name=Field([
+        '.product-title',
+        'p[title]',
+        '.product-desc-rating a p',
+        'p.product-title'
+    ], value=product_name),
+    url=Field([
+        '.dp-widget-link[href]',
+        'a[href*="/product/"]',
+        '.product-desc-rating a[href]'
+    ], attr='href', parse=absolute_url),
+    price=Field([
+        '.product-price',
+        'span[id*="display-price"]',
+        '.lfloat.product-price'
+    ], value=price_sources_of),
+    original_price=Field([
+        '.product-desc-price.strike',
+        '.strike',
+        '.lfloat.product-desc-price.strike',
+        'span.strike'
+    ]),
+    discount_percentage=Field([
+        '.product-discount span',
+        '.product-discount',
+        'div.product-discount span'
+    ], parse=parse_discount),
+    rating_style=Field('.filled-stars', value=lambda element: element.get('style', '')),
+    total_ratings=Field([
+        '.product-rating-count',
+        'p.product-rating-count',
+        '.rating p'
+    ], parse=parse_rating_count),
+    image_url=Field([
+        '.product-image[src]',
+        'img.product-image[src]',
+        'picture img[src]',
+        '.product-tuple-image img[src]'
+    ], attr='src', parse=lambda src: src if src.startswith('http') else ''),
+    color_styles=Field('.color-attr', value=lambda element: element.get('style', ''), many=True),
+    size_options=Field('.sub-attr-value', value=size_option, many=True),
+    nudge_texts=Field('.nudge-below-text, .nudge-with-background', many=True)
+)
+
+
+def card_key(element):
+    """pogid on the card element itself, known before extraction"""
+    pogid = element.get('pogid') or element.get('id') or ''
+    return pogid if pogid.isdigit() else None
+
+# Product card selectors, tried in order of which ones the site currently matches
+PRODUCT_CONTAINERS = selector_chain(SITE, 'containers', [
+    '.product-tuple-listing',
+    '.js-tuple',
+    '.favDp.product-tuple-listing'
+])
+
+# "See more products" button under the grid; hidden once every result is loaded
+SEE_MORE = '#see-more-products'
+HIDDEN_STYLE_RE = re.compile(r'display:\s*none')
+
+# Patterns used by extract_hidden_data: one 'kN': 'value' pair of a product entry, and the brand at the start of a name
+HIDDEN_FIELD_RE = re.compile(r"'(k[1-8])':\s*'([^']+)'")
+HIDDEN_BRAND_RE = re.compile(r'^([A-Za-z\s]+?)[\s\-]')
+
+# Elements a results page is reduced to when parsing with bs4: product cards, the hidden product data input and See more
+PAGE_NODES = PartialParse([
+    '.product-tuple-listing',
+    '.js-tuple',
+    'input.dp-info-collect',
+    '[id="see-more-products"]'
+])
+
+# Fields of one product card, with their defaults; shared fields repeat across products
+SnapdealProduct = product_record('SnapdealProduct', {
+    'name': '',
+    'url': '',
+    'price': '',
+    'original_price': '',
+    'discount_percentage': '',
+    'savings_amount': 0,
+    'rating': '',
+    'total_ratings': '',
+    'image_url': '',
+    'brand': '',
+    'price_numeric': 0,
+    'original_price_numeric': 0,
+    'product_id': '',
+    'colors_available': [],
+    'sizes_available': [],
+    'orders_last_week': '',
+    'availability_info': ''
+}, shared=(
+    'discount_percentage', 'rating', 'brand', 'orders_last_week', 'availability_info'
+))
+
+# Fields of one product in the hidden dp-info-collect input
+SnapdealHiddenProduct = product_record('SnapdealHiddenProduct', {
+    'name': '',
+    'url': '',
+    'price': '',
+    'original_price': '',
+    'discount_percentage': '',
+    'rating': '',
+    'image_url': '',
+    'product_id': '',
+    'price_numeric': 0,
+    'original_price_numeric': 0
+}, optional=('savings_amount', 'brand'), shared=('discount_percentage', 'rating', 'brand'))
+
+class SnapdealScraper(ResultsPageScraper):
+    site = SITE
+    page_nodes = PAGE_NODES
+    card_key = staticmethod(card_key)
+    
+    def __init__(self, parser=None):
         self.base_url = "https://www.snapdeal.com/search?keyword={search_term}"
-        self.session = requests.Session()
+        self.engine = get_engine()
+        
+        # HTML parser backend (see html_parsing), None uses SCRAPER_PARSER / fastest installed
+        self.parser = parser
         
         # Realistic user agents for rotation
         self.user_agents = [
@@ -42,33 +231,16 @@ class SnapdealScraper:
     def get_random_user_agent(self):
         return random.choice(self.user_agents)
     
-    def make_request(self, url, max_retries=3):
-        """Make HTTP request with retry logic and random delays"""
-        for attempt in range(max_retries):
-            try:
-                # Update headers with random user agent
-                headers = self.headers.copy()
-                headers['User-Agent'] = self.get_random_user_agent()
-                
-                # Random delay between requests
-                time.sleep(random.uniform(2, 5))
-                
-                response = self.session.get(url, headers=headers, timeout=15)
-                
-                if response.status_code == 200:
-                    return response
-                elif response.status_code == 429:
-                    # Rate limited
-                    logger.warning(f"Rate limited, waiting before retry {attempt + 1}")
-                    time.sleep(random.uniform(10, 20))
-                else:
-                    logger.warning(f"Status code {response.status_code}, attempt {attempt + 1}")
-                    
-            except requests.RequestException as e:
-                logger.error(f"Request failed: {e}, attempt {attempt + 1}")
-                time.sleep(random.uniform(5, 10))
+    def make_request(self, url, max_retries=3, cancelled=None):
+        """Make HTTP request through the shared fetch engine (retries, backoff and pacing per FETCH_POLICY)"""
+        def build_headers(attempt):
+            # Update headers with random user agent
+            headers = self.headers.copy()
+            headers['User-Agent'] = self.get_random_user_agent()
+            return headers
         
-        return None
+        return self.engine.fetch(url, headers=build_headers, policy=FETCH_POLICY, max_retries=max_retries,
+                                 cancelled=cancelled)
     
     def extract_rating_from_width(self, width_percentage):
         """Convert width percentage to rating out of 5"""
@@ -83,25 +255,7 @@ class SnapdealScraper:
     
     def extract_product_data(self, product_element):
         """Extract data from a single Snapdeal product element from visible HTML only"""
-        product_data = {
-            'name': '',
-            'url': '',
-            'price': '',
-            'original_price': '',
-            'discount_percentage': '',
-            'savings_amount': 0,
-            'rating': '',
-            'total_ratings': '',
-            'image_url': '',
-            'brand': '',
-            'price_numeric': 0,
-            'original_price_numeric': 0,
-            'product_id': '',
-            'colors_available': [],
-            'sizes_available': [],
-            'orders_last_week': '',
-            'availability_info': ''
-        }
+        product_data = SnapdealProduct()
         
         try:
             # Extract product ID from element attributes
@@ -114,157 +268,57 @@ class SnapdealScraper:
             if pogid:
                 product_data['product_id'] = pogid
             
-            # Extract product name
-            name_selectors = [
-                '.product-title',
-                'p[title]',
-                '.product-desc-rating a p',
-                'p.product-title'
-            ]
-            
-            for selector in name_selectors:
-                name_element = product_element.select_one(selector)
-                if name_element:
-                    product_data['name'] = name_element.get_text(strip=True)
-                    # Also check title attribute for full name
-                    title_attr = name_element.get('title')
-                    if title_attr and len(title_attr) > len(product_data['name']):
-                        product_data['name'] = title_attr
-                    break
-            
-            # Extract URL
-            url_selectors = [
-                '.dp-widget-link[href]',
-                'a[href*="/product/"]',
-                '.product-desc-rating a[href]'
-            ]
+            # Selector-driven fields, post-processed below
+            values = PRODUCT_SCHEMA.extract(product_element)
             
-            for selector in url_selectors:
-                url_element = product_element.select_one(selector)
-                if url_element and url_element.get('href'):
-                    href = url_element['href']
-                    if href.startswith('https://'):
-                        product_data['url'] = href
-                    elif href.startswith('/'):
-                        product_data['url'] = 'https://www.snapdeal.com' + href
-                    else:
-                        product_data['url'] = 'https://www.snapdeal.com/' + href
-                    break
+            product_data['name'] = values.get('name', '')
+            product_data['url'] = values.get('url', '')
+            product_data['image_url'] = values.get('image_url', '')
+            product_data['discount_percentage'] = values.get('discount_percentage', '')
+            product_data['total_ratings'] = values.get('total_ratings', '')
             
-            # Extract current price
-            price_selectors = [
-                '.product-price',
-                'span[id*="display-price"]',
-                '.lfloat.product-price',
-                '#display-price-' + str(product_data.get('product_id', ''))
-            ]
-            
-            for selector in price_selectors:
-                price_element = product_element.select_one(selector)
+            # Extract current price, falling back to the element keyed on the product ID
+            price_sources = values.get('price')
+            if price_sources is None:
+                price_element = product_element.select_one('#display-price-' + str(product_data.get('product_id', '')))
                 if price_element:
-                    price_text = price_element.get_text(strip=True)
-                    product_data['price'] = price_text
-                    
-                    # Extract numeric value from text
-                    price_numeric = re.sub(r'[^\d]', '', price_text)
-                    if price_numeric:
-                        product_data['price_numeric'] = int(price_numeric)
-                    
-                    # Also check data-price attribute
-                    data_price = price_element.get('data-price')
-                    if data_price:
-                        product_data['price_numeric'] = int(data_price)
-                    break
-            
-            # Extract original price
-            original_price_selectors = [
-                '.product-desc-price.strike',
-                '.strike',
-                '.lfloat.product-desc-price.strike',
-                'span.strike'
-            ]
+                    price_sources = price_sources_of(price_element)
             
-            for selector in original_price_selectors:
-                original_price_element = product_element.select_one(selector)
-                if original_price_element:
-                    original_price_text = original_price_element.get_text(strip=True)
-                    product_data['original_price'] = original_price_text
-                    # Extract numeric value
-                    price_numeric = re.sub(r'[^\d]', '', original_price_text)
-                    if price_numeric:
-                        product_data['original_price_numeric'] = int(price_numeric)
-                    break
-            
-            # Extract discount percentage
-            discount_selectors = [
-                '.product-discount span',
-                '.product-discount',
-                'div.product-discount span'
-            ]
+            if price_sources is not None:
+                price_text, data_price = price_sources
+                product_data['price'] = price_text
+                
+                # Extract numeric value from text
+                price_numeric = NON_DIGIT_RE.sub('', price_text)
+                if price_numeric:
+                    product_data['price_numeric'] = int(price_numeric)
+                
+                # Also check data-price attribute
+                if data_price:
+                    product_data['price_numeric'] = int(data_price)
             
-            for selector in discount_selectors:
-                discount_element = product_element.select_one(selector)
-                if discount_element:
-                    discount_text = discount_element.get_text(strip=True)
-                    if '%' in discount_text and 'off' in discount_text.lower():
-                        product_data['discount_percentage'] = discount_text
-                    break
+            # Extract original price
+            original_price_text = values.get('original_price')
+            if original_price_text is not None:
+                product_data['original_price'] = original_price_text
+                # Extract numeric value
+                price_numeric = NON_DIGIT_RE.sub('', original_price_text)
+                if price_numeric:
+                    product_data['original_price_numeric'] = int(price_numeric)
             
             # Extract rating from filled-stars width percentage
-            rating_element = product_element.select_one('.filled-stars')
-            if rating_element:
-                style = rating_element.get('style', '')
-                width_match = re.search(r'width:\s*([^;]+)', style)
+            style = values.get('rating_style')
+            if style is not None:
+                width_match = WIDTH_RE.search(style)
                 if width_match:
                     width = width_match.group(1).strip()
                     product_data['rating'] = self.extract_rating_from_width(width)
             
-            # Extract number of ratings from visible elements
-            rating_count_selectors = [
-                '.product-rating-count',
-                'p.product-rating-count',
-                '.rating p'
-            ]
-            
-            for selector in rating_count_selectors:
-                rating_count_element = product_element.select_one(selector)
-                if rating_count_element:
-                    rating_text = rating_count_element.get_text(strip=True)
-                    # Extract number from parentheses like "(765)"
-                    rating_match = re.search(r'\((\d+)\)', rating_text)
-                    if rating_match:
-                        product_data['total_ratings'] = rating_match.group(1)
-                    # Also try direct number extraction
-                    elif rating_text.isdigit():
-                        product_data['total_ratings'] = rating_text
-                    break
-            
-            # Extract image URL
-            image_selectors = [
-                '.product-image[src]',
-                'img.product-image[src]',
-                'picture img[src]',
-                '.product-tuple-image img[src]'
-            ]
-            
-            for selector in image_selectors:
-                image_element = product_element.select_one(selector)
-                if image_element and image_element.get('src'):
-                    src = image_element['src']
-                    if src.startswith('http'):
-                        product_data['image_url'] = src
-                    break
-            
             # Extract brand from product name
             if product_data['name']:
                 # Try to extract brand (usually the first word or two before a dash/hyphen)
-                brand_patterns = [
-                    r'^([A-Za-z\s]+?)[\s\-]+',  # Brand before dash or space
-                    r'^([A-Za-z]+)',            # First word
-                ]
-                
-                for pattern in brand_patterns:
-                    brand_match = re.match(pattern, product_data['name'])
+                for pattern in BRAND_PATTERNS:
+                    brand_match = pattern.match(product_data['name'])
                     if brand_match:
                         brand = brand_match.group(1).strip()
                         if len(brand) > 1:  # Avoid single character brands
@@ -272,11 +326,9 @@ class SnapdealScraper:
                             break
             
             # Extract available colors from color attributes
-            color_elements = product_element.select('.color-attr')
             colors = []
-            for color_elem in color_elements:
-                style = color_elem.get('style', '')
-                bg_match = re.search(r'background:\s*([^;]+)', style)
+            for style in values.get('color_styles', []):
+                bg_match = BACKGROUND_RE.search(style)
                 if bg_match:
                     color_value = bg_match.group(1).strip()
                     if color_value and color_value not in ['', 'none']:
@@ -284,20 +336,16 @@ class SnapdealScraper:
             product_data['colors_available'] = colors
             
             # Extract available sizes
-            size_elements = product_element.select('.sub-attr-value')
             sizes = []
-            for size_elem in size_elements:
-                if 'hidden' not in size_elem.get('class', []):  # Skip hidden elements
-                    size_text = size_elem.get_text(strip=True)
+            for classes, size_text in values.get('size_options', []):
+                if 'hidden' not in classes:  # Skip hidden elements
                     if size_text and size_text.isdigit():
                         sizes.append(size_text)
             product_data['sizes_available'] = list(set(sizes))  # Remove duplicates
             
             # Extract orders in last period information
-            nudge_elements = product_element.select('.nudge-below-text, .nudge-with-background')
-            for nudge_elem in nudge_elements:
-                nudge_text = nudge_elem.get_text(strip=True)
-                orders_match = re.search(r'(\d+)\s*orders?\s*in\s*last\s*(\d+)\s*days?', nudge_text, re.IGNORECASE)
+            for nudge_text in values.get('nudge_texts', []):
+                orders_match = ORDERS_RE.search(nudge_text)
                 if orders_match:
                     product_data['orders_last_week'] = f"{orders_match.group(1)} orders in last {orders_match.group(2)} days"
                     break
@@ -328,68 +376,44 @@ class SnapdealScraper:
                     
                     for product_raw in products_raw:
                         try:
-                            product_data = {
-                                'name': '',
-                                'url': '',
-                                'price': '',
-                                'original_price': '',
-                                'discount_percentage': '',
-                                'rating': '',
-                                'image_url': '',
-                                'product_id': '',
-                                'price_numeric': 0,
-                                'original_price_numeric': 0
-                            }
-                            
-                            # Extract k1 (image)
-                            k1_match = re.search(r"'k1':\s*'([^']+)'", product_raw)
-                            if k1_match:
-                                product_data['image_url'] = k1_match.group(1)
-                            
-                            # Extract k2 (partial URL)
-                            k2_match = re.search(r"'k2':\s*'([^']+)'", product_raw)
-                            if k2_match:
-                                product_data['url'] = 'https://www.snapdeal.com/' + k2_match.group(1)
-                            
-                            # Extract k3 (product ID)
-                            k3_match = re.search(r"'k3':\s*'([^']+)'", product_raw)
-                            if k3_match:
-                                product_data['product_id'] = k3_match.group(1)
-                            
-                            # Extract k4 (name)
-                            k4_match = re.search(r"'k4':\s*'([^']+)'", product_raw)
-                            if k4_match:
-                                product_data['name'] = k4_match.group(1)
-                            
-                            # Extract k5 (discount percentage)
-                            k5_match = re.search(r"'k5':\s*'([^']+)'", product_raw)
-                            if k5_match:
-                                product_data['discount_percentage'] = k5_match.group(1) + '% Off'
-                            
-                            # Extract k6 (original price)
-                            k6_match = re.search(r"'k6':\s*'([^']+)'", product_raw)
-                            if k6_match:
-                                product_data['original_price'] = 'Rs. ' + k6_match.group(1)
-                                product_data['original_price_numeric'] = int(k6_match.group(1))
-                            
-                            # Extract k7 (current price)
-                            k7_match = re.search(r"'k7':\s*'([^']+)'", product_raw)
-                            if k7_match:
-                                product_data['price'] = 'Rs. ' + k7_match.group(1)
-                                product_data['price_numeric'] = int(k7_match.group(1))
-                            
-                            # Extract k8 (rating)
-                            k8_match = re.search(r"'k8':\s*'([^']+)'", product_raw)
-                            if k8_match:
-                                product_data['rating'] = k8_match.group(1)
+                            # k1 image, k2 partial URL, k3 product ID, k4 name, k5 discount
+                            # percentage, k6 original price, k7 current price, k8 rating; the
+                            # first value of a repeated key wins
+                            values = {}
+                            for key, text in HIDDEN_FIELD_RE.findall(product_raw):
+                                values.setdefault(key, text)
+
+                            product_data = SnapdealHiddenProduct()
+                            if 'k1' in values:
+                                product_data['image_url'] = values['k1']
+                            if 'k2' in values:
+                                product_data['url'] = 'https://www.snapdeal.com/' + values['k2']
+                            if 'k3' in values:
+                                product_data['product_id'] = values['k3']
+                            name = values.get('k4', '')
+                            if name:
+                                product_data['name'] = name
+                            if 'k5' in values:
+                                product_data['discount_percentage'] = values['k5'] + '% Off'
+                            original_price = price = 0
+                            if 'k6' in values:
+                                original_price = int(values['k6'])
+                                product_data['original_price'] = 'Rs. ' + values['k6']
+                                product_data['original_price_numeric'] = original_price
+                            if 'k7' in values:
+                                price = int(values['k7'])
+                                product_data['price'] = 'Rs. ' + values['k7']
+                                product_data['price_numeric'] = price
+                            if 'k8' in values:
+                                product_data['rating'] = values['k8']
                             
                             # Calculate savings
-                            if product_data['price_numeric'] and product_data['original_price_numeric']:
-                                product_data['savings_amount'] = product_data['original_price_numeric'] - product_data['price_numeric']
+                            if price and original_price:
+                                product_data['savings_amount'] = original_price - price
                             
                             # Extract brand
-                            if product_data['name']:
-                                brand_match = re.match(r'^([A-Za-z\s]+?)[\s\-]', product_data['name'])
+                            if name:
+                                brand_match = HIDDEN_BRAND_RE.match(name)
                                 if brand_match:
                                     product_data['brand'] = brand_match.group(1).strip()
                             
@@ -404,65 +428,41 @@ class SnapdealScraper:
         
         return hidden_products
     
-    def search_products(self, search_term, max_pages=5):
-        """Search for products and extract data from visible HTML only"""
-        all_products = []
+    def build_page_url(self, search_term, page):
+        """Build the search URL for a results page"""
         encoded_search_term = quote_plus(search_term)
         
-        for page in range(1, max_pages + 1):
-            logger.info(f"Scraping page {page} for '{search_term}'")
-            
-            # Construct URL with page parameter
-            if page == 1:
-                url = self.base_url.format(search_term=encoded_search_term)
-            else:
-                url = f"{self.base_url.format(search_term=encoded_search_term)}&page={page}"
-            
-            response = self.make_request(url)
-            
-            if not response:
-                logger.error(f"Failed to fetch page {page}")
-                continue
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Extract from visible HTML elements only
-            product_selectors = [
-                '.product-tuple-listing',
-                '.js-tuple',
-                '.favDp.product-tuple-listing'
-            ]
-            
-            products_found = []
-            for selector in product_selectors:
-                products = soup.select(selector)
-                if products:
-                    products_found = products
-                    break
-            
-            if not products_found:
-                logger.warning(f"No products found on page {page}")
-                break
-            
-            logger.info(f"Found {len(products_found)} product containers on page {page}")
-            
-            for product_element in products_found:
-                product_data = self.extract_product_data(product_element)
-                
-                # Only add products with meaningful data
-                if product_data['name'] and (product_data['price'] or product_data['url']):
-                    all_products.append(product_data)
-            
-            # Random delay between pages
-            time.sleep(random.uniform(3, 7))
+        # Construct URL with page parameter
+        if page == 1:
+            return self.base_url.format(search_term=encoded_search_term)
+        return f"{self.base_url.format(search_term=encoded_search_term)}&page={page}"
+    
+    def find_product_containers(self, soup):
+        """Product card elements on a parsed results page"""
+        # Extract from visible HTML elements only
+        for index, selector in PRODUCT_CONTAINERS.ordered:
+            products = selector.select(soup)
+            if products:
+                PRODUCT_CONTAINERS.hit(index)
+                # A card's inner wrappers can match too
+                return outermost(products)
         
-        return all_products
+        PRODUCT_CONTAINERS.miss()
+        return []
+    
+    def results_end(self, soup, page):
+        """Why page is the last results page (its "See more" button is hidden), None if it may not be"""
+        # Like JioMart's load-more button, but a missing one isn't taken as the end: it could be a markup change
+        see_more = soup.select_one(SEE_MORE)
+        if see_more is not None and ('hidden' in see_more.get('class', []) or HIDDEN_STYLE_RE.search(see_more.get('style') or '')):
+            return 'no more results to load'
+        return None
     
     def save_to_json(self, data, filename):
         """Save data to JSON file"""
         try:
             with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+                json.dump(data, f, indent=2, ensure_ascii=False, default=json_default)
             logger.info(f"Data saved to {filename}")
             return True
         except Exception as e:
@@ -470,86 +470,31 @@ class SnapdealScraper:
             return False
     
     def get_search_summary(self, products):
-        """Generate summary statistics"""
+        """Generate summary statistics (price, rating and discount fields come from search_summary)"""
         if not products:
             return {}
         
-        total_products = len(products)
-        products_with_price = [p for p in products if p.get('price_numeric', 0) > 0]
-        
-        summary = {
-            'total_products': total_products,
-            'products_with_price': len(products_with_price),
-            'products_with_rating': len([p for p in products if p.get('rating')]),
-            'products_with_discounts': len([p for p in products if p.get('discount_percentage')]),
-            'brands_found': list(set([p['brand'] for p in products if p.get('brand')])),
-            'price_range': {},
-            'avg_rating': 0,
-            'avg_discount': 0
-        }
-        
-        if products_with_price:
-            prices = [p['price_numeric'] for p in products_with_price]
-            summary['price_range'] = {
-                'min_price': min(prices),
-                'max_price': max(prices),
-                'avg_price': sum(prices) // len(prices)
-            }
-        
-        # Calculate average rating
-        rated_products = []
-        for p in products:
-            if p.get('rating'):
-                try:
-                    rated_products.append(float(p['rating']))
-                except:
-                    pass
-        if rated_products:
-            summary['avg_rating'] = round(sum(rated_products) / len(rated_products), 2)
-        
-        # Calculate average discount
-        discount_products = []
-        for p in products:
-            if p.get('discount_percentage'):
-                discount_match = re.search(r'(\d+)', p['discount_percentage'])
-                if discount_match:
-                    discount_products.append(int(discount_match.group(1)))
-        if discount_products:
-            summary['avg_discount'] = round(sum(discount_products) / len(discount_products), 1)
-        
+        summary, columns = product_summary(products)
+        summary['brands_found'] = columns.distinct('brand')
         return summary
 
-# Function to scrape and return JSON
-def scrape_snapdeal_products(search_term, max_pages=3):
-    """Scrape Snapdeal products and return JSON data"""
-    scraper = SnapdealScraper()
+# Generator behind the streaming API and scrape_snapdeal_products
+def stream_snapdeal_products(search_term, max_pages=3, concurrency=1, max_products=None, cancel_event=None):
+    """Scrape Snapdeal products page by page
     
+    Yields a 'page' event with each page's products as soon as it is parsed
+    ('page_failed' for pages that could not be fetched), then a 'summary'
+    event with the same fields as scrape_snapdeal_products minus 'products'.
+    """
     logger.info(f"Searching for '{search_term}' on Snapdeal...")
-    products = scraper.search_products(search_term, max_pages=max_pages)
-    
-    if products:
-        # Generate summary
-        summary = scraper.get_search_summary(products)
-        
-        # Prepare final data structure
-        result = {
-            'search_term': search_term,
-            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
-            'total_pages_scraped': max_pages,
-            'summary': summary,
-            'products': products
-        }
-        
-        return result
-    else:
-        return {
-            'search_term': search_term,
-            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
-            'total_pages_scraped': max_pages,
-            'summary': {'total_products': 0},
-            'products': [],
-            'error': 'No products found'
-        }
+    yield from stream_products(SnapdealScraper(), search_term, max_pages=max_pages, concurrency=concurrency,
+                               max_products=max_products, cancel_event=cancel_event)
+
+# Function to scrape and return JSON
+def scrape_snapdeal_products(search_term, max_pages=3, concurrency=1, max_products=None, cancel_event=None):
+    """Scrape Snapdeal products and return JSON data"""
+    return collect_events(stream_snapdeal_products(search_term, max_pages=max_pages, concurrency=concurrency,
+                                                   max_products=max_products, cancel_event=cancel_event))
 
 # Alternative: Direct JSON output function
 def get_snapdeal_products_json(search_term, max_pages=3):
@@ -558,7 +503,7 @@ def get_snapdeal_products_json(search_term, max_pages=3):
     Usage: json_string = get_snapdeal_products_json("pants", 2)
     """
     result = scrape_snapdeal_products(search_term, max_pages)
-    return json.dumps(result, indent=2, ensure_ascii=False)
+    return json.dumps(result, indent=2, ensure_ascii=False, default=json_default)
 
 # Example usage
 def main():
@@ -570,14 +515,19 @@ def main():
     result_json = scrape_snapdeal_products(search_term, max_pages)
     
     # Output JSON to console
-    print(json.dumps(result_json, indent=2, ensure_ascii=False))
+    print(json.dumps(result_json, indent=2, ensure_ascii=False, default=json_default))
     
     # Also save to file
     filename = f"snapdeal_{search_term.replace(' ', '_')}_{int(time.time())}.json"
     with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(result_json, f, indent=2, ensure_ascii=False)
+        json.dump(result_json, f, indent=2, ensure_ascii=False, default=json_default)
     
     print(f"\n\nData also saved to: {filename}", file=sys.stderr)
+    
+    # And to the product store, when SCRAPER_PRODUCT_DB is set
+    stored = product_store.save_search_result(SITE, result_json)
+    if stored:
+        print(f"Stored {stored} products in {product_store.DB_PATH}", file=sys.stderr)
 
 if __name__ == "__main__":
     import sys
@@ -0,0 +1,25 @@
+#!/bin/bash
+echo "Starting Multi-Platform Scraper Backend (production)..."
+cd backend
+
+# Remove old venv if it exists with issues
+if [ -d "venv" ] && [ ! -f "venv/bin/activate" ]; then
+    echo "Removing corrupted virtual environment..."
+    rm -rf venv
+fi
+
+if [ ! -d "venv" ]; then
+    echo "Creating virtual environment..."
+    python3 -m venv venv
+fi
+
+echo "Activating virtual environment..."
+source venv/bin/activate
+
+echo "Installing requirements..."
+pip install -r requirements.txt
+
+# Workers, threads and timeouts come from BACKEND_* variables, see gunicorn.conf.py
+echo "Starting gunicorn on http://${BACKEND_BIND:-127.0.0.1:5001} with ${BACKEND_WORKERS:-1} worker(s) x ${BACKEND_THREADS:-8} threads"
+echo "Press Ctrl+C (or send SIGTERM) to stop; running scrapes get BACKEND_GRACEFUL_TIMEOUT seconds to finish"
+exec gunicorn -c gunicorn.conf.py
@@ -14,7 +14,7 @@ echo "3️⃣ Upgrading pip..."
 pip install --upgrade pip
 
 echo "4️⃣ Installing Flask and dependencies..."
-pip install Flask==2.3.3 Flask-CORS==4.0.0 requests==2.31.0 beautifulsoup4==4.12.2
+pip install Flask==2.3.3 Flask-CORS==4.0.0 requests==2.31.0 beautifulsoup4==4.12.2 httpx==0.27.2
 
 echo "5️⃣ Testing if Flask imports work..."
 python3 -c "from flask import Flask; print('✅ Flask import successful')"
@@ -0,0 +1,11 @@
+import os
+import sys
+
+# The scraper modules live at the top of the repository, next to this directory, and the API in backend/
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(1, os.path.join(REPO_ROOT, 'backend'))
+
+# Importing the backend must not open backend/products.db or backend/jobs.db
+os.environ.setdefault('SCRAPER_PRODUCT_DB', 'off')
+os.environ.setdefault('SCRAPER_JOB_DB', 'off')
@@ -0,0 +1,94 @@
+import threading
+import time
+
+from batch import ITEM_CANCELLED, ITEM_COMPLETED, ITEM_FAILED, BatchItem, BatchScheduler, summarize
+
+
+def make_items(*scraper_ids):
+    return [BatchItem(index, scraper_id, {'search_term': f'term {index}'})
+            for index, scraper_id in enumerate(scraper_ids)]
+
+
+class Tracker:
+    """run_item stand-in that records the most items of each site running at once"""
+
+    def __init__(self, seconds=0.02):
+        self.seconds = seconds
+        self.running = {}
+        self.peak = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, item):
+        with self.lock:
+            self.running[item.scraper_id] = self.running.get(item.scraper_id, 0) + 1
+            self.peak[item.scraper_id] = max(self.peak.get(item.scraper_id, 0), self.running[item.scraper_id])
+        time.sleep(self.seconds)
+        with self.lock:
+            self.running[item.scraper_id] -= 1
+        item.status = ITEM_COMPLETED
+        item.result = {'products': [{'price_numeric': 100 * (item.index + 1)}]}
+
+
+def test_items_run_under_each_sites_limit():
+    tracker = Tracker()
+    items = make_items(*['amazon'] * 6, *['flipkart'] * 3)
+    returned = BatchScheduler(site_limit=2, site_limits={'flipkart': 1}).run(items, tracker)
+
+    assert returned == items
+    assert all(item.status == ITEM_COMPLETED for item in items)
+    assert tracker.peak == {'amazon': 2, 'flipkart': 1}
+
+
+def test_limits_are_shared_by_batches_running_at_once():
+    tracker = Tracker()
+    scheduler = BatchScheduler(site_limit=2)
+    batches = [make_items(*['amazon'] * 4) for _ in range(2)]
+    threads = [threading.Thread(target=scheduler.run, args=(items, tracker)) for items in batches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert tracker.peak == {'amazon': 2}
+
+
+def test_a_failing_item_does_not_stop_the_batch():
+    def run_item(item):
+        if item.index == 0:
+            raise ValueError('blocked')
+        item.status = ITEM_COMPLETED
+
+    items = BatchScheduler(site_limit=1).run(make_items('amazon', 'amazon'), run_item)
+    assert items[0].status == ITEM_FAILED
+    assert items[0].error == 'Scraping failed: blocked'
+    assert items[1].status == ITEM_COMPLETED
+
+
+def test_items_not_started_are_cancelled():
+    cancel_event = threading.Event()
+
+    def run_item(item):
+        cancel_event.set()
+        item.status = ITEM_COMPLETED
+
+    items = BatchScheduler(site_limit=1).run(make_items('amazon', 'amazon', 'amazon'), run_item,
+                                             cancel_event=cancel_event)
+    assert [item.status for item in items] == [ITEM_COMPLETED, ITEM_CANCELLED, ITEM_CANCELLED]
+
+
+def test_progress_counts_every_finished_item():
+    reported = []
+    BatchScheduler(site_limit=2).run(make_items('amazon', 'flipkart', 'amazon'), Tracker(0), progress=reported.append)
+    assert sorted(reported) == [1, 2, 3]
+
+
+def test_summarize():
+    items = BatchScheduler().run(make_items('amazon', 'flipkart'), Tracker(0))
+    items.append(BatchItem(2, 'snapdeal', {}))
+    items[2].status = ITEM_FAILED
+
+    summary = summarize(items)
+    assert summary['total'] == 3
+    assert summary['statuses'] == {ITEM_COMPLETED: 2, ITEM_FAILED: 1}
+    assert summary['products']['price_stats']['min'] == 100
+    assert summary['products']['price_stats']['max'] == 200
@@ -0,0 +1,143 @@
+import json
+
+import pytest
+
+import extraction_schema
+from extraction_schema import REORDER_INTERVAL, Field, Schema, SelectorChain, SelectorStats, merge_counts
+from html_parsing import parse_html
+
+CARD = parse_html(
+    '<div class="card">'
+    '<h2 class="title"> Phone X </h2>'
+    '<span class="price">Rs. 1,999</span><span class="price-old">Rs. 2,499</span>'
+    '<a class="empty-link" href="">Empty</a><a class="link" href="/dp/X">Link</a>'
+    '<li class="spec">8 GB RAM</li><li class="spec">128 GB</li>'
+    '</div>',
+    'selectolax'
+)
+
+OLD_CARD = parse_html('<div><span class="old">A</span></div>', 'selectolax')
+BOTH_CARD = parse_html('<div><span class="new">B</span><span class="old">A</span></div>', 'selectolax')
+
+
+def price(text):
+    digits = ''.join(character for character in text if character.isdigit())
+    return int(digits) if digits else None
+
+
+def declared_order(chain):
+    return [selector.selector for _, selector in chain.settled]
+
+
+def test_field_takes_the_first_selector_with_a_value():
+    assert Field(['.missing', '.title']).extract(CARD) == 'Phone X'
+    assert Field('.missing').extract(CARD) is None
+
+
+def test_field_attr_skips_elements_without_it():
+    assert Field(['.empty-link', '.link'], attr='href').extract(CARD) == '/dp/X'
+
+
+def test_field_parse_returning_none_moves_on():
+    field = Field(['.title', '.price'], parse=price)
+    assert field.extract(CARD) == 1999
+    assert field.chain.hits == [0, 1]
+
+
+def test_field_many_returns_every_match():
+    assert Field('.spec', many=True).extract(CARD) == ['8 GB RAM', '128 GB']
+    assert Field('.spec', many=True, parse=len).extract(CARD) == 2
+
+
+def test_schema_extract_returns_only_matched_fields():
+    schema = Schema('test-schema', name=Field('.title'), price=Field('.price', parse=price), rating=Field('.rating'))
+    assert schema.extract(CARD) == {'name': 'Phone X', 'price': 1999}
+    assert schema.extract(CARD, names=['price']) == {'price': 1999}
+    assert schema.extract_field(CARD, 'rating') is None
+
+
+def test_idle_selector_is_demoted():
+    field = Field(['.new', '.old'])
+    field.chain.idle_limit = 100
+    for _ in range(3 * REORDER_INTERVAL):
+        assert field.extract(OLD_CARD) == 'A'
+    assert declared_order(field.chain) == ['.old', '.new']
+    assert field.chain.stats()['drifted']
+
+
+def test_demoted_selector_moves_back_up_when_it_matches_a_probe():
+    field = Field(['.new', '.old'])
+    field.chain.idle_limit = 100
+    for _ in range(3 * REORDER_INTERVAL):
+        field.extract(OLD_CARD)
+    assert declared_order(field.chain) == ['.old', '.new']
+
+    # '.old' still matches too, so only the probe lookup reaches '.new'
+    values = [field.extract(BOTH_CARD) for _ in range(REORDER_INTERVAL)]
+    assert values.count('B') == 1
+    assert declared_order(field.chain) == ['.new', '.old']
+    assert not field.chain.stats()['drifted']
+
+
+def test_idle_limit_zero_keeps_the_declared_order():
+    field = Field(['.new', '.old'])
+    field.chain.idle_limit = 0
+    values = [field.extract(BOTH_CARD) for _ in range(3 * REORDER_INTERVAL)]
+    assert set(values) == {'B'}
+    assert declared_order(field.chain) == ['.new', '.old']
+
+
+def chain_counts(lookups, misses, **selectors):
+    return {
+        'lookups': lookups,
+        'misses': misses,
+        'selectors': {selector: {'hits': hits, 'idle': idle} for selector, (hits, idle) in selectors.items()}
+    }
+
+
+def test_merge_counts_adds_what_was_counted_since_the_last_sync():
+    # Another worker already saved 40 lookups on top of the 100 both started from
+    on_file = chain_counts(140, 4, a=(120, 0), b=(10, 60))
+    synced = chain_counts(100, 2, a=(90, 0), b=(10, 20))
+    current = chain_counts(130, 3, a=(110, 5), b=(10, 50))
+    assert merge_counts(on_file, current, synced) == chain_counts(170, 5, a=(140, 5), b=(10, 90))
+
+
+def test_merge_counts_without_saved_counts_is_the_current_export():
+    current = chain_counts(10, 1, a=(9, 0))
+    assert merge_counts(None, current, None) == current
+
+
+@pytest.fixture
+def stats_file(tmp_path, monkeypatch):
+    # Chains call the module's registry on every reorder; keep it off the shared file
+    monkeypatch.setattr(extraction_schema, 'selector_stats', SelectorStats(path=None))
+    return tmp_path / 'selectors.json'
+
+
+def test_workers_saving_one_file_keep_each_others_counts(stats_file):
+    workers = [SelectorStats(path=str(stats_file)) for _ in range(2)]
+    chains = [worker.register('site', 'name', SelectorChain(['.new', '.old'])) for worker in workers]
+    for _ in range(30):
+        chains[0].hit(0)
+    for _ in range(20):
+        chains[1].hit(1)
+    for worker in workers:
+        worker.save()
+    chains[0].hit(0)
+    workers[0].save()
+
+    saved = json.loads(stats_file.read_text())['site']['name']
+    assert saved['lookups'] == 51
+    assert {selector: counts['hits'] for selector, counts in saved['selectors'].items()} == {'.new': 31, '.old': 20}
+
+
+def test_saved_counts_are_restored_on_register(stats_file):
+    worker = SelectorStats(path=str(stats_file))
+    chain = worker.register('site', 'name', SelectorChain(['.new', '.old']))
+    chain.hit(1)
+    chain.miss()
+    worker.save()
+
+    restored = SelectorStats(path=str(stats_file)).register('site', 'name', SelectorChain(['.new', '.old']))
+    assert (restored.lookups, restored.misses, restored.hits) == (2, 1, [0, 1])
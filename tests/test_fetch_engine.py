@@ -0,0 +1,25 @@
+import time
+from email.utils import formatdate
+
+import pytest
+
+from fetch_engine import parse_retry_after
+
+
+@pytest.mark.parametrize('value, seconds', [('120', 120.0), (' 5 ', 5.0), ('0', 0.0)])
+def test_delta_seconds(value, seconds):
+    assert parse_retry_after(value) == seconds
+
+
+def test_http_date_in_the_future():
+    value = formatdate(time.time() + 60, usegmt=True)
+    assert 55 <= parse_retry_after(value) <= 60
+
+
+def test_http_date_in_the_past_is_no_wait():
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+
+
+@pytest.mark.parametrize('value', [None, '', '-5', '1.5', 'soon'])
+def test_unusable_values(value):
+    assert parse_retry_after(value) is None
@@ -0,0 +1,119 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+import jobs
+from job_store import JobStore
+from jobs import CANCELLED, COMPLETED, FAILED, RUNNING, JobManager
+
+FORK = multiprocessing.get_context('fork')
+
+
+@pytest.fixture
+def store_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, 'STORE_POLL_SECONDS', 0.05)
+    return str(tmp_path / 'jobs.db')
+
+
+def other_worker(path, kind, job_ids, release):
+    """Stand-in for a second gunicorn worker: submits one job, then stays up until released"""
+    manager = JobManager(max_workers=2, store=JobStore(path))
+
+    def run(job):
+        if kind == 'result':
+            manager.set_progress(job, {'finished': 1, 'total': 1})
+            return {'products': [{'name': 'Phone', 'price_numeric': 1999}]}
+        # Runs until cancelled, as a scrape stops before its next page
+        deadline = time.monotonic() + 10
+        while not job.cancel_event.is_set() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return {'products': [], 'cancelled': job.cancel_event.is_set()}
+
+    job = manager.submit('amazon', {'search_term': 'phone'}, run)
+    job_ids.put(job.id)
+    if kind == 'exit':
+        # Dies with the job running, like a killed worker
+        time.sleep(0.2)
+        os._exit(0)
+    release.wait(10)
+    manager.wait(job.id, 10)
+
+
+@pytest.fixture
+def start_worker(store_path):
+    processes = []
+    release = FORK.Event()
+
+    def start(kind):
+        job_ids = FORK.Queue()
+        process = FORK.Process(target=other_worker, args=(store_path, kind, job_ids, release))
+        process.start()
+        processes.append(process)
+        return job_ids.get(timeout=10), process
+
+    yield start
+    release.set()
+    for process in processes:
+        process.join(10)
+
+
+def test_another_workers_job_can_be_waited_for(store_path, start_worker):
+    job_id, _ = start_worker('result')
+    manager = JobManager(store=JobStore(store_path))
+
+    job = manager.wait(job_id, timeout=10)
+    assert job.status == COMPLETED
+    assert job.result == {'products': [{'name': 'Phone', 'price_numeric': 1999}]}
+    assert job.to_dict()['progress'] == {'finished': 1, 'total': 1}
+    assert manager.get(job_id).status == COMPLETED
+
+
+def test_another_workers_job_is_listed(store_path, start_worker):
+    job_id, _ = start_worker('result')
+    manager = JobManager(store=JobStore(store_path))
+    manager.wait(job_id, timeout=10)
+
+    assert job_id in [job.id for job in manager.list_jobs()]
+    assert manager.stats()['jobs'] == {COMPLETED: 1}
+
+
+def test_cancel_reaches_the_worker_running_the_job(store_path, start_worker):
+    job_id, _ = start_worker('cancel')
+    manager = JobManager(store=JobStore(store_path))
+    deadline = time.monotonic() + 10
+    while manager.get(job_id).status != RUNNING and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    manager.cancel(job_id)
+    job = manager.wait(job_id, timeout=10)
+    assert job.status == CANCELLED
+    assert job.result == {'products': [], 'cancelled': True}
+
+
+def test_jobs_of_an_exited_worker_are_failed(store_path, start_worker):
+    job_id, process = start_worker('exit')
+    # Reaped, as gunicorn's master reaps its workers
+    process.join(10)
+
+    job = JobManager(store=JobStore(store_path)).get(job_id)
+    assert job.status == FAILED
+    assert job.error == 'Worker exited before the job finished'
+
+
+def test_unknown_job(store_path):
+    manager = JobManager(store=JobStore(store_path))
+    assert manager.get('missing') is None
+    assert manager.cancel('missing') is None
+    assert manager.wait('missing', timeout=0.1) is None
+
+
+def test_finished_jobs_are_pruned_from_the_store(store_path):
+    manager = JobManager(retention_seconds=0, store=JobStore(store_path))
+    job = manager.submit('amazon', {}, lambda job: {'products': []})
+    manager.wait(job.id, timeout=10)
+    time.sleep(0.01)
+
+    manager.submit('amazon', {}, lambda job: {'products': []})
+    assert manager.store.load(job.id) is None
@@ -0,0 +1,75 @@
+import os
+import subprocess
+import sys
+
+import metrics
+from conftest import REPO_ROOT
+
+
+def sample(text, line_start):
+    """Value of the one sample line starting with line_start"""
+    values = [line.rsplit(' ', 1)[1] for line in text.splitlines() if line.startswith(line_start + ' ')]
+    assert len(values) == 1, f"{line_start} in\n{text}"
+    return float(values[0])
+
+
+def run_python(code, env=None):
+    result = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, env={**os.environ, **(env or {})},
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+def test_counter_and_histogram_exposition():
+    metrics.SCRAPES.labels('exposition-test', 'completed').inc()
+    metrics.SCRAPES.labels('exposition-test', 'completed').inc()
+    metrics.SERIALIZE_SECONDS.labels('exposition-test').observe(0.0002)
+    with metrics.SERIALIZE_SECONDS.labels('exposition-test').time():
+        pass
+
+    text = metrics.render()
+    assert '# TYPE scraper_scrapes_total counter' in text
+    assert '# TYPE scraper_serialize_seconds histogram' in text
+    assert sample(text, 'scraper_scrapes_total{outcome="completed",scraper="exposition-test"}') == 2
+    assert sample(text, 'scraper_serialize_seconds_bucket{le="0.00025",scraper="exposition-test"}') >= 1
+    assert sample(text, 'scraper_serialize_seconds_bucket{le="+Inf",scraper="exposition-test"}') == 2
+    assert sample(text, 'scraper_serialize_seconds_count{scraper="exposition-test"}') == 2
+    assert '_created' not in text
+
+
+def test_metrics_endpoint():
+    from app import app
+
+    response = app.test_client().get('/api/metrics')
+    assert response.status_code == 200
+    assert response.content_type == metrics.CONTENT_TYPE
+    assert '# HELP scraper_http_requests_total' in response.get_data(as_text=True)
+
+
+def test_multiprocess_mode_adds_up_every_worker(tmp_path):
+    env = {'PROMETHEUS_MULTIPROC_DIR': str(tmp_path)}
+    worker = (
+        "import metrics\n"
+        "metrics.SCRAPES.labels('amazon', 'completed').inc()\n"
+        "metrics.SCRAPE_SECONDS.labels('amazon').observe(1.5)\n"
+    )
+    for _ in range(2):
+        run_python(worker, env)
+
+    text = run_python("import metrics; print(metrics.render())", env)
+    assert sample(text, 'scraper_scrapes_total{outcome="completed",scraper="amazon"}') == 2
+    assert sample(text, 'scraper_scrape_seconds_count{scraper="amazon"}') == 2
+    assert sample(text, 'scraper_scrape_seconds_sum{scraper="amazon"}') == 3
+
+
+def test_metrics_are_no_ops_without_prometheus_client():
+    output = run_python(
+        "import sys\n"
+        "sys.modules['prometheus_client'] = None\n"
+        "import metrics\n"
+        "metrics.HTTP_REQUESTS.labels('amazon', 200).inc()\n"
+        "with metrics.PARSE_SECONDS.labels('amazon').time():\n"
+        "    pass\n"
+        "print(repr(metrics.render()))\n"
+    )
+    assert output.strip() == "''"
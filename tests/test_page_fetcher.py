@@ -0,0 +1,163 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from page_fetcher import PAGE_EMPTY, PAGE_OK, PAGE_SKIPPED, PageLimit, SeenProducts, iter_pages
+
+
+def test_claim_is_true_once_per_key():
+    seen = SeenProducts()
+    assert seen.claim('B0001')
+    assert not seen.claim('B0001')
+    assert seen.claim('B0002')
+    assert seen.duplicates == 1
+
+
+def test_products_without_a_key_are_never_duplicates():
+    seen = SeenProducts()
+    assert seen.claim(None)
+    assert seen.claim('')
+    assert not seen.is_duplicate(None)
+    assert seen.duplicates == 0
+
+
+def test_is_duplicate_claims_nothing():
+    seen = SeenProducts()
+    assert not seen.is_duplicate('B0001')
+    # A card that failed to extract leaves the key free for a later card
+    assert seen.claim('B0001')
+    assert seen.is_duplicate('B0001')
+    assert seen.duplicates == 1
+
+
+def test_claim_from_many_threads_succeeds_once():
+    seen = SeenProducts()
+    start = threading.Barrier(8)
+
+    def claim(_):
+        start.wait()
+        return seen.claim('B0001')
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        claimed = list(executor.map(claim, range(8)))
+    assert claimed.count(True) == 1
+    assert seen.duplicates == 7
+
+
+def test_page_limit_starts_at_max_pages():
+    limit = PageLimit(5)
+    assert not limit.past_end(5)
+    assert limit.past_end(6)
+
+
+def test_stop_after_only_lowers_the_last_page():
+    limit = PageLimit(5)
+    limit.stop_after(3, 'no next page')
+    limit.stop_after(4, 'no next page')
+    assert limit.last_page == 3
+    assert limit.past_end(4)
+
+
+def test_past_end_once_earlier_pages_found_max_products():
+    limit = PageLimit(5, max_products=50)
+    limit.found(1, 48)
+    assert not limit.past_end(2)
+    limit.found(2, 48)
+    assert limit.past_end(3)
+    # Only pages before it count
+    assert not limit.past_end(2)
+
+
+def test_repeated_page_becomes_past_the_end():
+    limit = PageLimit(5)
+    assert not limit.repeated(2, ('a', 'b'))
+    assert limit.repeated(3, ('a', 'b'))
+    assert limit.last_page == 2
+
+
+def test_repeat_parsed_first_ends_at_the_later_page():
+    limit = PageLimit(5)
+    assert not limit.repeated(3, ('a', 'b'))
+    assert not limit.repeated(2, ('a', 'b'))
+    assert limit.last_page == 3
+
+
+def test_empty_fingerprints_are_never_repeats():
+    limit = PageLimit(5)
+    limit.repeated(1, (None, None))
+    assert not limit.repeated(2, (None, None))
+    assert limit.last_page == 5
+
+
+def pages_task(counts, requested, limit=None):
+    """page_task serving counts[page - 1] products per page, recording the pages it was asked for"""
+    def page_task(page):
+        if limit is not None and limit.past_end(page):
+            return PAGE_SKIPPED, []
+        requested.append(page)
+        count = counts[page - 1] if page <= len(counts) else 0
+        if not count:
+            return PAGE_EMPTY, []
+        return PAGE_OK, [f'{page}-{number}' for number in range(count)]
+    return page_task
+
+
+def test_iter_pages_stops_after_the_first_empty_page():
+    requested = []
+    pages = list(iter_pages(pages_task([3, 3], requested), max_pages=5))
+    assert [(page, status) for page, status, _ in pages] == [(1, PAGE_OK), (2, PAGE_OK), (3, PAGE_EMPTY)]
+    assert requested == [1, 2, 3]
+
+
+def test_iter_pages_cuts_the_page_that_reaches_max_products():
+    requested = []
+    pages = list(iter_pages(pages_task([4, 4, 4], requested), max_pages=3, max_products=6))
+    assert [len(products) for _, _, products in pages] == [4, 2]
+    assert requested == [1, 2]
+
+
+def test_concurrent_pages_are_yielded_in_order_and_stop_at_the_end():
+    requested = []
+    limit = PageLimit(8)
+    pages = list(iter_pages(pages_task([2, 2, 2], requested, limit), max_pages=8, concurrency=3, limit=limit))
+    assert [page for page, _, _ in pages] == [1, 2, 3, 4]
+    assert pages[-1][1] == PAGE_EMPTY
+    # Pages queued behind the empty one are never requested
+    assert max(requested) <= 6
+
+
+def test_concurrent_pages_stop_at_max_products():
+    requested = []
+    limit = PageLimit(6, max_products=5)
+    pages = list(iter_pages(pages_task([4, 4, 4, 4, 4, 4], requested, limit), max_pages=6, concurrency=2,
+                            limit=limit, max_products=5))
+    assert sum(len(products) for _, _, products in pages) == 5
+    assert [page for page, _, _ in pages] == [1, 2]
+
+
+def cancelling_task(requested, cancel_event, cancel_on):
+    """page_task with 2 products per page that sets cancel_event while serving page cancel_on"""
+    def page_task(page):
+        requested.append(page)
+        if page == cancel_on:
+            cancel_event.set()
+        return PAGE_OK, [f'{page}-0', f'{page}-1']
+    return page_task
+
+
+def test_cancel_stops_before_the_next_page():
+    requested = []
+    cancel_event = threading.Event()
+    limit = PageLimit(5, cancel_event=cancel_event)
+    pages = list(iter_pages(cancelling_task(requested, cancel_event, 2), max_pages=5, limit=limit))
+    assert [page for page, _, _ in pages] == [1, 2]
+    assert requested == [1, 2]
+
+
+def test_cancel_skips_concurrent_pages_not_started():
+    requested = []
+    cancel_event = threading.Event()
+    limit = PageLimit(8, cancel_event=cancel_event)
+    pages = list(iter_pages(cancelling_task(requested, cancel_event, 2), max_pages=8, concurrency=2, limit=limit))
+    assert [page for page, _, _ in pages] in ([], [1])
+    assert max(requested) <= 3
+    assert limit.skip(4)
@@ -0,0 +1,39 @@
+import pytest
+
+from amazon_scraper import PAGE_NODES, PRODUCT_CONTAINERS, AmazonScraper
+from html_parsing import PartialParse, parse_html
+
+# Cards only reachable through Amazon's last container fallback, '.sg-col-inner .s-widget-container'
+WIDGET_PAGE = (
+    '<html><body><header><a href="/">Amazon</a></header>'
+    '<div class="sg-col-20-of-24"><div class="sg-col-inner">'
+    '<div class="s-widget-container" data-asin="B0W1"><h2><a href="/dp/B0W1"><span>Widget phone</span></a></h2></div>'
+    '<div class="s-widget-container" data-asin="B0W2"><h2><a href="/dp/B0W2"><span>Widget tablet</span></a></h2></div>'
+    '<div class="s-widget-container" data-asin=""><span>Sponsored brands</span></div>'
+    '</div></div><footer>Footer</footer></body></html>'
+)
+
+
+def asins(cards):
+    return [card.get('data-asin') for card in cards]
+
+
+def test_partial_parse_rejects_descendant_selectors():
+    with pytest.raises(ValueError):
+        PartialParse(['.sg-col-inner .s-widget-container'])
+
+
+@pytest.mark.parametrize('backend', ['bs4', 'selectolax', 'lxml'])
+def test_widget_layout_cards_survive_the_partial_parse(backend):
+    scraper = AmazonScraper()
+    full = scraper.find_product_containers(parse_html(WIDGET_PAGE, backend))
+    partial = scraper.find_product_containers(parse_html(WIDGET_PAGE, backend, PAGE_NODES))
+    assert asins(full) == asins(partial) == ['B0W1', 'B0W2']
+
+
+def test_partial_parse_skips_the_page_around_the_cards():
+    root = parse_html(WIDGET_PAGE, 'bs4', PAGE_NODES)
+    assert root.select_one('.sg-col-inner') is None
+    assert root.select_one('footer') is None
+    # The fallback selector itself is still part of the chain for full trees
+    assert '.sg-col-inner .s-widget-container' in [selector.selector for selector in PRODUCT_CONTAINERS.selectors]
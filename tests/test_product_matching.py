@@ -0,0 +1,86 @@
+import pytest
+
+from product_matching import ProductMatcher, conflicts, is_match, normalize_title
+
+
+def titles(a, b):
+    return normalize_title(a), normalize_title(b)
+
+
+@pytest.mark.parametrize('a, b', [
+    ('Samsung Galaxy S23 5G (Phantom Black, 128GB)', 'Samsung Galaxy S23 5G 128 GB Phantom Black'),
+    ('Amul Butter 500 g', 'Amul Butter 0.5 kg'),
+    ('Amul Taaza Milk 1 L', 'Amul Taaza Milk 1000 ml'),
+])
+def test_same_product_matches(a, b):
+    assert is_match(*titles(a, b))
+
+
+@pytest.mark.parametrize('a, b', [
+    ('Samsung Galaxy S23 5G (Phantom Black, 128GB)', 'Samsung Galaxy S23 5G (Phantom Black, 256GB)'),
+    ('Apple iPhone 15 128GB Black', 'Apple iPhone 15 Pro 128GB Black'),
+    ('Amul Butter 500 g', 'Amul Butter 100 g'),
+    ('HP Laptop 15s Intel Core i5', 'Dell Laptop 15s Intel Core i5'),
+    ('Boat Airdopes 141 Earbuds', 'Boat Airdopes 161 Earbuds'),
+    ('Parle-G Biscuits Pack of 4', 'Parle-G Biscuits Pack of 8'),
+])
+def test_conflicting_products_do_not_match(a, b):
+    a, b = titles(a, b)
+    assert conflicts(a, b)
+    assert not is_match(a, b)
+
+
+def test_titles_each_with_words_the_other_lacks_need_the_stricter_threshold():
+    a, b = titles('Noise Laptop 4', 'Noise Monitor 4')
+    assert not conflicts(a, b)
+    assert not is_match(a, b)
+
+
+def test_brand_field_among_the_other_titles_words_is_no_conflict():
+    a = normalize_title('Galaxy S23 5G 128GB Black', brand='Samsung')
+    b = normalize_title('Samsung Galaxy S23 5G 128GB Black')
+    assert not conflicts(a, b)
+
+
+def test_quantity_only_on_one_side_is_no_conflict():
+    assert not conflicts(*titles('Amul Butter 500 g', 'Amul Butter'))
+
+
+def test_quantities_are_canonical():
+    title = normalize_title('Seagate Drive 1TB and Bottle 1.5 L')
+    assert title.quantities == {'gb': frozenset({'1024gb'}), 'ml': frozenset({'1500ml'})}
+
+
+def test_matcher_clusters_across_sites():
+    matcher = ProductMatcher()
+    matcher.add('amazon', 'A1', 'Samsung Galaxy S23 5G (Phantom Black, 128GB)', price=74999)
+    matcher.add('flipkart', 'F1', 'Samsung Galaxy S23 5G 128 GB Phantom Black', price=72999)
+    matcher.add('snapdeal', 'S1', 'Samsung Galaxy S23 5G (Phantom Black, 256GB)', price=79999)
+    clusters = matcher.clusters()
+    assert len(clusters) == 1
+    assert clusters[0]['sites'] == ['amazon', 'flipkart']
+    assert clusters[0]['cheapest']['product_id'] == 'F1'
+    assert matcher.cluster_of('snapdeal', 'S1')['size'] == 1
+
+
+def test_title_change_splits_only_its_cluster():
+    matcher = ProductMatcher()
+    matcher.add('amazon', 'A1', 'Samsung Galaxy S23 5G Phantom Black 128GB')
+    matcher.add('flipkart', 'F1', 'Samsung Galaxy S23 5G 128 GB Phantom Black')
+    matcher.add('amazon', 'A2', 'Amul Butter 500 g')
+    matcher.add('flipkart', 'F2', 'Amul Butter 0.5 kg')
+    assert len(matcher.clusters()) == 2
+
+    matcher.add('amazon', 'A1', 'Apple iPhone 15 Pro 256GB Blue')
+    assert matcher.cluster_of('flipkart', 'F1')['size'] == 1
+    assert matcher.cluster_of('amazon', 'A2')['size'] == 2
+    assert matcher.stats()['clusters'] == 1
+
+
+def test_same_title_again_only_updates_the_price():
+    matcher = ProductMatcher()
+    matcher.add('amazon', 'A1', 'Amul Butter 500 g', price=280)
+    matcher.add('flipkart', 'F1', 'Amul Butter 0.5 kg', price=275)
+    assert matcher.add('amazon', 'A1', 'Amul Butter 500 g', price=260) == 1
+    assert matcher.stats()['updated'] == 1
+    assert matcher.cluster_of('amazon', 'A1')['price_range'] == {'min_price': 260, 'max_price': 275}
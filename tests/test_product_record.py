@@ -0,0 +1,78 @@
+import json
+from unittest import mock
+
+import pytest
+
+import product_record
+from product_record import dumps, json_default, product_record as make_record
+
+Phone = make_record('Phone', {'name': '', 'price': 0, 'badges': []}, optional=('emi_info',))
+
+
+def phone(**fields):
+    record = Phone()
+    record.update(fields)
+    return record
+
+
+def test_records_read_and_write_like_dicts():
+    record = phone(name='Galaxy', price=74999)
+    assert record['name'] == 'Galaxy'
+    assert record.get('emi_info', 'none') == 'none'
+    assert 'emi_info' not in record
+    record['emi_info'] = 'No cost EMI'
+    assert record.keys() == ['name', 'price', 'badges', 'emi_info']
+    with pytest.raises(KeyError):
+        record['colour'] = 'black'
+
+
+def test_list_defaults_are_not_shared():
+    first, second = Phone(), Phone()
+    first['badges'].append('Bestseller')
+    assert second['badges'] == []
+
+
+def test_single_field_record():
+    Name = make_record('Name', {'name': ''})
+    record = Name()
+    record['name'] = 'Galaxy'
+    assert record.to_dict() == {'name': 'Galaxy'}
+
+
+def test_shared_strings_are_interned():
+    Branded = make_record('Branded', {'brand': ''}, shared=('brand',))
+    first, second = Branded(), Branded()
+    first['brand'] = ''.join(['Sam', 'sung'])
+    second['brand'] = ''.join(['Sams', 'ung'])
+    assert first['brand'] is second['brand']
+
+
+def test_unset_optional_fields_are_left_out_of_the_json():
+    products = [phone(name='Galaxy ₹', price=74999), phone(name='Buds', emi_info='EMI')]
+    expected = [{'name': 'Galaxy ₹', 'price': 74999, 'badges': []},
+                {'name': 'Buds', 'price': 0, 'badges': [], 'emi_info': 'EMI'}]
+    assert json.loads(dumps({'products': products})) == {'products': expected}
+    assert json.loads(json.dumps(products, default=json_default)) == expected
+
+
+def test_dumps_without_orjson(monkeypatch):
+    monkeypatch.setattr(product_record, 'orjson', None)
+    assert json.loads(dumps([phone(name='Galaxy')], sort_keys=True)) == [{'badges': [], 'name': 'Galaxy', 'price': 0}]
+
+
+def test_dumps_falls_back_for_values_orjson_rejects():
+    assert json.loads(dumps({'big': 2 ** 70})) == {'big': 2 ** 70}
+
+
+@pytest.mark.parametrize('debug', [False, True])
+def test_api_responses_use_the_record_encoder(debug):
+    import app as backend
+
+    backend.app.debug = debug
+    try:
+        with backend.app.app_context(), mock.patch.object(product_record, 'dumps', wraps=product_record.dumps) as fast:
+            response = backend.app.json.response({'products': [phone(name='Galaxy')]})
+    finally:
+        backend.app.debug = False
+    assert fast.called
+    assert json.loads(response.get_data()) == {'products': [{'name': 'Galaxy', 'price': 0, 'badges': []}]}
@@ -0,0 +1,102 @@
+import pytest
+
+from product_store import ProductStore, match_expression, product_key, save_search_result
+
+
+@pytest.fixture
+def store(tmp_path):
+    with ProductStore(str(tmp_path / 'products.db')) as store:
+        yield store
+
+
+def phone(price=74999, original=79999, **fields):
+    return {'asin': 'B0C1', 'name': 'Samsung Galaxy S23 5G', 'url': 'https://www.amazon.in/dp/B0C1', 'brand': 'Samsung',
+            'price_numeric': price, 'original_price_numeric': original, 'rating': '4.3', **fields}
+
+
+def test_product_key():
+    assert product_key('amazon', {'asin': 'B0C1'}) == 'B0C1'
+    assert product_key('flipkart', {'url': 'https://www.flipkart.com/galaxy/p/itm1?pid=MOBG1&lid=x'}) == 'MOBG1'
+    assert product_key('snapdeal', {'url': 'https://www.snapdeal.com/product/kettle/6387'}) == '/product/kettle/6387'
+    assert product_key('amazon', {'url': 'https://www.amazon.in/'}) is None
+
+
+def test_save_upserts_one_row_per_product(store):
+    assert store.save('amazon', [phone(), phone(price=73999)], search_term='Galaxy', seen_at=100) == 1
+    assert store.save('amazon', [phone(name='Samsung Galaxy S23 5G (Black)')], seen_at=200) == 1
+    product = store.get_product('amazon', 'B0C1')
+    assert product['name'] == 'Samsung Galaxy S23 5G (Black)'
+    assert product['rating'] == 4.3
+    assert (product['first_seen'], product['last_seen']) == (100, 200)
+    assert product['data']['asin'] == 'B0C1'
+    assert store.stats()['products'] == 1
+
+
+def test_products_without_a_key_are_skipped(store):
+    assert store.save('amazon', [{'name': 'No id'}]) == 0
+
+
+def test_price_history_only_records_changes(store):
+    store.save('amazon', [phone(price=74999)], seen_at=100)
+    store.save('amazon', [phone(price=74999)], seen_at=200)
+    store.save('amazon', [phone(price=69999)], seen_at=300)
+    store.save('amazon', [phone(price=69999, original=74999)], seen_at=400)
+    history = store.price_history('amazon', 'B0C1')
+    assert [(row['observed_at'], row['price'], row['original_price']) for row in history] == [
+        (100, 74999, 79999), (300, 69999, 79999), (400, 69999, 74999)
+    ]
+    assert [row['observed_at'] for row in store.price_history('amazon', 'B0C1', since=200, until=300)] == [300]
+
+
+def test_missing_price_keeps_the_last_one(store):
+    store.save('amazon', [phone(price=74999)], seen_at=100)
+    store.save('amazon', [phone(price=0)], seen_at=200)
+    assert store.get_product('amazon', 'B0C1')['price'] == 74999
+    assert len(store.price_history('amazon', 'B0C1')) == 1
+
+
+def test_price_at(store):
+    store.save('amazon', [phone(price=74999)], seen_at=100)
+    store.save('amazon', [phone(price=69999)], seen_at=300)
+    assert store.price_at('amazon', 'B0C1', 50) is None
+    assert store.price_at('amazon', 'B0C1', 299)['price'] == 74999
+    assert store.price_at('amazon', 'B0C1', 300)['price'] == 69999
+
+
+def test_term_products_use_normalized_terms(store):
+    store.save('amazon', [phone()], search_term='  Galaxy   Phone ', seen_at=100)
+    assert [product['product_id'] for product in store.term_products('galaxy phone')] == ['B0C1']
+    assert store.term_products('galaxy phone', site='flipkart') == []
+
+
+def test_save_search_result(tmp_path):
+    path = str(tmp_path / 'products.db')
+    assert save_search_result('amazon', {'search_term': 'galaxy', 'products': [phone()]}, path=path) == 1
+    assert save_search_result('amazon', {'search_term': 'galaxy', 'products': []}, path=path) == 0
+    assert save_search_result('amazon', {'products': [phone()]}, path='off') == 0
+
+
+def test_match_expression_quotes_words_and_prefixes_the_last():
+    assert match_expression('Galaxy S23') == '"galaxy" "s23"*'
+    assert match_expression('  ') is None
+
+
+def test_match_expression_escapes_fts_syntax():
+    assert match_expression('name:phone OR "x" NEAR(a b)') == '"name" "phone" "or" "x" "near" "a" "b"*'
+
+
+def test_search_ranks_and_filters(store):
+    store.save('amazon', [phone(), phone(asin='B0C2', name='Galaxy Buds case', brand='Spigen', price_numeric=999,
+                                         rating='3.9', specifications=['Samsung compatible'])], seen_at=100)
+    # Samsung in the name and brand outranks Samsung in the specifications
+    assert [product['product_id'] for product in store.search('samsung gal')] == ['B0C1', 'B0C2']
+    assert [product['product_id'] for product in store.search('buds')] == ['B0C2']
+    assert [product['product_id'] for product in store.search('galaxy', max_price=5000)] == ['B0C2']
+    assert [product['product_id'] for product in store.search('galaxy', min_rating=4)] == ['B0C1']
+
+
+def test_search_follows_renamed_products(store):
+    store.save('amazon', [phone()], seen_at=100)
+    store.save('amazon', [phone(name='Samsung Galaxy S24 Ultra')], seen_at=200)
+    assert store.search('s23') == []
+    assert [product['product_id'] for product in store.search('ultra')] == ['B0C1']
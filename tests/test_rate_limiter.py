@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+import pytest
+
+import rate_limiter
+from rate_limiter import DomainRateLimiter, RateLimit
+
+
+@pytest.fixture(autouse=True)
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(rate_limiter, 'JITTER', (1.0, 1.0))
+
+
+def test_burst_is_available_at_once():
+    limiter = DomainRateLimiter(RateLimit(initial_rate=1.0, burst=3))
+
+    async def acquire_burst():
+        return [await limiter.acquire() for _ in range(3)]
+
+    assert all(waited < 0.05 for waited in asyncio.run(acquire_burst()))
+
+
+def test_acquire_waits_for_the_rate():
+    limiter = DomainRateLimiter(RateLimit(initial_rate=20.0, max_rate=20.0, burst=1))
+
+    async def acquire_two():
+        await limiter.acquire()
+        return await limiter.acquire()
+
+    assert asyncio.run(acquire_two()) >= 0.04
+
+
+def test_success_increases_rate_up_to_max():
+    limiter = DomainRateLimiter(RateLimit(initial_rate=0.3, max_rate=0.4, increase=0.05))
+    limiter.on_success()
+    assert limiter.rate == pytest.approx(0.35)
+    limiter.on_success()
+    limiter.on_success()
+    assert limiter.rate == pytest.approx(0.4)
+    assert limiter.successes == 3
+
+
+def test_throttle_decreases_rate_down_to_min_and_drops_burst():
+    limiter = DomainRateLimiter(RateLimit(initial_rate=0.4, min_rate=0.15, decrease=0.5, burst=3))
+    limiter.on_throttle()
+    assert limiter.rate == pytest.approx(0.2)
+    assert limiter.tokens <= 0
+    limiter.on_throttle()
+    assert limiter.rate == pytest.approx(0.15)
+    assert limiter.throttles == 2
+
+
+def test_throttle_pause_holds_the_domain():
+    limiter = DomainRateLimiter(RateLimit(initial_rate=100.0, max_rate=100.0))
+    limiter.on_throttle(pause=0.2)
+    assert limiter.stats()['paused_for'] > 0
+
+    started = time.monotonic()
+    asyncio.run(limiter.acquire())
+    assert time.monotonic() - started >= 0.19
+
+
+def test_refund_returns_the_slot():
+    limiter = DomainRateLimiter(RateLimit(initial_rate=0.05, burst=1))
+
+    async def acquire_refund_acquire():
+        await limiter.acquire()
+        limiter.refund()
+        return await limiter.acquire()
+
+    assert asyncio.run(acquire_refund_acquire()) < 0.05
+
+
+def test_refund_never_exceeds_burst():
+    limiter = DomainRateLimiter(RateLimit(burst=2))
+    limiter.refund()
+    limiter.refund()
+    assert limiter.tokens == 2
+
+
+def test_waiters_get_slots_in_the_order_they_asked():
+    limiter = DomainRateLimiter(RateLimit(initial_rate=50.0, max_rate=50.0, burst=1))
+    order = []
+
+    async def request(number):
+        await limiter.acquire()
+        order.append(number)
+
+    async def run_requests():
+        await asyncio.gather(*(request(number) for number in range(6)))
+
+    asyncio.run(run_requests())
+    assert order == list(range(6))
@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+
+import httpx
+import pytest
+
+import response_cache
+from fetch_engine import FetchEngine, FetchPolicy
+from rate_limiter import RateLimit
+from response_cache import ResponseCache, normalize_url
+
+URL = 'https://www.amazon.in/s?k=laptop&page=2'
+
+
+def test_normalize_url():
+    assert normalize_url('HTTPS://WWW.Amazon.in/s?page=2&k=laptop#top') == 'https://www.amazon.in/s?k=laptop&page=2'
+    assert normalize_url('https://www.amazon.in') == 'https://www.amazon.in/'
+
+
+def test_fresh_and_stale_entries():
+    cache = ResponseCache()
+    cache.store(URL, b'page', {'etag': '"v1"', 'set-cookie': 'x'}, ttl=60)
+    entry = cache.get(URL)
+    assert entry.content == b'page'
+    assert entry.headers == {'etag': '"v1"'}
+
+    entry.expires_at = time.time() - 1
+    assert cache.get(URL) is None
+    fresh, stale = cache.check(URL)
+    assert fresh is None and stale is entry
+    assert stale.validators() == {'If-None-Match': '"v1"'}
+    assert cache.stats()['hits'] == 1
+
+
+def test_memory_is_bounded_by_entries_and_bytes():
+    cache = ResponseCache(max_entries=3, max_bytes=100)
+    for number in range(4):
+        cache.store(f'https://a.in/{number}', b'x' * 10, {}, ttl=60)
+    assert cache.lookup('https://a.in/0') is None
+    cache.store('https://a.in/big', b'x' * 95, {}, ttl=60)
+    assert cache.stats()['entries'] == 1
+    assert cache.stats()['bytes'] == 95
+    cache.store('https://a.in/huge', b'x' * 200, {}, ttl=60)
+    assert cache.lookup('https://a.in/huge') is None
+
+
+def test_disk_entries_outlive_the_process(tmp_path):
+    ResponseCache(cache_dir=str(tmp_path)).store(URL, b'page', {'etag': '"v1"'}, ttl=60)
+    entry = ResponseCache(cache_dir=str(tmp_path)).get(URL)
+    assert (entry.content, entry.etag) == (b'page', '"v1"')
+
+
+def test_refresh_rewrites_only_the_metadata(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    entry = cache.store(URL, b'page', {'etag': '"v1"'}, ttl=60)
+    body = tmp_path / f'{entry.digest}.body'
+    os.utime(body, (0, 0))
+    cache.refresh(entry, ttl=60, headers={'etag': '"v2"'})
+    assert body.stat().st_mtime == 0
+    assert ResponseCache(cache_dir=str(tmp_path)).get(URL).etag == '"v2"'
+
+
+def test_concurrent_writers_never_pair_a_body_with_another_responses_metadata(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    start = threading.Barrier(8)
+
+    def write(number):
+        start.wait()
+        for _ in range(20):
+            cache.store(URL, f'page {number}'.encode(), {'etag': f'"{number}"'}, ttl=60)
+
+    threads = [threading.Thread(target=write, args=(number,)) for number in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    entry = ResponseCache(cache_dir=str(tmp_path)).get(URL)
+    assert entry.content == f'page {entry.etag.strip(chr(34))}'.encode()
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('.tmp-')]
+
+
+def test_discard(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    cache.store(URL, b'page', {}, ttl=60)
+    cache.discard(URL)
+    assert cache.lookup(URL) is None
+    assert ResponseCache(cache_dir=str(tmp_path)).lookup(URL) is None
+
+
+def disk_files(path, suffix):
+    return sorted(name for name in os.listdir(path) if name.endswith(suffix))
+
+
+def test_sweep_drops_old_entries_and_their_bodies(tmp_path, monkeypatch):
+    monkeypatch.setattr(response_cache, 'SWEEP_GRACE_SECONDS', 0)
+    cache = ResponseCache(cache_dir=str(tmp_path), disk_max_age=3600)
+    cache.store('https://a.in/old', b'old page', {}, ttl=60)
+    cache.store('https://a.in/new', b'new page', {}, ttl=60)
+    old = cache.lookup('https://a.in/old')
+    old.stored_at -= 7200
+    cache._write_meta(old)
+
+    assert cache.sweep(now=time.time() + 1) == 2
+    fresh = ResponseCache(cache_dir=str(tmp_path))
+    assert fresh.lookup('https://a.in/old') is None
+    assert fresh.lookup('https://a.in/new').content == b'new page'
+    assert len(disk_files(tmp_path, '.body')) == 1
+
+
+def test_sweep_keeps_the_newest_entries_within_the_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(response_cache, 'SWEEP_GRACE_SECONDS', 0)
+    cache = ResponseCache(cache_dir=str(tmp_path), disk_max_bytes=30)
+    for number in range(4):
+        entry = cache.store(f'https://a.in/{number}', f'page {number} '.encode() * 2, {}, ttl=60)
+        entry.stored_at = time.time() - 100 + number
+        cache._write_meta(entry)
+    cache.sweep(now=time.time() + 1)
+    fresh = ResponseCache(cache_dir=str(tmp_path))
+    assert [number for number in range(4) if fresh.lookup(f'https://a.in/{number}')] == [2, 3]
+
+
+def test_sweep_keeps_bodies_shared_with_a_kept_entry(tmp_path, monkeypatch):
+    monkeypatch.setattr(response_cache, 'SWEEP_GRACE_SECONDS', 0)
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    cache.store('https://a.in/1', b'same page', {}, ttl=60)
+    cache.store('https://a.in/2', b'same page', {}, ttl=60)
+    cache.discard('https://a.in/1')
+    cache.sweep(now=time.time() + 1)
+    assert ResponseCache(cache_dir=str(tmp_path)).lookup('https://a.in/2').content == b'same page'
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = FetchEngine(cache=ResponseCache(cache_dir=str(tmp_path)))
+    yield engine
+    engine.close()
+
+
+def serve(engine, handler):
+    async def replace_client():
+        await engine._client.aclose()
+        engine._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    engine.run(replace_client())
+
+
+POLICY = FetchPolicy(rate_limit=RateLimit(initial_rate=100.0, max_rate=100.0, burst=10), cache_ttl=60)
+
+
+def test_engine_serves_hits_and_revalidates_stale_pages(engine):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.headers.get('If-None-Match') == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, content=b'page', headers={'ETag': '"v1"'})
+
+    serve(engine, handler)
+    assert engine.fetch(URL, policy=POLICY).headers.get('X-Cache') is None
+    assert engine.fetch(URL, policy=POLICY).headers['X-Cache'] == 'HIT'
+
+    engine.cache.lookup(URL).expires_at = time.time() - 1
+    response = engine.fetch(URL, policy=POLICY)
+    assert response.headers['X-Cache'] == 'REVALIDATED'
+    assert response.content == b'page'
+    assert len(requests) == 2
@@ -0,0 +1,126 @@
+import threading
+
+import pytest
+
+import app as backend
+from result_cache import FRESH, STALE, ResultCache, normalize_parameters
+
+PARAMETERS = {'search_term': 'Alan  Turing', 'max_results': '1'}
+
+
+def test_normalize_parameters():
+    assert normalize_parameters(PARAMETERS) == normalize_parameters({'max_results': 1, 'search_term': ' alan turing'})
+    assert normalize_parameters({'search_term': 'laptop', 'concurrency': 4, 'max_products': ''}) == \
+        (('search_term', 'laptop'),)
+
+
+def test_fresh_then_stale_then_missing():
+    cache = ResultCache(ttl=60, max_stale=120)
+    cache.store('wikipedia', PARAMETERS, {'products': []})
+    entry, freshness = cache.get('wikipedia', PARAMETERS)
+    assert freshness == FRESH
+
+    entry.stored_at -= 90
+    assert cache.get('wikipedia', PARAMETERS) == (entry, STALE)
+    entry.stored_at -= 60
+    assert cache.get('wikipedia', PARAMETERS) == (None, None)
+    assert cache.stats()['entries'] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(max_entries=2)
+    for term in ('a', 'b'):
+        cache.store('wikipedia', {'search_term': term}, {'products': []})
+    cache.get('wikipedia', {'search_term': 'a'})
+    cache.store('wikipedia', {'search_term': 'c'}, {'products': []})
+
+    assert cache.get('wikipedia', {'search_term': 'b'}) == (None, None)
+    assert cache.get('wikipedia', {'search_term': 'a'})[1] == FRESH
+    assert cache.stats()['evictions'] == 1
+
+
+def test_only_one_refresh_is_claimed():
+    cache = ResultCache()
+    cache.store('wikipedia', PARAMETERS, {'products': []})
+    entry, _ = cache.get('wikipedia', PARAMETERS)
+    assert cache.claim_refresh(entry)
+    assert not cache.claim_refresh(entry)
+    cache.release_refresh(entry)
+    assert cache.claim_refresh(entry)
+
+
+@pytest.fixture
+def scraper(monkeypatch):
+    """Stands in for the Wikipedia scraper; returns its call count as the title, blocks while 'gate' is clear"""
+    calls = []
+    gate = threading.Event()
+    gate.set()
+
+    def scrape(search_term, max_results):
+        calls.append(search_term)
+        gate.wait(10)
+        return {'title': f'call {len(calls)}', 'products': []}
+
+    monkeypatch.setattr(backend, 'result_cache', ResultCache(ttl=60))
+    monkeypatch.setattr(backend.scraper_registry, 'get_function', lambda scraper_id: scrape)
+    scrape.calls = calls
+    scrape.gate = gate
+    return scrape
+
+
+def post_scrape(cache_mode, wait=True):
+    response = backend.app.test_client().post('/api/scrape', json={
+        'scraper_id': 'wikipedia', 'parameters': PARAMETERS, 'cache': cache_mode, 'wait': wait
+    })
+    return response.status_code, response.get_json()
+
+
+def test_prefer_serves_a_cached_result(scraper):
+    status, body = post_scrape('prefer')
+    assert status == 200 and body['data']['title'] == 'call 1'
+    assert 'cache' not in body
+
+    status, body = post_scrape('prefer')
+    assert body['data']['title'] == 'call 1'
+    assert body['cache']['status'] == FRESH
+    assert len(scraper.calls) == 1
+
+
+def test_bypass_always_scrapes_and_refills_the_cache(scraper):
+    post_scrape('prefer')
+    status, body = post_scrape('bypass')
+    assert body['data']['title'] == 'call 2'
+    assert post_scrape('only')[1]['data']['title'] == 'call 2'
+
+
+def test_only_never_scrapes(scraper):
+    status, body = post_scrape('only')
+    assert status == 404
+    assert body['cache'] == {'status': 'miss'}
+    assert scraper.calls == []
+
+
+def test_unknown_cache_mode_is_rejected(scraper):
+    assert post_scrape('sometimes')[0] == 400
+
+
+def test_stale_result_is_served_while_one_refresh_runs(scraper):
+    post_scrape('prefer')
+    entry, _ = backend.result_cache.get('wikipedia', PARAMETERS)
+    entry.stored_at -= 120
+    scraper.gate.clear()
+
+    first = post_scrape('prefer')[1]
+    second = post_scrape('prefer')[1]
+    for body in (first, second):
+        assert body['data']['title'] == 'call 1'
+        assert body['cache']['status'] == STALE
+    # The second caller is pointed at the refresh the first one started
+    assert second['cache']['refresh_job_id'] == first['cache']['refresh_job_id']
+
+    scraper.gate.set()
+    backend.job_manager.wait(first['cache']['refresh_job_id'], timeout=10)
+    status, body = post_scrape('prefer')
+    assert body['data']['title'] == 'call 2'
+    assert body['cache']['status'] == FRESH
+    assert len(scraper.calls) == 2
@@ -0,0 +1,63 @@
+import json
+import os
+import sys
+
+import pytest
+
+import search_summary
+from amazon_scraper import AmazonScraper
+from conftest import REPO_ROOT
+from flipkart_scraper import FlipkartScraper
+from html_parsing import parse_html
+from jiomart import JioMartScraper
+from snapdeal import SnapdealScraper
+
+# Synthetic product cards from the benchmarks
+sys.path.insert(0, os.path.join(REPO_ROOT, 'benchmarks'))
+from fixtures import cards_html  # noqa: E402
+
+SCRAPERS = {'amazon': AmazonScraper, 'flipkart': FlipkartScraper, 'snapdeal': SnapdealScraper,
+            'jiomart': JioMartScraper}
+
+
+def scraped_products(site, count):
+    scraper = SCRAPERS[site]()
+    cards = scraper.find_product_containers(parse_html(cards_html(site, count, seed=count)))
+    return scraper, [product for product in map(scraper.extract_product_data, cards) if product]
+
+
+def as_json(summary):
+    return json.loads(json.dumps(summary, default=str))
+
+
+@pytest.mark.parametrize('site', SCRAPERS)
+@pytest.mark.parametrize('count', [1, 2, 57, search_summary.NUMPY_MIN_PRODUCTS - 1,
+                                   search_summary.NUMPY_MIN_PRODUCTS, 450])
+def test_plain_python_and_numpy_summaries_match(site, count, monkeypatch):
+    scraper, products = scraped_products(site, count)
+    assert len(products) == count
+
+    monkeypatch.setattr(search_summary, 'NUMPY_MIN_PRODUCTS', count + 1)
+    plain = as_json(scraper.get_search_summary(products))
+    monkeypatch.setattr(search_summary, 'NUMPY_MIN_PRODUCTS', 0)
+    numpy = as_json(scraper.get_search_summary(products))
+    assert plain == numpy
+    assert plain['price_stats']['count'] and plain['total_products'] == count
+
+
+def test_empty_list(monkeypatch):
+    scraper = FlipkartScraper()
+    plain = as_json(scraper.get_search_summary([]))
+    monkeypatch.setattr(search_summary, 'NUMPY_MIN_PRODUCTS', 0)
+    assert as_json(scraper.get_search_summary([])) == plain
+
+
+@pytest.mark.parametrize('count, path', [(search_summary.NUMPY_MIN_PRODUCTS - 1, 'list_price_summary'),
+                                         (search_summary.NUMPY_MIN_PRODUCTS, 'price_summary')])
+def test_numpy_is_used_from_the_threshold_up(count, path, monkeypatch):
+    _, products = scraped_products('amazon', count)
+    used = []
+    original = getattr(search_summary, path)
+    monkeypatch.setattr(search_summary, path, lambda *args, **kwargs: used.append(path) or original(*args, **kwargs))
+    search_summary.product_summary(products)
+    assert used == [path]
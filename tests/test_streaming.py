@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+import app as backend
+from result_cache import ResultCache
+from streaming import NDJSON, SSE, encode_events, pick_format
+
+EVENTS = [
+    {'event': 'page', 'page': 1, 'products': [{'name': 'Phone', 'price': '₹1,999'}]},
+    {'event': 'summary', 'total_products': 1}
+]
+
+
+def test_pick_format():
+    assert pick_format(None, None) == SSE
+    assert pick_format(None, 'application/x-ndjson, */*') == NDJSON
+    assert pick_format('ndjson', 'text/event-stream') == NDJSON
+    assert pick_format('xml', None) is None
+
+
+def test_sse_encoding():
+    chunks = list(encode_events(EVENTS, SSE))
+    assert chunks[0].startswith('event: page\ndata: ')
+    assert chunks[0].endswith('\n\n')
+    assert json.loads(chunks[0].split('data: ', 1)[1]) == {'page': 1, 'products': EVENTS[0]['products']}
+    assert chunks[1] == 'event: summary\ndata: {"total_products":1}\n\n'
+
+
+def test_ndjson_encoding():
+    chunks = list(encode_events(EVENTS, NDJSON))
+    assert all(chunk.endswith('\n') and chunk.count('\n') == 1 for chunk in chunks)
+    assert [json.loads(chunk) for chunk in chunks] == EVENTS
+
+
+def test_events_are_encoded_as_they_are_produced():
+    produced = []
+
+    def events():
+        for event in EVENTS:
+            produced.append(event)
+            yield event
+
+    chunks = encode_events(events(), NDJSON)
+    next(chunks)
+    assert produced == EVENTS[:1]
+
+
+@pytest.fixture
+def stream_scraper(monkeypatch):
+    def stream(search_term, max_pages, concurrency, max_products, cancel_event):
+        for page in range(1, max_pages + 1):
+            yield {'event': 'page', 'page': page, 'products': [{'name': f'{search_term} {page}'}]}
+        yield {'event': 'summary', 'total_products': max_pages}
+
+    monkeypatch.setattr(backend, 'result_cache', ResultCache())
+    monkeypatch.setattr(backend, 'store_products', lambda scraper_id, parameters, products: None)
+    monkeypatch.setattr(backend.scraper_registry, 'get_stream_function', lambda scraper_id: stream)
+
+
+def test_stream_endpoint_sends_ndjson_pages_then_summary(stream_scraper):
+    response = backend.app.test_client().post('/api/scrape/stream', json={
+        'scraper_id': 'amazon', 'parameters': {'search_term': 'phone', 'max_pages': 2}, 'format': 'ndjson'
+    })
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['X-Accel-Buffering'] == 'no'
+    events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [event['event'] for event in events] == ['page', 'page', 'summary']
+    assert events[1]['products'] == [{'name': 'phone 2'}]
+    assert events[2]['scraper_used'] == 'Amazon'
+
+
+def test_stream_endpoint_get_defaults_to_sse(stream_scraper):
+    response = backend.app.test_client().get('/api/scrape/stream?scraper_id=amazon&search_term=phone&max_pages=1')
+    assert response.mimetype == 'text/event-stream'
+    body = response.get_data(as_text=True)
+    assert body.startswith('event: page\n')
+    assert body.count('\n\n') == 2
+
+    response = backend.app.test_client().get(
+        '/api/scrape/stream?scraper_id=amazon&search_term=phone&max_pages=1&format=xml'
+    )
+    assert response.status_code == 400
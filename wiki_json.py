@@ -1,5 +1,8 @@
 import requests
 
+import metrics
+from fetch_engine import rewrite_url
+
 def wikipedia_search(term):
     url = "https://en.wikipedia.org/w/api.php"
     
@@ -11,7 +14,13 @@ def wikipedia_search(term):
         "utf8": 1
     }
 
-    response = requests.get(url, params=params)
+    try:
+        with metrics.HTTP_SECONDS.labels('wikipedia').time():
+            response = requests.get(rewrite_url(url), params=params)
+    except requests.RequestException:
+        metrics.HTTP_REQUESTS.labels('wikipedia', 'error').inc()
+        raise
+    metrics.HTTP_REQUESTS.labels('wikipedia', response.status_code).inc()
     data = response.json()
 
     if data.get("query") and data["query"]["search"]: